@@ -0,0 +1,299 @@
+#!/usr/bin/env python3
+"""An asyncio github org client
+"""
+import asyncio
+import ssl
+import zlib
+from operator import attrgetter
+from typing import (
+    Any,
+    Dict,
+    List,
+    Mapping,
+    Optional,
+    Tuple,
+)
+from urllib.parse import (
+    parse_qsl,
+    urlencode,
+    urljoin,
+    urlsplit,
+    urlunsplit,
+)
+
+from client import GithubOrgClient
+from transport import ACCEPT_ENCODING, DEFAULT_TIMEOUT, Response
+from utils import async_memoize, parse_link_header
+
+__all__ = [
+    "AsyncGithubOrgClient",
+    "AsyncTransport",
+]
+
+_Address = Tuple[str, str, int]
+
+
+async def _read_body(reader: asyncio.StreamReader,
+                     headers: Mapping[str, str]) -> Tuple[bytes, bool]:
+    """Read a response body; return (body, connection_reusable)"""
+    if headers.get("transfer-encoding", "").lower() == "chunked":
+        chunks = []
+        while True:
+            size = int((await reader.readline()).split(b";")[0], 16)
+            if size == 0:
+                while (await reader.readline()) not in (b"\r\n", b""):
+                    pass
+                return b"".join(chunks), True
+            chunks.append(await reader.readexactly(size))
+            await reader.readexactly(2)
+    if "content-length" in headers:
+        return await reader.readexactly(int(headers["content-length"])), True
+    return await reader.read(), False
+
+
+def _decompress(body: bytes, encoding: str) -> bytes:
+    """Undo a gzip or deflate Content-Encoding"""
+    encoding = encoding.strip().lower()
+    if encoding in ("gzip", "x-gzip"):
+        return zlib.decompress(body, 47)
+    if encoding == "deflate":
+        try:
+            return zlib.decompress(body)
+        except zlib.error:
+            return zlib.decompress(body, -zlib.MAX_WBITS)
+    return body
+
+
+class AsyncTransport:
+    """Keep-alive HTTP/1.1 transport built on asyncio streams.
+    Parameters
+    ----------
+    pool_maxsize: int
+        maximum number of connections open per host
+    timeout: float
+        deadline in seconds for each request, redirects included; None
+        for no deadline. Defaults to the connect plus read timeouts of
+        the blocking transports
+    compress: bool
+        ask for gzip/deflate bodies
+    max_redirects: int
+        redirects followed per request before giving up with OSError
+    """
+    REDIRECT_STATUSES = frozenset((301, 302, 303, 307, 308))
+
+    def __init__(self, pool_maxsize: int = 10,
+                 timeout: Optional[float] = sum(DEFAULT_TIMEOUT),
+                 compress: bool = True, max_redirects: int = 10) -> None:
+        """Init method of AsyncTransport"""
+        self.pool_maxsize = pool_maxsize
+        self.timeout = timeout
+        self.compress = compress
+        self.max_redirects = max_redirects
+        self._idle = {}
+        self._slots = {}
+        self._ssl = None
+
+    async def get(self, url: str,
+                  headers: Optional[Mapping[str, str]] = None) -> Response:
+        """GET url over a pooled connection, following redirects"""
+        return await asyncio.wait_for(self._follow(url, headers or {}),
+                                      self.timeout)
+
+    async def close(self) -> None:
+        """Close every idle connection"""
+        idle, self._idle = self._idle, {}
+        for connections in idle.values():
+            for _, writer in connections:
+                writer.close()
+
+    async def __aenter__(self) -> "AsyncTransport":
+        return self
+
+    async def __aexit__(self, *exc_info: Any) -> None:
+        await self.close()
+
+    async def _follow(self, url: str,
+                      headers: Mapping[str, str]) -> Response:
+        """GET url, then each Location it redirects to"""
+        for _ in range(self.max_redirects + 1):
+            response = await self._get(url, headers)
+            location = response.headers.get("location")
+            if (response.status_code not in self.REDIRECT_STATUSES
+                    or location is None):
+                return response
+            target = urljoin(url, location)
+            if urlsplit(target).netloc != urlsplit(url).netloc:
+                # like requests, keep credentials on their own host
+                headers = {k: v for k, v in headers.items()
+                           if k.lower() != "authorization"}
+            url = target
+        raise OSError("more than {} redirects, last to {}".format(
+            self.max_redirects, url))
+
+    async def _get(self, url: str, headers: Mapping[str, str]) -> Response:
+        parts = urlsplit(url)
+        https = parts.scheme == "https"
+        address = (parts.scheme, parts.hostname,
+                   parts.port or (443 if https else 80))
+        target = urlunsplit(("", "", parts.path or "/", parts.query, ""))
+        lines = ["GET {} HTTP/1.1".format(target),
+                 "Host: {}".format(parts.netloc),
+                 "Accept: application/json",
+                 "Accept-Encoding: " + (ACCEPT_ENCODING if self.compress
+                                        else "identity"),
+                 "Connection: keep-alive"]
+        lines += ["{}: {}".format(k, v) for k, v in headers.items()]
+        request = ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1")
+
+        if address not in self._slots:
+            self._slots[address] = asyncio.Semaphore(self.pool_maxsize)
+        async with self._slots[address]:
+            idle = self._idle.setdefault(address, [])
+            while idle:
+                reader, writer = idle.pop()
+                try:
+                    return await self._exchange(url, address, reader,
+                                                writer, request)
+                except (ConnectionError, asyncio.IncompleteReadError):
+                    continue
+            reader, writer = await self._connect(address)
+            return await self._exchange(url, address, reader, writer,
+                                        request)
+
+    async def _connect(self, address: _Address) -> Tuple[Any, Any]:
+        scheme, host, port = address
+        context = None
+        if scheme == "https":
+            if self._ssl is None:
+                self._ssl = ssl.create_default_context()
+            context = self._ssl
+        return await asyncio.open_connection(host, port, ssl=context)
+
+    async def _exchange(self, url: str, address: _Address,
+                        reader: asyncio.StreamReader,
+                        writer: asyncio.StreamWriter,
+                        request: bytes) -> Response:
+        """Send request on a connection and read the response"""
+        try:
+            writer.write(request)
+            await writer.drain()
+            status_line = await reader.readline()
+            if not status_line:
+                raise ConnectionResetError("connection closed by peer")
+            status = int(status_line.split()[1])
+            headers = {}
+            while True:
+                line = await reader.readline()
+                if line in (b"\r\n", b"\n", b""):
+                    break
+                name, _, value = line.decode("latin-1").partition(":")
+                headers[name.strip().lower()] = value.strip()
+            if status in (204, 304) or 100 <= status < 200:
+                body, reusable = b"", True
+            else:
+                body, reusable = await _read_body(reader, headers)
+        except BaseException:
+            writer.close()
+            raise
+        if reusable and headers.get("connection", "").lower() != "close":
+            self._idle.setdefault(address, []).append((reader, writer))
+        else:
+            writer.close()
+        return Response(url, status, headers,
+                        _decompress(body, headers.get("content-encoding", "")),
+                        wire_size=len(body))
+
+
+def _page_url(url: str, page: int) -> str:
+    """Return url with its page query parameter set to page"""
+    parts = urlsplit(url)
+    query = [(k, v) for k, v in parse_qsl(parts.query) if k != "page"]
+    query.append(("page", str(page)))
+    return urlunsplit(parts._replace(query=urlencode(query)))
+
+
+class AsyncGithubOrgClient:
+    """An asyncio Github org client
+
+    ``org``, ``repos_payload`` and ``public_repos`` are coroutines; the
+    first two are memoized as shared tasks, so concurrent callers await a
+    single fetch. Once the first repos page reveals the page count
+    (``Link: rel="last"``), the remaining pages are fetched concurrently,
+    at most ``concurrency`` at a time.
+    """
+    ORG_URL = GithubOrgClient.ORG_URL
+    has_license = staticmethod(GithubOrgClient.has_license)
+
+    def __init__(self, org_name: str, transport: AsyncTransport = None,
+                 concurrency: int = 8, per_page: int = None,
+                 ttl: float = None) -> None:
+        """Init method of AsyncGithubOrgClient"""
+        self._org_name = org_name
+        self._owns_transport = transport is None
+        self._transport = transport or AsyncTransport(concurrency)
+        self._concurrency = concurrency
+        self._per_page = per_page
+        self._ttl = ttl
+
+    async def _get_json(self, url: str) -> Tuple[Any, Dict[str, str]]:
+        response = await self._transport.get(url)
+        return response.json(), parse_link_header(
+            response.headers.get("link"))
+
+    @async_memoize(ttl=attrgetter("_ttl"))
+    async def org(self) -> Dict:
+        """Memoize org"""
+        org, _ = await self._get_json(self.ORG_URL.format(org=self._org_name))
+        return org
+
+    async def _public_repos_url(self) -> str:
+        """Public repos URL"""
+        url = (await self.org())["repos_url"]
+        if self._per_page is not None:
+            url += "{}per_page={}".format("&" if "?" in url else "?",
+                                          self._per_page)
+        return url
+
+    @async_memoize(ttl=attrgetter("_ttl"))
+    async def repos_payload(self) -> List[Dict]:
+        """Every repo of the org, pages fetched concurrently"""
+        repos, links = await self._get_json(await self._public_repos_url())
+        repos = list(repos)
+        if "last" in links:
+            last = int(dict(parse_qsl(
+                urlsplit(links["last"]).query)).get("page", 1))
+            semaphore = asyncio.Semaphore(self._concurrency)
+
+            async def fetch(page: int) -> List[Dict]:
+                async with semaphore:
+                    payload, _ = await self._get_json(
+                        _page_url(links["last"], page))
+                    return payload
+
+            pages = await asyncio.gather(
+                *(fetch(page) for page in range(2, last + 1)))
+            for page in pages:
+                repos.extend(page)
+        else:
+            while "next" in links:
+                page, links = await self._get_json(links["next"])
+                repos.extend(page)
+        return repos
+
+    async def public_repos(self, license: str = None) -> List[str]:
+        """Public repos"""
+        return [
+            repo["name"] for repo in await self.repos_payload()
+            if license is None or self.has_license(repo, license)
+        ]
+
+    async def close(self) -> None:
+        """Close the transport if this client created it"""
+        if self._owns_transport:
+            await self._transport.close()
+
+    async def __aenter__(self) -> "AsyncGithubOrgClient":
+        return self
+
+    async def __aexit__(self, *exc_info: Any) -> None:
+        await self.close()
@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+"""Benchmark access_nested_map against compile_path and extract_columns.
+
+Usage: ./bench_access.py [-n CALLS]
+"""
+import argparse
+import timeit
+
+from fixtures import TEST_PAYLOAD
+from utils import access_nested_map, compile_path, extract_columns
+
+
+def per_record(repos, paths):
+    """Columns built with one access_nested_map call per record and path"""
+    columns = []
+    for path in paths:
+        column = []
+        for repo in repos:
+            try:
+                column.append(access_nested_map(repo, path))
+            except KeyError:
+                column.append(None)
+        columns.append(column)
+    return columns
+
+
+def main() -> None:
+    """Entry point"""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("-n", type=int, default=200000)
+    args = parser.parse_args()
+
+    repo = TEST_PAYLOAD[0][1][0]
+    for path in (("name",), ("license", "key"), ("owner", "login"),
+                 ("permissions", "admin")):
+        getter = compile_path(path)
+        generic = min(timeit.repeat(lambda: access_nested_map(repo, path),
+                                    number=args.n, repeat=3))
+        compiled = min(timeit.repeat(lambda: getter(repo),
+                                     number=args.n, repeat=3))
+        print("{:<22} generic {:>6.1f} ns  compiled {:>6.1f} ns  x{:.1f}"
+              .format(".".join(path), generic / args.n * 1e9,
+                      compiled / args.n * 1e9, generic / compiled))
+
+    repos = TEST_PAYLOAD[0][1] * (args.n // 100)
+    paths = [("name",), ("license", "key"), ("license", "spdx_id"),
+             ("owner", "login")]
+    assert per_record(repos, paths) == extract_columns(repos, paths)
+    generic = min(timeit.repeat(lambda: per_record(repos, paths),
+                                number=1, repeat=3))
+    columns = min(timeit.repeat(lambda: extract_columns(repos, paths),
+                                number=1, repeat=3))
+    print("{} repos x {} paths: per-record {:.3f}s  extract_columns {:.3f}s"
+          "  x{:.1f}".format(len(repos), len(paths), generic, columns,
+                             generic / columns))
+
+
+if __name__ == "__main__":
+    main()
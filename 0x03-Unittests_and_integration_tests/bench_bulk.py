@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+"""Benchmark GithubOrgClient.bulk_public_repos throughput per worker count.
+
+Every stand-in request sleeps --latency seconds to model a network round
+trip, so throughput should grow with workers until the server saturates.
+
+Usage: ./bench_bulk.py [--orgs N] [--latency SECONDS] [--workers 1 2 4 8]
+"""
+import argparse
+import time
+
+from client import GithubOrgClient
+from fake_server import FakeGithubServer
+from transport import PooledTransport, set_transport
+
+
+def main() -> None:
+    """Entry point"""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--orgs", type=int, default=200)
+    parser.add_argument("--latency", type=float, default=0.005)
+    parser.add_argument("--workers", type=int, nargs="+",
+                        default=[1, 2, 4, 8, 16, 32])
+    args = parser.parse_args()
+
+    server = FakeGithubServer(latency=args.latency).start()
+    orgs = ["org{}".format(i) for i in range(args.orgs)]
+    for org in orgs:
+        repos_path = "/orgs/{}/repos".format(org)
+        server.route("/orgs/" + org, {"repos_url": server.url(repos_path)})
+        server.route(repos_path, [{"name": org + "-repo",
+                                   "license": {"key": "mit"}}])
+    GithubOrgClient.ORG_URL = server.url("/orgs/{org}")
+
+    try:
+        baseline = None
+        for workers in args.workers:
+            previous = set_transport(PooledTransport(pool_maxsize=workers))
+            start = time.perf_counter()
+            done = sum(1 for _ in GithubOrgClient.bulk_public_repos(
+                orgs, max_workers=workers))
+            rate = done / (time.perf_counter() - start)
+            set_transport(previous).close()
+            baseline = baseline or rate
+            print("{:>3} workers {:>9.1f} orgs/s  x{:.2f}".format(
+                workers, rate, rate / baseline))
+    finally:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+"""Benchmark GithubOrgClient on synthetic orgs of growing size.
+
+Orgs come from fixtures.synthetic_org, shaped like the recorded google
+repos with their license mix; --shape full keeps every recorded key
+(about 5 KB per repo), slim only fixtures.SLIM_KEYS. Each operation reports
+its best time over --repeat runs, per-item cost and throughput, and the
+peak memory it allocates (tracemalloc, on a separate run). --json writes
+the results; --compare fails when an operation got slower than in an
+earlier results file by more than --tolerance.
+
+Usage: ./bench_client.py [--sizes 1000 100000 1000000] [--shape slim|full]
+                         [--json PATH] [--compare PATH [--tolerance 0.25]]
+"""
+import argparse
+import json
+import platform
+import sys
+import time
+import tracemalloc
+
+from client import GithubOrgClient
+from fixtures import synthetic_org
+from utils import access_nested_map, memoize, set_memoized
+
+LICENSE = "apache-2.0"
+
+
+def client_for(repos):
+    """A client holding repos, with no request needed"""
+    github_org_client = GithubOrgClient("synthetic")
+    set_memoized(github_org_client, "org", {"repos_url": "unused"})
+    set_memoized(github_org_client, "repos_payload", repos)
+    return github_org_client
+
+
+def operations(repos):
+    """(name, items per run, setup, run) for each benchmarked operation"""
+    github_org_client = client_for(repos)
+    n = len(repos)
+    has_license = GithubOrgClient.has_license
+
+    def drop_license_index():
+        github_org_client.__dict__.pop("_license_index_cache", None)
+
+    def license_keys():
+        for repo in repos:
+            try:
+                access_nested_map(repo, ("license", "key"))
+            except KeyError:
+                pass
+
+    def memoized_hits():
+        for _ in range(n):
+            github_org_client.org
+
+    class Plain:
+        @memoize
+        def value(self):
+            return 1
+    plain = Plain()
+
+    def memoized_hits_no_ttl():
+        for _ in range(n):
+            plain.value
+
+    def attribute_reads():
+        for _ in range(n):
+            github_org_client._org
+
+    return [
+        ("public_repos", n, None, github_org_client.public_repos),
+        ("public_repos(license) cold", n, drop_license_index,
+         lambda: github_org_client.public_repos(LICENSE)),
+        ("public_repos(license) warm", n, None,
+         lambda: github_org_client.public_repos(LICENSE)),
+        ("has_license", n, None,
+         lambda: [has_license(repo, LICENSE) for repo in repos]),
+        ("access_nested_map", n, None, license_keys),
+        ("memoize hit", n, None, memoized_hits),
+        ("memoize hit (no ttl)", n, None, memoized_hits_no_ttl),
+        ("attribute read", n, None, attribute_reads),
+    ]
+
+
+def measure(items, setup, run, repeat):
+    """Best seconds over repeat runs, then the peak bytes of one more"""
+    best = float("inf")
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        run()
+        best = min(best, time.perf_counter() - start)
+    if setup is not None:
+        setup()
+    tracemalloc.start()
+    try:
+        run()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return {
+        "seconds": best,
+        "ns_per_item": best / items * 1e9,
+        "items_per_second": items / best if best else float("inf"),
+        "peak_bytes": peak,
+    }
+
+
+def run_size(n, shape, repeat):
+    """Results of every operation on an org of n repos"""
+    start = time.perf_counter()
+    _, repos, expected, apache2 = synthetic_org(n, shape)
+    results = [{"op": "generate", "repos": n,
+                "seconds": time.perf_counter() - start}]
+    github_org_client = client_for(repos)
+    assert github_org_client.public_repos() == expected
+    assert github_org_client.public_repos(LICENSE) == apache2
+    for op, items, setup, run in operations(repos):
+        results.append(dict(op=op, repos=n,
+                            **measure(items, setup, run, repeat)))
+    return results
+
+
+def regressions(results, baseline, tolerance):
+    """Operations slower than in baseline by more than tolerance"""
+    before = {(r["op"], r["repos"]): r["seconds"]
+              for r in baseline["results"]}
+    slower = []
+    for result in results:
+        seconds = before.get((result["op"], result["repos"]))
+        if seconds and result["seconds"] > seconds * (1 + tolerance):
+            slower.append((result["op"], result["repos"], seconds,
+                           result["seconds"]))
+    return slower
+
+
+def main() -> None:
+    """Entry point"""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+",
+                        default=[1000, 100000, 1000000])
+    parser.add_argument("--shape", choices=("slim", "full"), default="slim")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--json", metavar="PATH")
+    parser.add_argument("--compare", metavar="PATH")
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    args = parser.parse_args()
+
+    results = []
+    for n in args.sizes:
+        for result in run_size(n, args.shape, args.repeat):
+            results.append(result)
+            if "ns_per_item" in result:
+                print("{:>8} {:<28} {:>9.4f}s {:>8.1f} ns/item "
+                      "{:>12.0f}/s  peak {:>8.1f} KiB".format(
+                          n, result["op"], result["seconds"],
+                          result["ns_per_item"], result["items_per_second"],
+                          result["peak_bytes"] / 1024))
+            else:
+                print("{:>8} {:<28} {:>9.4f}s".format(
+                    n, result["op"], result["seconds"]))
+
+    report = {
+        "python": platform.python_version(),
+        "implementation": platform.python_implementation(),
+        "machine": platform.machine(),
+        "shape": args.shape,
+        "repeat": args.repeat,
+        "results": results,
+    }
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        if baseline["shape"] != args.shape:
+            parser.error("{} holds {} results".format(
+                args.compare, baseline["shape"]))
+        slower = regressions(results, baseline, args.tolerance)
+        for op, n, before, after in slower:
+            print("REGRESSION {} at {} repos: {:.4f}s -> {:.4f}s".format(
+                op, n, before, after), file=sys.stderr)
+        if slower:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""Compare peak memory of full vs projected streaming get_json decoding,
+then wire vs decoded size and decode time per JSON decoder, with and
+without gzip.
+
+The page served is fixtures.TEST_PAYLOAD's repos repeated --repeat times.
+
+Usage: ./bench_decode.py [--repeat N]
+"""
+import argparse
+import json
+import time
+import tracemalloc
+
+from client import GithubOrgClient
+from fake_server import FakeGithubServer, json_body
+from fixtures import TEST_PAYLOAD
+from transport import (
+    PooledTransport,
+    get_json_decoder,
+    set_json_decoder,
+    set_transport,
+)
+from utils import get_json
+
+
+def measure(url: str, fields) -> tuple:
+    """Return (seconds, peak bytes, result) of one get_json call"""
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = get_json(url, fields)
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return elapsed, peak, result
+
+
+def main() -> None:
+    """Entry point"""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--repeat", type=int, default=500)
+    args = parser.parse_args()
+
+    # encode once, so the in-process server's own allocations stay out
+    # of the traced peak
+    body = json_body(TEST_PAYLOAD[0][1] * args.repeat)
+
+    def route(path, headers):
+        return 200, {}, body
+
+    with FakeGithubServer({"/repos": route}) as server:
+        url = server.url("/repos")
+        get_json(url)
+        for name, fields in (("full", None),
+                             ("projected", GithubOrgClient.REPO_FIELDS)):
+            elapsed, peak, result = measure(url, fields)
+            print("{:<10} {:>6} repos {:>8.3f}s peak {:>8.1f} KiB".format(
+                name, len(result), elapsed, peak / 1024))
+
+    decoders = [("json", json.loads)]
+    if get_json_decoder() is not json.loads:
+        decoders.append((get_json_decoder().__module__, get_json_decoder()))
+    with FakeGithubServer({"/repos": route}, compress=True) as server:
+        url = server.url("/repos")
+        for compress in (False, True):
+            transport = PooledTransport(compress=compress)
+            previous = set_transport(transport)
+            try:
+                response = transport.get(url)
+                print("{:<5} wire {:>8.1f} KiB  decoded {:>8.1f} KiB  "
+                      "x{:.1f}".format(
+                          "gzip" if compress else "plain",
+                          response.wire_size / 1024,
+                          len(response.content) / 1024,
+                          len(response.content) / response.wire_size))
+                for name, decoder in decoders:
+                    set_json_decoder(decoder)
+                    elapsed = float("inf")
+                    for _ in range(3):
+                        start = time.perf_counter()
+                        get_json(url)
+                        elapsed = min(elapsed, time.perf_counter() - start)
+                    print("      {:<8} get_json {:>8.3f}s".format(
+                        name, elapsed))
+            finally:
+                set_json_decoder(None)
+                set_transport(previous)
+                transport.close()
+
+
+if __name__ == "__main__":
+    main()
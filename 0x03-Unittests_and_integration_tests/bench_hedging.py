@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""Benchmark get_json tail latency under injected latency spikes.
+
+The stand-in server answers in --latency seconds, except that each
+request independently stalls for --spike seconds with probability
+--spike-rate. The same sequence of requests is run over a plain pooled
+transport and a HedgedTransport, printing latency percentiles and the
+extra requests hedging cost. A second run takes the server down (every
+answer stalls past the read deadline) and compares the time spent with
+and without a CircuitBreakerTransport.
+
+Usage: ./bench_hedging.py [-n REQUESTS] [--latency S] [--spike S]
+                          [--spike-rate P] [--seed N]
+"""
+import argparse
+import random
+import threading
+import time
+
+from fake_server import FakeGithubServer, json_body
+from fixtures import TEST_PAYLOAD
+from resilience import CircuitBreakerTransport, HedgedTransport
+from transport import PooledTransport, set_transport
+from utils import get_json
+
+
+def percentile(ordered, q):
+    """The q-quantile of sorted values"""
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def run(transport, url, n):
+    """(sorted latencies, failures, seconds) of n get_json calls"""
+    previous = set_transport(transport)
+    latencies, failures = [], 0
+    start = time.perf_counter()
+    try:
+        for _ in range(n):
+            began = time.perf_counter()
+            try:
+                get_json(url)
+            except OSError:
+                failures += 1
+            latencies.append(time.perf_counter() - began)
+    finally:
+        set_transport(previous)
+        transport.close()
+    return sorted(latencies), failures, time.perf_counter() - start
+
+
+def main() -> None:
+    """Entry point"""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("-n", type=int, default=500)
+    parser.add_argument("--latency", type=float, default=0.002)
+    parser.add_argument("--spike", type=float, default=0.2)
+    parser.add_argument("--spike-rate", type=float, default=0.03)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    body = json_body(TEST_PAYLOAD[0][1])
+    rng = random.Random(args.seed)
+    lock = threading.Lock()
+    down = threading.Event()
+
+    def route(path, headers):
+        with lock:
+            spiked = rng.random() < args.spike_rate
+        if down.is_set():
+            time.sleep(1.0)
+        else:
+            time.sleep(args.spike if spiked else args.latency)
+        return 200, {}, body
+
+    with FakeGithubServer({"/orgs/google/repos": route}) as server:
+        url = server.url("/orgs/google/repos")
+        print("{:<8} {:>8} {:>8} {:>8} {:>8} {:>8}  {}".format(
+            "", "p50 ms", "p95 ms", "p99 ms", "max ms", "total s",
+            "extra requests"))
+        for name, transport in (
+                ("plain", PooledTransport()),
+                ("hedged", HedgedTransport(PooledTransport(pool_maxsize=16),
+                                           budget=0.1))):
+            rng.seed(args.seed)
+            before = server.request_count
+            ordered, _, total = run(transport, url, args.n)
+            extra = server.request_count - before - args.n
+            print("{:<8} {:>8.1f} {:>8.1f} {:>8.1f} {:>8.1f} {:>8.2f}  "
+                  "{} ({:.1%})".format(
+                      name, percentile(ordered, 0.5) * 1000,
+                      percentile(ordered, 0.95) * 1000,
+                      percentile(ordered, 0.99) * 1000,
+                      ordered[-1] * 1000, total, extra, extra / args.n))
+
+        down.set()
+        outage = max(20, args.n // 25)
+        print("\noutage: {} requests, read deadline 0.1 s".format(outage))
+        for name, transport in (
+                ("plain", PooledTransport(timeout=(1.0, 0.1))),
+                ("breaker", CircuitBreakerTransport(
+                    PooledTransport(timeout=(1.0, 0.1)),
+                    failure_threshold=5, reset_timeout=30.0))):
+            before = server.request_count
+            _, failures, total = run(transport, url, outage)
+            print("{:<8} {:>3} failed  {:>3} sent  {:>6.2f} s".format(
+                name, failures, server.request_count - before, total))
+
+
+if __name__ == "__main__":
+    main()
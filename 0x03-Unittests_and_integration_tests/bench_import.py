@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""Benchmark the cold-start import cost of a module and guard a budget.
+
+Each run imports the module in a fresh interpreter with -X importtime;
+the report lists the slowest imports (cumulative microseconds) of the
+best run and the time on top of a bare interpreter. Exits 1 when that
+exceeds --budget milliseconds or a --forbid module got imported.
+
+Usage: ./bench_import.py [--module client] [--runs 10] [--budget 50]
+                         [--forbid requests asyncio ...] [--top 15]
+"""
+import argparse
+import os
+import subprocess
+import sys
+import time
+
+HEAVY = ["requests", "urllib3", "asyncio", "concurrent.futures", "sqlite3"]
+
+
+def importtime(statement):
+    """(wall seconds, {module: (self us, cumulative us)}) of running
+    statement in a fresh interpreter with -X importtime"""
+    start = time.perf_counter()
+    stderr = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", statement],
+        stderr=subprocess.PIPE, check=True, universal_newlines=True,
+        cwd=os.path.dirname(os.path.abspath(__file__))).stderr
+    elapsed = time.perf_counter() - start
+    modules = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        own, cumulative, name = line[len("import time:"):].split("|")
+        modules[name.strip()] = (int(own), int(cumulative))
+    return elapsed, modules
+
+
+def main() -> None:
+    """Entry point"""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--module", default="client")
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--budget", type=float, default=50.0,
+                        help="milliseconds over a bare interpreter")
+    parser.add_argument("--forbid", nargs="*", default=HEAVY)
+    parser.add_argument("--top", type=int, default=15)
+    args = parser.parse_args()
+
+    bare = min(importtime("pass")[0] for _ in range(args.runs))
+    runs = [importtime("import " + args.module) for _ in range(args.runs)]
+    elapsed, modules = min(runs, key=lambda run: run[0])
+    cost = (elapsed - bare) * 1000
+
+    print("{:>10} {:>10}  module".format("self us", "cumul us"))
+    for name, (own, cumulative) in sorted(
+            modules.items(), key=lambda item: -item[1][1])[:args.top]:
+        print("{:>10} {:>10}  {}".format(own, cumulative, name))
+    print("import {}: {:.1f} ms over a bare interpreter ({:.1f} ms), "
+          "budget {:.1f} ms".format(args.module, cost, bare * 1000,
+                                    args.budget))
+
+    failed = False
+    for name in args.forbid:
+        if name in modules:
+            print("FORBIDDEN import of {}".format(name), file=sys.stderr)
+            failed = True
+    if cost > args.budget:
+        print("OVER BUDGET by {:.1f} ms".format(cost - args.budget),
+              file=sys.stderr)
+        failed = True
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+"""Benchmark memory held by repos as dicts against compact Repo records.
+
+Usage: ./bench_memory.py [-n REPOS]
+"""
+import argparse
+import json
+import time
+import tracemalloc
+
+from fixtures import TEST_PAYLOAD
+from repo import Repo
+from utils import project
+
+
+def traced(build):
+    """Return (bytes still allocated, peak bytes, seconds, result)"""
+    tracemalloc.start()
+    try:
+        start = time.perf_counter()
+        result = build()
+        elapsed = time.perf_counter() - start
+        current, peak = tracemalloc.get_traced_memory()
+        return current, peak, elapsed, result
+    finally:
+        tracemalloc.stop()
+
+
+def main() -> None:
+    """Entry point"""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("-n", type=int, default=20000)
+    args = parser.parse_args()
+
+    repos = TEST_PAYLOAD[0][1]
+    body = json.dumps((repos * (args.n // len(repos) + 1))[:args.n])
+    cases = [
+        ("dicts", lambda: json.loads(body)),
+        ("projected dicts",
+         lambda: [project(r, Repo.PATHS) for r in json.loads(body)]),
+        ("Repo", lambda: [Repo(r) for r in json.loads(body)]),
+        ("Repo keep_raw",
+         lambda: [Repo(r, keep_raw=True) for r in json.loads(body)]),
+    ]
+    baseline = None
+    for name, build in cases:
+        current, peak, elapsed, result = traced(build)
+        assert len(result) == args.n
+        del result
+        baseline = baseline or current
+        print("{:<16} held {:>8.1f} MiB ({:>5.1f} B/repo, x{:<5.2f})"
+              "  peak {:>8.1f} MiB  {:.2f}s".format(
+                  name, current / 2 ** 20, current / args.n,
+                  baseline / current, peak / 2 ** 20, elapsed))
+
+
+if __name__ == "__main__":
+    main()
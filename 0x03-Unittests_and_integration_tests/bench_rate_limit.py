@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+"""Benchmark crawling through a quota with and without RateLimitedTransport.
+
+A local server allows QUOTA requests per WINDOW seconds and answers 403
+beyond that. The plain transport loses every request over the quota; the
+rate-limited one waits for each reset and loses none.
+
+Usage: ./bench_rate_limit.py [-n REQUESTS] [--quota QUOTA] [--window S]
+                             [--threads THREADS]
+"""
+import argparse
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from fake_server import FakeGithubServer
+from rate_limit import RateLimitedTransport
+from transport import PooledTransport
+
+
+def crawl(transport, url, requests, threads):
+    """Return (seconds, statuses) for requests GETs on threads threads"""
+    start = time.perf_counter()
+    with ThreadPoolExecutor(threads) as pool:
+        statuses = list(pool.map(lambda _: transport.get(url).status_code,
+                                 range(requests)))
+    return time.perf_counter() - start, statuses
+
+
+def main() -> None:
+    """Entry point"""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("-n", type=int, default=300)
+    parser.add_argument("--quota", type=int, default=100)
+    parser.add_argument("--window", type=float, default=1.0)
+    parser.add_argument("--threads", type=int, default=8)
+    args = parser.parse_args()
+
+    for name in ("plain", "rate-limited"):
+        with FakeGithubServer({"/orgs/google": {"login": "google"}},
+                              quota=args.quota, window=args.window) as srv:
+            transport = PooledTransport(pool_maxsize=args.threads)
+            if name == "rate-limited":
+                transport = RateLimitedTransport(transport)
+            elapsed, statuses = crawl(transport, srv.url("/orgs/google"),
+                                      args.n, args.threads)
+            transport.close()
+            ok = statuses.count(200)
+            print("{:<13} {:>5} ok  {:>5} rejected by server  {:>6.2f}s"
+                  "  {:>7.1f} ok/s".format(name, ok, srv.rejected_count,
+                                           elapsed, ok / elapsed))
+
+
+if __name__ == "__main__":
+    main()
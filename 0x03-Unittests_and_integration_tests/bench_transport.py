@@ -0,0 +1,46 @@
+#!/usr/bin/env python3
+"""Benchmark get_json fetches per second with and without pooling.
+
+Usage: ./bench_transport.py [-n REQUESTS]
+"""
+import argparse
+import time
+
+from fake_server import FakeGithubServer
+from transport import PooledTransport, UnpooledTransport, set_transport
+from utils import get_json
+
+
+def run(transport, url: str, n: int) -> float:
+    """Return get_json fetches per second through transport"""
+    previous = set_transport(transport)
+    try:
+        start = time.perf_counter()
+        for _ in range(n):
+            get_json(url)
+        elapsed = time.perf_counter() - start
+    finally:
+        set_transport(previous)
+        transport.close()
+    return n / elapsed
+
+
+def main() -> None:
+    """Entry point"""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("-n", type=int, default=2000,
+                        help="requests per transport")
+    args = parser.parse_args()
+
+    with FakeGithubServer({"/orgs/google": {"login": "google"}}) as server:
+        url = server.url("/orgs/google")
+        for name, transport in (("unpooled", UnpooledTransport()),
+                                ("pooled", PooledTransport())):
+            before = server.connection_count
+            rate = run(transport, url, args.n)
+            print("{:<9} {:>9.1f} fetches/s {:>6} connections".format(
+                name, rate, server.connection_count - before))
+
+
+if __name__ == "__main__":
+    main()
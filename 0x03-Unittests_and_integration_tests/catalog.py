@@ -0,0 +1,274 @@
+#!/usr/bin/env python3
+"""Persistent SQLite catalog of orgs and their repos.
+
+The catalog keeps each org payload and, for every repo, its full payload
+next to indexed columns (org, name, license key, language, star count),
+so public_repos-style questions are answered from disk without network
+and a new process starts from the stored repos instead of refetching.
+Setting ``GithubOrgClient.catalog`` makes every client read the catalog
+when it holds nothing yet and write back what it fetches. Repos written
+by a compact client hold only the projected keys; they are marked as
+such, and clients wanting full payloads refetch instead of reading them.
+Example
+-------
+>>> GithubOrgClient.catalog = RepoCatalog("~/.cache/gh/catalog.db")
+>>> GithubOrgClient("google").public_repos()
+>>> GithubOrgClient.catalog.public_repos("google", license="mit")
+>>> GithubOrgClient.catalog.top_repos(10, language="Go")
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import (
+    Any,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Mapping,
+    Optional,
+    Tuple,
+)
+
+from utils import extract_columns
+
+__all__ = [
+    "RepoCatalog",
+]
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS orgs (
+    login TEXT PRIMARY KEY,
+    payload TEXT NOT NULL,
+    repos_synced_at REAL,
+    repos_projected INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS repos (
+    org TEXT NOT NULL,
+    name TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    id INTEGER,
+    license_key TEXT,
+    language TEXT,
+    stargazers_count INTEGER,
+    forks_count INTEGER,
+    fork INTEGER,
+    archived INTEGER,
+    updated_at TEXT,
+    pushed_at TEXT,
+    payload TEXT NOT NULL,
+    PRIMARY KEY (org, name)
+);
+CREATE INDEX IF NOT EXISTS repos_name ON repos (name);
+CREATE INDEX IF NOT EXISTS repos_license ON repos (license_key, org);
+CREATE INDEX IF NOT EXISTS repos_language ON repos (language);
+CREATE INDEX IF NOT EXISTS repos_stars ON repos (stargazers_count);
+"""
+
+# indexed columns and the repo payload paths they are filled from
+_COLUMNS: Tuple[Tuple[str, Tuple[str, ...]], ...] = (
+    ("name", ("name",)),
+    ("id", ("id",)),
+    ("license_key", ("license", "key")),
+    ("language", ("language",)),
+    ("stargazers_count", ("stargazers_count",)),
+    ("forks_count", ("forks_count",)),
+    ("fork", ("fork",)),
+    ("archived", ("archived",)),
+    ("updated_at", ("updated_at",)),
+    ("pushed_at", ("pushed_at",)),
+)
+
+# keep the stored position of a known repo, append a new one at the end
+_UPSERT = """
+INSERT OR REPLACE INTO repos (org, position, {columns}, payload)
+VALUES (?1, COALESCE(
+    (SELECT position FROM repos WHERE org = ?1 AND name = ?2),
+    (SELECT COALESCE(MAX(position), -1) + 1 FROM repos WHERE org = ?1)),
+    {values})
+""".format(columns=", ".join(name for name, _ in _COLUMNS),
+           values=", ".join("?{}".format(i + 2)
+                            for i in range(len(_COLUMNS) + 1)))
+
+
+def _dumps(repo: Mapping) -> str:
+    """repo as compact JSON; going through items() lets a keep_raw Repo
+    decode its payload once rather than once per key"""
+    if not isinstance(repo, Mapping):
+        raise TypeError("repo payloads are mappings, not {}".format(
+            type(repo).__name__))
+    return json.dumps(dict(repo.items()), separators=(",", ":"))
+
+
+class RepoCatalog:
+    """SQLite store of org and repo payloads with indexed repo columns.
+    Parameters
+    ----------
+    path: str
+        the database file, created if missing; ":memory:" for a
+        throwaway catalog
+    batch_size: int
+        repos written per statement; upsert_repos also commits each
+        batch in its own transaction
+    """
+
+    def __init__(self, path: str = ":memory:",
+                 batch_size: int = 1000) -> None:
+        """Init method of RepoCatalog"""
+        if path != ":memory:":
+            path = os.path.expanduser(path)
+        self.path = path
+        self.batch_size = batch_size
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False,
+                                   isolation_level=None)
+        self._db.execute("PRAGMA journal_mode = WAL")
+        self._db.execute("PRAGMA synchronous = NORMAL")
+        self._db.executescript(_SCHEMA)
+
+    def upsert_org(self, login: str, payload: Mapping) -> None:
+        """Store the payload of org login"""
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO orgs (login, payload, "
+                "repos_synced_at, repos_projected) VALUES (?1, ?2, "
+                "(SELECT repos_synced_at FROM orgs WHERE login = ?1), "
+                "COALESCE((SELECT repos_projected FROM orgs "
+                "WHERE login = ?1), 0))",
+                (login, json.dumps(dict(payload))))
+
+    def org(self, login: str) -> Optional[Dict]:
+        """The stored payload of org login, None if unknown"""
+        row = self._fetchone("SELECT payload FROM orgs WHERE login = ?",
+                             (login,))
+        return None if row is None else json.loads(row[0])
+
+    def orgs(self) -> List[str]:
+        """Logins of every stored org"""
+        return [login for login, in self._fetchall(
+            "SELECT login FROM orgs ORDER BY login")]
+
+    def replace_repos(self, org: str, repos: Iterable[Mapping],
+                      projected: bool = False) -> None:
+        """Store repos as the complete repo list of org, atomically;
+        projected marks them as holding only some of their keys"""
+        with self._lock, self._transaction():
+            self._db.execute("DELETE FROM repos WHERE org = ?", (org,))
+            repos = list(repos)
+            for start in range(0, len(repos), self.batch_size):
+                self._write(org, repos[start:start + self.batch_size])
+            self._mark_synced(org, projected, True)
+
+    def upsert_repos(self, org: str, repos: Iterable[Mapping],
+                     projected: bool = False) -> None:
+        """Insert or update repos of org, keeping the others; each batch
+        of batch_size repos is committed in its own transaction"""
+        repos = list(repos)
+        for start in range(0, len(repos), self.batch_size):
+            with self._lock, self._transaction():
+                self._write(org, repos[start:start + self.batch_size])
+        with self._lock, self._transaction():
+            self._mark_synced(org, projected, False)
+
+    def repos(self, org: str,
+              projected: bool = False) -> Optional[List[Dict]]:
+        """Stored repo payloads of org in listing order, None if its repos
+        were never stored, or if some were stored projected and projected
+        (accept partial payloads) is false"""
+        row = self._fetchone(
+            "SELECT repos_synced_at, repos_projected FROM orgs "
+            "WHERE login = ?", (org,))
+        if row is None or row[0] is None or (row[1] and not projected):
+            return None
+        return [json.loads(payload) for payload, in self._fetchall(
+            "SELECT payload FROM repos WHERE org = ? ORDER BY position",
+            (org,))]
+
+    def public_repos(self, org: str, license: str = None) -> List[str]:
+        """Names of the stored repos of org, optionally by license key"""
+        if license is None:
+            rows = self._fetchall(
+                "SELECT name FROM repos WHERE org = ? ORDER BY position",
+                (org,))
+        else:
+            rows = self._fetchall(
+                "SELECT name FROM repos WHERE license_key = ? AND org = ? "
+                "ORDER BY position", (license, org))
+        return [name for name, in rows]
+
+    def top_repos(self, n: int, org: str = None,
+                  language: str = None) -> List[Tuple[str, str, int]]:
+        """(org, name, stars) of the n most starred stored repos"""
+        where, args = [], []
+        if org is not None:
+            where.append("org = ?")
+            args.append(org)
+        if language is not None:
+            where.append("language = ?")
+            args.append(language)
+        sql = "SELECT org, name, stargazers_count FROM repos"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += " ORDER BY stargazers_count DESC, org, position LIMIT ?"
+        return self._fetchall(sql, args + [n])
+
+    def license_counts(self, org: str = None) -> Dict[Optional[str], int]:
+        """Number of stored repos per license key"""
+        sql = "SELECT license_key, COUNT(*) FROM repos"
+        args: Tuple = ()
+        if org is not None:
+            sql += " WHERE org = ?"
+            args = (org,)
+        return dict(self._fetchall(sql + " GROUP BY license_key", args))
+
+    def close(self) -> None:
+        """Close the database"""
+        with self._lock:
+            self._db.close()
+
+    def __enter__(self) -> "RepoCatalog":
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.close()
+
+    @contextmanager
+    def _transaction(self) -> Iterator[None]:
+        self._db.execute("BEGIN")
+        try:
+            yield
+        except BaseException:
+            self._db.execute("ROLLBACK")
+            raise
+        self._db.execute("COMMIT")
+
+    def _write(self, org: str, repos: List[Mapping]) -> None:
+        """Upsert repos with one statement"""
+        columns = extract_columns(repos, [path for _, path in _COLUMNS])
+        payloads = [_dumps(repo) for repo in repos]
+        self._db.executemany(_UPSERT, [
+            (org,) + row for row in zip(*columns, payloads)])
+
+    def _mark_synced(self, org: str, projected: bool,
+                     replaced: bool) -> None:
+        """Record that the repos of org are stored, and whether any of
+        them is a projection"""
+        self._db.execute(
+            "INSERT OR IGNORE INTO orgs (login, payload) VALUES (?, '{}')",
+            (org,))
+        self._db.execute(
+            "UPDATE orgs SET repos_synced_at = ?, repos_projected = {} "
+            "WHERE login = ?".format("?" if replaced
+                                     else "MAX(repos_projected, ?)"),
+            (time.time(), int(projected), org))
+
+    def _fetchone(self, sql: str, args: Iterable = ()) -> Optional[Tuple]:
+        with self._lock:
+            return self._db.execute(sql, tuple(args)).fetchone()
+
+    def _fetchall(self, sql: str, args: Iterable = ()) -> List[Tuple]:
+        with self._lock:
+            return self._db.execute(sql, tuple(args)).fetchall()
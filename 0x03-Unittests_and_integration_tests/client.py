@@ -1,45 +1,305 @@
 #!/usr/bin/env python3
 """A github org client
 """
+from operator import attrgetter
 from typing import (
+    TYPE_CHECKING,
+    Any,
+    Callable,
     List,
     Dict,
+    Iterable,
+    Iterator,
+    Mapping,
+    Optional,
+    Sequence,
+    Tuple,
+    Union,
 )
 
+from query import Field, Predicate, Query, RepoIndex
+from repo import Repo
 from utils import (
+    LRUCache,
     get_json,
-    access_nested_map,
+    get_json_pages,
+    compile_path,
+    extract_columns,
     memoize,
+    set_memoized,
 )
 
+if TYPE_CHECKING:
+    from catalog import RepoCatalog
+
+_license_key = compile_path(("license", "key"))
+_ttl = attrgetter("_ttl")
+
+
+def _repo_key(repo: Mapping) -> Any:
+    """Identity of a repo across listings: its id, else its name"""
+    key = repo.get("id")
+    return repo["name"] if key is None else key
+
 
 class GithubOrgClient:
     """A Githib org client
     """
     ORG_URL = "https://api.github.com/orgs/{org}"
+    REPO_FIELDS = (("name",), ("license", "key"))
+    # sync orders: value of the listing's sort parameter -> watermark field
+    SYNC_FIELDS = {"updated": "updated_at", "pushed": "pushed_at"}
+    # opt-in process-wide cache of org and repos payloads shared by every
+    # instance, e.g. GithubOrgClient.shared_cache = LRUCache(1024, ttl=60)
+    shared_cache: Optional[LRUCache] = None
+    # opt-in persistent store read on a cold start and written after each
+    # fetch, e.g. GithubOrgClient.catalog = RepoCatalog("catalog.db")
+    catalog: Optional["RepoCatalog"] = None
+
+    def __init__(self, org_name: str, ttl: float = None,
+                 compact: bool = False, keep_raw: bool = False,
+                 incremental: bool = False) -> None:
+        """Init method of GithubOrgClient
 
-    def __init__(self, org_name: str) -> None:
-        """Init method of GithubOrgClient"""
+        With a ttl, org and repos_payload go stale after ttl seconds and
+        are refreshed in the background while the stale copy is served;
+        with incremental, those refreshes only fetch what changed (see
+        sync). With compact, repos_payload holds Repo records instead of
+        dicts; keep_raw also keeps each full payload, as compact JSON
+        bytes.
+        """
         self._org_name = org_name
+        self._ttl = ttl
+        self._compact = compact
+        self._keep_raw = keep_raw
+        self._incremental = incremental
+
+    def _get_json(self, key: Tuple, url: str,
+                  load: Callable[[str], Any] = None,
+                  refresh: bool = False) -> Any:
+        """load(url), get_json by default, through shared_cache when one
+        is set; a refresh skips the cached copy, which may be the very
+        value being refreshed, and replaces it"""
+        if load is None:
+            load = get_json
+        cache = self.shared_cache
+        if cache is None:
+            return load(url)
+        payload = None if refresh else cache.get(key)
+        if payload is None:
+            payload = load(url)
+            cache.set(key, payload)
+        return payload
 
-    @memoize
+    @memoize(ttl=_ttl, stale_while_revalidate=True, single_flight=True)
     def org(self) -> Dict:
         """Memoize org"""
-        return get_json(self.ORG_URL.format(org=self._org_name))
+        catalog = self.catalog
+        cold = "_org" not in self.__dict__
+
+        def load(url: str) -> Dict:
+            if catalog is not None and cold:
+                org = catalog.org(self._org_name)
+                if org:
+                    return org
+            org = get_json(url)
+            if catalog is not None:
+                catalog.upsert_org(self._org_name, org)
+            return org
+        return self._get_json(("org", self._org_name),
+                              self.ORG_URL.format(org=self._org_name), load,
+                              refresh=not cold)
 
     @property
     def _public_repos_url(self) -> str:
         """Public repos URL"""
         return self.org["repos_url"]
 
-    @memoize
+    @memoize(ttl=_ttl, stale_while_revalidate=True, single_flight=True)
     def repos_payload(self) -> Dict:
         """Memoize repos payload"""
-        return get_json(self._public_repos_url)
+        held = self.__dict__.get("_repos_payload")
+        if self._incremental and held is not None:
+            return self._merge_changes(held)[0]
+        catalog = self.catalog
+        fields = self._repo_fields()
+
+        # the catalog sits behind shared_cache, so that clients sharing a
+        # process share decoded repos instead of each reading the catalog
+        def load(url: str) -> List:
+            if catalog is not None and held is None:
+                stored = catalog.repos(self._org_name,
+                                       projected=fields is not None)
+                if stored is not None:
+                    return self._wrap_repos(stored)
+            if self._compact:
+                repos = self._wrap_repos(get_json(url, fields))
+            else:
+                repos = get_json(url)
+            if catalog is not None:
+                catalog.replace_repos(self._org_name, repos,
+                                      projected=fields is not None)
+            return repos
+        url = self._public_repos_url
+        return self._get_json(self._repos_key(url), url, load,
+                              refresh=held is not None)
+
+    def _repos_key(self, url: str) -> Tuple:
+        """shared_cache key of the repos listing at url"""
+        return ("repos", url, self._keep_raw) if self._compact else (
+            "repos", url)
+
+    def _repo_fields(self) -> Optional[Tuple]:
+        """Fields to decode repos on, None for every field"""
+        return Repo.PATHS if self._compact and not self._keep_raw else None
+
+    def _wrap_repos(self, repos: Iterable[Dict]) -> List:
+        """repos as held in repos_payload"""
+        if not self._compact:
+            return list(repos)
+        return [Repo(repo, self._keep_raw) for repo in repos]
+
+    def sync(self, sort: str = "updated",
+             per_page: int = 100) -> List[Mapping]:
+        """Fetch only the repos changed since the last fetch and merge
+        them into repos_payload; return the changed repos.
 
-    def public_repos(self, license: str = None) -> List[str]:
-        """Public repos"""
-        json_payload = self.repos_payload
+        Repos are listed most recently updated (or pushed, with sort
+        "pushed") first, and paging stops at the first repo older than
+        the newest one held, so a sync costs one page per per_page
+        changes. Changed repos replace their held copies in place; new
+        ones are appended. Deleted or transferred repos are only dropped
+        by a full refetch (``invalidate_memoized(client,
+        "repos_payload")``). Without held repos, pages through the whole
+        listing in that order and returns every repo.
+        """
+        held = self.__dict__.get("_repos_payload")
+        if held is None:
+            merged = changed = self._wrap_repos(
+                self._list_changes(None, sort, per_page))
+            if self.catalog is not None:
+                self.catalog.replace_repos(
+                    self._org_name, merged,
+                    projected=self._repo_fields() is not None)
+        else:
+            merged, changed = self._merge_changes(held, sort, per_page)
+        set_memoized(self, "repos_payload", merged)
+        if self.shared_cache is not None:
+            self.shared_cache.set(self._repos_key(self._public_repos_url),
+                                  merged)
+        return list(changed)
+
+    def _list_changes(self, watermark: Optional[str], sort: str,
+                      per_page: int) -> List[Mapping]:
+        """Repos listed newest first down to watermark (every repo when
+        it is None), each once"""
+        field = self.SYNC_FIELDS[sort]
+        url = self._public_repos_url
+        url += "{}sort={}&direction=desc&per_page={}".format(
+            "&" if "?" in url else "?", sort, per_page)
+        changed = []
+        seen = set()
+        for page in get_json_pages(url, self._repo_fields()):
+            for repo in page:
+                # timestamps have a resolution of a second: repos at the
+                # watermark may have changed since, so refetch them too
+                stamp = repo.get(field)
+                if watermark is not None and (stamp is None
+                                              or stamp < watermark):
+                    break
+                # a repo updated while paging shows up again on a later
+                # page; its first, newest copy wins
+                key = _repo_key(repo)
+                if key not in seen:
+                    seen.add(key)
+                    changed.append(repo)
+            else:
+                continue
+            break
+        return changed
+
+    def _merge_changes(self, held: List[Mapping], sort: str = "updated",
+                       per_page: int = 100) -> Tuple[List, List]:
+        """(held with changed repos merged in, changed repos)"""
+        field = self.SYNC_FIELDS[sort]
+        watermark = max((repo[field] for repo in held
+                         if repo.get(field) is not None), default=None)
+        changed = self._list_changes(watermark, sort, per_page)
+
+        merged = list(held)
+        positions = {_repo_key(repo): i for i, repo in enumerate(merged)}
+        updates = []
+        for repo in reversed(self._wrap_repos(changed)):
+            key = _repo_key(repo)
+            position = positions.get(key)
+            if position is None:
+                positions[key] = len(merged)
+                merged.append(repo)
+            elif merged[position] == repo:
+                continue
+            else:
+                merged[position] = repo
+            updates.append(repo)
+        if not updates:
+            # keep the held list, and the indexes built over it
+            return held, updates
+        updates.reverse()
+        if self.catalog is not None:
+            self.catalog.upsert_repos(
+                self._org_name, updates,
+                projected=self._repo_fields() is not None)
+        return merged, updates
+
+    def iter_repos(self, per_page: int = None,
+                   fields: Iterable[Sequence] = None) -> Iterator[Dict]:
+        """Lazily yield repos from every page, projected on fields"""
+        url = self._public_repos_url
+        if per_page is not None:
+            url += "{}per_page={}".format("&" if "?" in url else "?",
+                                          per_page)
+        for page in get_json_pages(url, fields):
+            yield from page
+
+    def _license_index(self) -> Dict[Optional[str], List[str]]:
+        """License key -> repo names, rebuilt only when the payload changes"""
+        payload = self.repos_payload
+        cached = self.__dict__.get("_license_index_cache")
+        if cached is not None and cached[0] is payload:
+            return cached[1]
+        index: Dict[Optional[str], List[str]] = {}
+        keys, names = extract_columns(payload, [("license", "key"),
+                                                ("name",)])
+        for key, name in zip(keys, names):
+            index.setdefault(key, []).append(name)
+        self._license_index_cache = (payload, index)
+        return index
+
+    def repos_by_license(self) -> Dict[Optional[str], List[str]]:
+        """Repo names grouped by license key; None groups unlicensed repos"""
+        return {key: list(names)
+                for key, names in self._license_index().items()}
+
+    def query(self, where: Union[Field, Predicate] = None) -> Query:
+        """Query repos_payload through indexes built lazily per field.
+        Example
+        -------
+        >>> stars = Field("stargazers_count")
+        >>> client.query((Field("language") == "Go") & (stars > 10)).names()
+        >>> client.query(~Field("archived")).top(5, "stargazers_count")
+        """
+        payload = self.repos_payload
+        index = self.__dict__.get("_repo_index")
+        if index is None or index.repos is not payload:
+            index = self._repo_index = RepoIndex(payload)
+        return index.query(where)
+
+    def public_repos(self, license: str = None,
+                     stream: bool = False) -> List[str]:
+        """Public repos, streamed page by page when stream is set"""
+        if license is not None and not stream:
+            return list(self._license_index().get(license, ()))
+        json_payload = (self.iter_repos(fields=self.REPO_FIELDS) if stream
+                        else self.repos_payload)
         public_repos = [
             repo["name"] for repo in json_payload
             if license is None or self.has_license(repo, license)
@@ -47,12 +307,42 @@ class GithubOrgClient:
 
         return public_repos
 
+    @classmethod
+    def bulk_public_repos(
+        cls, orgs: Iterable[str], license: str = None, max_workers: int = 8,
+        return_exceptions: bool = False,
+    ) -> Iterator[Tuple[str, Union[List[str], Exception]]]:
+        """Yield (org, public_repos) pairs as each org completes.
+
+        Orgs are fetched on a pool of max_workers threads that share the
+        transport behind get_json; size its pool to match, e.g.
+        ``set_transport(PooledTransport(pool_maxsize=max_workers))``.
+        A failing org re-raises, or is yielded as (org, exception) when
+        return_exceptions is set.
+        """
+        from concurrent.futures import ThreadPoolExecutor, as_completed
+
+        def work(org_name: str) -> List[str]:
+            return cls(org_name).public_repos(license)
+
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            futures = {pool.submit(work, org): org for org in orgs}
+            try:
+                for future in as_completed(futures):
+                    error = future.exception()
+                    if error is not None and not return_exceptions:
+                        raise error
+                    yield futures[future], error or future.result()
+            finally:
+                for future in futures:
+                    future.cancel()
+
     @staticmethod
     def has_license(repo: Dict[str, Dict], license_key: str) -> bool:
         """Static: has_license"""
         assert license_key is not None, "license_key cannot be None"
         try:
-            has_license = access_nested_map(repo, ("license", "key")) == license_key
+            has_license = _license_key(repo) == license_key
         except KeyError:
             return False
         return has_license
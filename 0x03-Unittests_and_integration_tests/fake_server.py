@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+"""Local HTTP/1.1 stand-in for the GitHub API, used by tests and benchmarks.
+"""
+import json
+import math
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Mapping,
+    Optional,
+    Tuple,
+)
+
+__all__ = [
+    "FakeGithubServer",
+    "json_body",
+]
+
+RouteResult = Tuple[int, Dict[str, str], bytes]
+RouteHandler = Callable[[str, Mapping[str, str]], RouteResult]
+
+
+def json_body(payload: Any) -> bytes:
+    """Encode payload the way the server sends it"""
+    return json.dumps(payload).encode("utf-8")
+
+
+class FakeGithubServer:
+    """Serve canned payloads on 127.0.0.1 with keep-alive connections.
+
+    Routes map a path (optionally with its query string) to either a JSON
+    serializable payload, answered with 200, or a callable taking
+    ``(path, headers)`` and returning ``(status, headers, body)``.
+    With a quota, at most quota requests are answered per window seconds
+    of clock(); every response carries ``X-RateLimit-*`` headers and
+    requests over the quota get GitHub's 403 "rate limit exceeded".
+    With compress, bodies are gzipped for clients that accept gzip.
+    Example
+    -------
+    >>> with FakeGithubServer({"/orgs/google": {"login": "google"}}) as srv:
+    ...     get_json(srv.url("/orgs/google"))
+    {'login': 'google'}
+    """
+
+    def __init__(self, routes: Optional[Mapping[str, Any]] = None,
+                 latency: float = 0.0, quota: Optional[int] = None,
+                 window: float = 3600.0,
+                 clock: Callable[[], float] = time.time,
+                 compress: bool = False) -> None:
+        """Init method of FakeGithubServer"""
+        self.routes = dict(routes or {})
+        self.latency = latency
+        self.compress = compress
+        self.quota = quota
+        self.window = window
+        self.clock = clock
+        self.request_count = 0
+        self.connection_count = 0
+        self.rejected_count = 0
+        self._used = 0
+        self._reset = None
+        self._lock = threading.Lock()
+        self._httpd = None
+        self._thread = None
+
+    def route(self, path: str, payload: Any) -> None:
+        """Register payload (or a handler) for path"""
+        self.routes[path] = payload
+
+    def url(self, path: str = "") -> str:
+        """Absolute URL of path on this server"""
+        host, port = self._httpd.server_address[:2]
+        return "http://{}:{}{}".format(host, port, path)
+
+    def start(self) -> "FakeGithubServer":
+        """Start serving in a background thread"""
+        self._httpd = ThreadingHTTPServer(("127.0.0.1", 0),
+                                          self._handler_class())
+        self._httpd.daemon_threads = True
+        self._thread = threading.Thread(target=self._httpd.serve_forever,
+                                        args=(0.01,), daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        """Stop serving and release the socket"""
+        if self._httpd is not None:
+            self._httpd.shutdown()
+            self._httpd.server_close()
+            self._thread.join()
+            self._httpd = None
+
+    def __enter__(self) -> "FakeGithubServer":
+        return self.start()
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.stop()
+
+    def _spend_quota(self) -> Tuple[bool, Dict[str, str]]:
+        """Count a request against the quota; return (allowed, headers)"""
+        with self._lock:
+            now = self.clock()
+            if self._reset is None or now >= self._reset:
+                # fixed windows, aligned like GitHub's hourly ones
+                self._reset = (now // self.window + 1) * self.window
+                self._used = 0
+            allowed = self._used < self.quota
+            if allowed:
+                self._used += 1
+            else:
+                self.rejected_count += 1
+            return allowed, {
+                "X-RateLimit-Limit": str(self.quota),
+                "X-RateLimit-Remaining": str(self.quota - self._used),
+                "X-RateLimit-Reset": str(math.ceil(self._reset)),
+            }
+
+    def _resolve(self, path: str,
+                 headers: Mapping[str, str]) -> RouteResult:
+        """Answer a GET for path"""
+        if self.latency:
+            time.sleep(self.latency)
+        if self.quota is not None:
+            allowed, limits = self._spend_quota()
+            if not allowed:
+                return 403, limits, json_body(
+                    {"message": "API rate limit exceeded"})
+            status, extra, body = self._route(path, headers)
+            return status, dict(extra, **limits), body
+        return self._route(path, headers)
+
+    def _route(self, path: str,
+               headers: Mapping[str, str]) -> RouteResult:
+        route = self.routes.get(path)
+        if route is None:
+            route = self.routes.get(path.split("?", 1)[0])
+        if route is None:
+            return 404, {}, json_body({"message": "Not Found"})
+        if callable(route):
+            return route(path, headers)
+        return 200, {}, json_body(route)
+
+    def _handler_class(self) -> type:
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            """Request handler bound to this server"""
+            protocol_version = "HTTP/1.1"
+            disable_nagle_algorithm = True
+
+            def setup(self) -> None:
+                super().setup()
+                with server._lock:
+                    server.connection_count += 1
+
+            def do_GET(self) -> None:
+                with server._lock:
+                    server.request_count += 1
+                headers = {k.lower(): v for k, v in self.headers.items()}
+                status, extra, body = server._resolve(self.path, headers)
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                if server.compress and "gzip" in headers.get(
+                        "accept-encoding", ""):
+                    gzip = zlib.compressobj(wbits=31)
+                    body = gzip.compress(body) + gzip.flush()
+                    self.send_header("Content-Encoding", "gzip")
+                for name, value in extra.items():
+                    self.send_header(name, value)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                try:
+                    self.wfile.write(body)
+                except (BrokenPipeError, ConnectionResetError):
+                    pass  # the client gave up, e.g. on a read deadline
+
+            def log_message(self, *args: Any) -> None:
+                """Keep test output quiet"""
+
+        return Handler
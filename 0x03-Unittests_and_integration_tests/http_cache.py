@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+"""Revalidating on-disk HTTP cache for get_json.
+
+``CachingTransport`` wraps another transport. Responses that carry an
+``ETag`` or ``Last-Modified`` validator are stored on disk, one file per
+URL; later requests for that URL are sent conditionally and a ``304 Not
+Modified`` answer is served from the stored body. The directory is kept
+under ``max_bytes`` by evicting the least recently used entries.
+Example
+-------
+>>> set_transport(CachingTransport(PooledTransport(), "~/.cache/gh"))
+"""
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from typing import (
+    Any,
+    Dict,
+    Mapping,
+    Optional,
+)
+
+from transport import Response
+
+__all__ = [
+    "CachingTransport",
+]
+
+_SUFFIX = ".entry"
+
+
+class CachingTransport:
+    """Transport wrapper adding an ETag/Last-Modified revalidating cache.
+    Parameters
+    ----------
+    transport: transport
+        the transport performing the actual requests
+    directory: str
+        where entries are stored; created if missing
+    max_bytes: int
+        upper bound on the total size of stored entries
+    """
+
+    def __init__(self, transport: Any, directory: str,
+                 max_bytes: int = 64 * 1024 * 1024) -> None:
+        """Init method of CachingTransport"""
+        self.transport = transport
+        self.directory = os.path.expanduser(directory)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._sizes = OrderedDict()
+        self._total = 0
+        os.makedirs(self.directory, exist_ok=True)
+        self._load_index()
+
+    def get(self, url: str,
+            headers: Optional[Mapping[str, str]] = None) -> Response:
+        """GET url, revalidating a stored copy when there is one"""
+        entry = self._read(url)
+        request_headers = dict(headers or {})
+        if entry is not None:
+            meta = entry[0]
+            if meta.get("etag"):
+                request_headers["If-None-Match"] = meta["etag"]
+            if meta.get("last_modified"):
+                request_headers["If-Modified-Since"] = meta["last_modified"]
+
+        response = self.transport.get(url, headers=request_headers or None)
+        if response.status_code == 304 and entry is not None:
+            meta, body = entry
+            with self._lock:
+                self.hits += 1
+                self._touch(self._key(url))
+            return Response(url, meta["status"], meta["headers"], body,
+                            wire_size=response.wire_size)
+
+        with self._lock:
+            self.misses += 1
+        if response.status_code == 200:
+            self._store(url, response)
+        return response
+
+    def clear(self) -> None:
+        """Remove every stored entry"""
+        with self._lock:
+            for key in list(self._sizes):
+                self._remove(key)
+
+    def close(self) -> None:
+        """Close the wrapped transport"""
+        self.transport.close()
+
+    @property
+    def size(self) -> int:
+        """Total bytes currently stored"""
+        return self._total
+
+    def _key(self, url: str) -> str:
+        return hashlib.sha1(url.encode("utf-8")).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key + _SUFFIX)
+
+    def _load_index(self) -> None:
+        """Rebuild the LRU order from the entries already on disk"""
+        found = []
+        for name in os.listdir(self.directory):
+            if name.endswith(_SUFFIX):
+                stat = os.stat(os.path.join(self.directory, name))
+                found.append((stat.st_mtime, name[:-len(_SUFFIX)],
+                              stat.st_size))
+        for _, key, size in sorted(found):
+            self._sizes[key] = size
+            self._total += size
+
+    def _read(self, url: str) -> Optional[tuple]:
+        """Return (meta, body) stored for url, or None"""
+        key = self._key(url)
+        if key not in self._sizes:
+            return None
+        try:
+            with open(self._path(key), "rb") as f:
+                meta = json.loads(f.readline())
+                body = f.read()
+        except (OSError, ValueError):
+            with self._lock:
+                self._remove(key)
+            return None
+        if meta.get("url") != url:
+            return None
+        return meta, body
+
+    def _store(self, url: str, response: Response) -> None:
+        """Persist response if it carries a validator and fits"""
+        etag = response.headers.get("etag")
+        last_modified = response.headers.get("last-modified")
+        cache_control = response.headers.get("cache-control", "")
+        if not (etag or last_modified) or "no-store" in cache_control:
+            return
+        meta: Dict[str, Any] = {
+            "url": url,
+            "status": response.status_code,
+            "headers": response.headers,
+            "etag": etag,
+            "last_modified": last_modified,
+        }
+        data = json.dumps(meta).encode("utf-8") + b"\n" + response.content
+        if len(data) > self.max_bytes:
+            return
+
+        key = self._key(url)
+        path = self._path(key)
+        tmp = "{}.{}.tmp".format(path, threading.get_ident())
+        with open(tmp, "wb") as f:
+            f.write(data)
+        with self._lock:
+            os.replace(tmp, path)
+            self._total += len(data) - self._sizes.pop(key, 0)
+            self._sizes[key] = len(data)
+            while self._total > self.max_bytes:
+                self._remove(next(iter(self._sizes)))
+                self.evictions += 1
+
+    def _touch(self, key: str) -> None:
+        """Mark key as most recently used, in memory and on disk"""
+        if key in self._sizes:
+            self._sizes.move_to_end(key)
+            try:
+                os.utime(self._path(key))
+            except OSError:
+                pass
+
+    def _remove(self, key: str) -> None:
+        self._total -= self._sizes.pop(key, 0)
+        try:
+            os.remove(self._path(key))
+        except OSError:
+            pass
@@ -0,0 +1,266 @@
+#!/usr/bin/env python3
+"""Instrumentation for get_json and memoize.
+
+Nothing is recorded until a sink is installed with ``set_sink``; until
+then instrumented code pays one ``metrics.sink is None`` check. A sink is
+any object with ``inc(name, labels, value=1)`` and ``observe(name, value,
+labels)``, labels being a tuple of (name, value) pairs. ``MetricsRegistry``
+is an in-memory sink with counters and histograms that renders the
+Prometheus text format; ``FanoutSink`` forwards to several sinks.
+
+Recorded metrics:
+    get_json_requests_total{endpoint, status}    counter
+    get_json_errors_total{endpoint, error}       counter
+    get_json_seconds{endpoint}                   histogram, whole call
+    get_json_network_seconds{endpoint}           histogram, reading
+    get_json_decode_seconds{endpoint}            histogram, decoding
+    get_json_response_bytes{endpoint}            histogram, body size
+    get_json_wire_bytes{endpoint}                histogram, compressed size
+    memoize_hits_total{name}, memoize_misses_total{name}    counters
+Endpoints are URL paths with org, user and repo names replaced by
+placeholders, e.g. ``/orgs/{org}/repos``.
+Example
+-------
+>>> registry = MetricsRegistry()
+>>> set_sink(registry)
+>>> GithubOrgClient("google").public_repos()
+>>> print(registry.prometheus())
+"""
+import math
+import threading
+from bisect import bisect_left
+from typing import (
+    Any,
+    Dict,
+    List,
+    Mapping,
+    Optional,
+    Sequence,
+    Tuple,
+)
+from urllib.parse import urlsplit
+
+__all__ = [
+    "FanoutSink",
+    "MetricsRegistry",
+    "endpoint",
+    "get_sink",
+    "set_sink",
+]
+
+Labels = Tuple[Tuple[str, str], ...]
+
+SECONDS_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1,
+                   0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+BYTES_BUCKETS = tuple(4.0 ** i * 256 for i in range(10))
+
+# the installed sink; read directly by instrumented code
+sink: Any = None
+_PLACEHOLDERS = {
+    "orgs": ("{org}",),
+    "users": ("{user}",),
+    "repos": ("{owner}", "{repo}"),
+}
+
+
+def set_sink(new_sink: Any) -> Any:
+    """Install new_sink (None disables metrics); return the previous one
+    """
+    global sink
+    previous, sink = sink, new_sink
+    return previous
+
+
+def get_sink() -> Any:
+    """The installed sink, None when metrics are disabled"""
+    return sink
+
+
+def endpoint(url: str) -> str:
+    """The path of url with names replaced by placeholders.
+    Example
+    -------
+    >>> endpoint("https://api.github.com/orgs/google/repos?page=2")
+    '/orgs/{org}/repos'
+    """
+    segments = urlsplit(url).path.split("/")
+    if len(segments) > 2:
+        for i, placeholder in enumerate(_PLACEHOLDERS.get(segments[1], ())):
+            if i + 2 < len(segments):
+                segments[i + 2] = placeholder
+    return "/".join(segments) or "/"
+
+
+class _Histogram:
+    """Cumulative-bucket histogram"""
+    __slots__ = ("bounds", "counts", "sum", "count")
+
+    def __init__(self, bounds: Sequence[float]) -> None:
+        self.bounds = tuple(bounds)
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q: float) -> float:
+        """Upper bound of the bucket holding the q-quantile"""
+        if not self.count:
+            return math.nan
+        rank, seen = q * self.count, 0
+        for bound, count in zip(self.bounds + (math.inf,), self.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return math.inf
+
+
+def _format_labels(labels: Labels) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join('{}="{}"'.format(
+        name, str(value).replace("\\", "\\\\").replace('"', '\\"')
+        .replace("\n", "\\n")) for name, value in labels) + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+class MetricsRegistry:
+    """Thread-safe in-memory sink of counters and histograms.
+    Parameters
+    ----------
+    buckets: Mapping[str, Sequence[float]]
+        histogram bucket bounds by metric name; metrics not listed use
+        BYTES_BUCKETS when their name ends in "_bytes", else
+        SECONDS_BUCKETS
+    """
+
+    def __init__(self,
+                 buckets: Optional[Mapping[str, Sequence[float]]] = None
+                 ) -> None:
+        """Init method of MetricsRegistry"""
+        self.buckets = dict(buckets or {})
+        self._lock = threading.Lock()
+        self._counters: Dict[str, Dict[Labels, float]] = {}
+        self._histograms: Dict[str, Dict[Labels, _Histogram]] = {}
+
+    def inc(self, name: str, labels: Labels = (), value: float = 1) -> None:
+        """Add value to counter name"""
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            series[labels] = series.get(labels, 0) + value
+
+    def observe(self, name: str, value: float, labels: Labels = ()) -> None:
+        """Record value in histogram name"""
+        with self._lock:
+            series = self._histograms.setdefault(name, {})
+            histogram = series.get(labels)
+            if histogram is None:
+                histogram = series[labels] = _Histogram(self._bounds(name))
+            histogram.observe(value)
+
+    def counter(self, metric: str, **labels: str) -> float:
+        """Sum of counter metric over the series matching labels"""
+        with self._lock:
+            return sum(value for series_labels, value
+                       in self._counters.get(metric, {}).items()
+                       if _matches(series_labels, labels))
+
+    def histogram(self, metric: str, **labels: str) -> Dict[str, float]:
+        """count, sum, mean, p50, p95 and p99 of histogram metric, merged
+        over the series matching labels"""
+        with self._lock:
+            merged = _Histogram(self._bounds(metric))
+            for series_labels, histogram in self._histograms.get(
+                    metric, {}).items():
+                if _matches(series_labels, labels):
+                    merged.counts = [a + b for a, b in
+                                     zip(merged.counts, histogram.counts)]
+                    merged.sum += histogram.sum
+                    merged.count += histogram.count
+        return {
+            "count": merged.count,
+            "sum": merged.sum,
+            "mean": merged.sum / merged.count if merged.count else math.nan,
+            "p50": merged.quantile(0.5),
+            "p95": merged.quantile(0.95),
+            "p99": merged.quantile(0.99),
+        }
+
+    def hit_ratio(self, name: str = None) -> float:
+        """memoize hits / (hits + misses), for one memoized name or all"""
+        labels = {} if name is None else {"name": name}
+        hits = self.counter("memoize_hits_total", **labels)
+        misses = self.counter("memoize_misses_total", **labels)
+        return hits / (hits + misses) if hits + misses else math.nan
+
+    def clear(self) -> None:
+        """Drop every recorded value"""
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+
+    def prometheus(self) -> str:
+        """Every metric in the Prometheus text exposition format"""
+        lines: List[str] = []
+        with self._lock:
+            for name in sorted(self._counters):
+                lines.append("# TYPE {} counter".format(name))
+                for labels, value in sorted(self._counters[name].items()):
+                    lines.append("{}{} {}".format(
+                        name, _format_labels(labels), _format_value(value)))
+            for name in sorted(self._histograms):
+                lines.append("# TYPE {} histogram".format(name))
+                for labels, histogram in sorted(
+                        self._histograms[name].items()):
+                    cumulative = 0
+                    for bound, count in zip(histogram.bounds + (math.inf,),
+                                            histogram.counts):
+                        cumulative += count
+                        lines.append("{}_bucket{} {}".format(
+                            name, _format_labels(
+                                labels + (("le", _format_value(bound)),)),
+                            cumulative))
+                    lines.append("{}_sum{} {}".format(
+                        name, _format_labels(labels), repr(histogram.sum)))
+                    lines.append("{}_count{} {}".format(
+                        name, _format_labels(labels), histogram.count))
+        return "\n".join(lines) + "\n"
+
+    def _bounds(self, name: str) -> Sequence[float]:
+        bounds = self.buckets.get(name)
+        if bounds is None:
+            bounds = (BYTES_BUCKETS if name.endswith("_bytes")
+                      else SECONDS_BUCKETS)
+        return bounds
+
+
+def _matches(series_labels: Labels, labels: Mapping[str, str]) -> bool:
+    present = dict(series_labels)
+    return all(present.get(k) == v for k, v in labels.items())
+
+
+class FanoutSink:
+    """Sink forwarding every value to each of sinks.
+    """
+
+    def __init__(self, *sinks: Any) -> None:
+        """Init method of FanoutSink"""
+        self.sinks = sinks
+
+    def inc(self, name: str, labels: Labels = (), value: float = 1) -> None:
+        """Forward a counter increment"""
+        for target in self.sinks:
+            target.inc(name, labels, value)
+
+    def observe(self, name: str, value: float, labels: Labels = ()) -> None:
+        """Forward a histogram observation"""
+        for target in self.sinks:
+            target.observe(name, value, labels)
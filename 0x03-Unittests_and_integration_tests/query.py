@@ -0,0 +1,366 @@
+#!/usr/bin/env python3
+"""Indexed queries over repo payloads.
+
+Predicates are built from ``Field`` and combined with ``&``, ``|`` and
+``~``. They are answered from per-field indexes that ``RepoIndex`` builds
+lazily, the first time a field is filtered or sorted on: a hash index for
+equality and a sorted index for ranges and ordering.
+Example
+-------
+>>> index = RepoIndex(repos)
+>>> stars = Field("stargazers_count")
+>>> query = index.query((Field("language") == "Python") & (stars >= 100))
+>>> query.order_by("stargazers_count", descending=True).limit(10).names()
+>>> index.query(~Field("fork")).top(5, "forks")
+"""
+import heapq
+from bisect import bisect_left, bisect_right
+from itertools import islice
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    FrozenSet,
+    Iterable,
+    Iterator,
+    List,
+    Mapping,
+    Optional,
+    Sequence,
+    Tuple,
+    Union,
+)
+
+from utils import extract_columns
+
+__all__ = [
+    "Field",
+    "Predicate",
+    "Query",
+    "RepoIndex",
+]
+
+Path = Tuple[Any, ...]
+_MISSING = object()
+_BOOL = object()
+
+
+def _hash_key(value: Any) -> Any:
+    """Hash index key of value; booleans are kept apart from the equal
+    integers 1 and 0"""
+    return (_BOOL, value) if type(value) is bool else value
+
+
+def _path(path: Union[str, Sequence]) -> Path:
+    return (path,) if isinstance(path, str) else tuple(path)
+
+
+class Predicate:
+    """A filter over indexed repos; combine with &, | and ~.
+    """
+
+    def __init__(self, evaluate: Callable[["RepoIndex"], FrozenSet[int]],
+                 description: str) -> None:
+        """Init method of Predicate"""
+        self._evaluate = evaluate
+        self.description = description
+
+    def positions(self, index: "RepoIndex") -> FrozenSet[int]:
+        """Positions of the repos in index matching this predicate"""
+        return self._evaluate(index)
+
+    def __and__(self, other: "Predicate") -> "Predicate":
+        return Predicate(
+            lambda index: self.positions(index) & other.positions(index),
+            "({} & {})".format(self.description, other.description))
+
+    def __or__(self, other: "Predicate") -> "Predicate":
+        return Predicate(
+            lambda index: self.positions(index) | other.positions(index),
+            "({} | {})".format(self.description, other.description))
+
+    def __invert__(self) -> "Predicate":
+        return Predicate(
+            lambda index: index.all_positions - self.positions(index),
+            "~{}".format(self.description))
+
+    def __repr__(self) -> str:
+        return "<Predicate {}>".format(self.description)
+
+
+class Field:
+    """A key path into repos, used to build predicates.
+
+    Missing values (a missing key, or a non-mapping on the way) never
+    match a comparison. A bare Field used as a predicate, like
+    ``~Field("fork")``, tests the value for truth.
+    """
+    __hash__ = None
+
+    def __init__(self, *path: Any) -> None:
+        """Init method of Field"""
+        self.path = tuple(path)
+
+    def _name(self) -> str:
+        return ".".join(map(str, self.path))
+
+    def __eq__(self, value: Any) -> Predicate:
+        return self.isin((value,))
+
+    def __ne__(self, value: Any) -> Predicate:
+        equal = self.isin((value,))
+        path = self.path
+
+        def evaluate(index: RepoIndex) -> FrozenSet[int]:
+            return index.present_positions(path) - equal.positions(index)
+        return Predicate(evaluate, "{} != {!r}".format(self._name(), value))
+
+    def isin(self, values: Iterable[Any]) -> Predicate:
+        """Value is one of values"""
+        values = tuple(values)
+        path = self.path
+
+        def evaluate(index: RepoIndex) -> FrozenSet[int]:
+            lookup = index.hash_index(path)
+            return frozenset().union(*(lookup.get(_hash_key(v), ())
+                                       for v in values))
+        return Predicate(evaluate, "{} in {!r}".format(self._name(), values))
+
+    def between(self, low: Any = None, high: Any = None,
+                inclusive: Tuple[bool, bool] = (True, True)) -> Predicate:
+        """low <= value <= high; None leaves that side open"""
+        path = self.path
+
+        def evaluate(index: RepoIndex) -> FrozenSet[int]:
+            values, positions = index.sorted_index(path)
+            start, stop = 0, len(values)
+            if low is not None:
+                start = (bisect_left if inclusive[0] else bisect_right)(
+                    values, low)
+            if high is not None:
+                stop = (bisect_right if inclusive[1] else bisect_left)(
+                    values, high)
+            return frozenset(positions[start:stop])
+        return Predicate(evaluate, "{!r} <= {} <= {!r}".format(
+            low, self._name(), high))
+
+    def __lt__(self, value: Any) -> Predicate:
+        return self.between(high=value, inclusive=(True, False))
+
+    def __le__(self, value: Any) -> Predicate:
+        return self.between(high=value)
+
+    def __gt__(self, value: Any) -> Predicate:
+        return self.between(low=value, inclusive=(False, True))
+
+    def __ge__(self, value: Any) -> Predicate:
+        return self.between(low=value)
+
+    def _truthy(self) -> Predicate:
+        path = self.path
+
+        def evaluate(index: RepoIndex) -> FrozenSet[int]:
+            return index.truthy_positions(path)
+        return Predicate(evaluate, self._name())
+
+    def __and__(self, other: Any) -> Predicate:
+        return self._truthy() & _predicate(other)
+
+    def __or__(self, other: Any) -> Predicate:
+        return self._truthy() | _predicate(other)
+
+    def __invert__(self) -> Predicate:
+        return ~self._truthy()
+
+    def __repr__(self) -> str:
+        return "Field({})".format(", ".join(map(repr, self.path)))
+
+
+def _predicate(value: Union[Field, Predicate]) -> Predicate:
+    return value._truthy() if isinstance(value, Field) else value
+
+
+class RepoIndex:
+    """Lazily built per-field indexes over a list of repos.
+    Parameters
+    ----------
+    repos: Sequence[Mapping]
+        the repos to index; must not be mutated afterwards
+    """
+
+    def __init__(self, repos: Sequence[Mapping]) -> None:
+        """Init method of RepoIndex"""
+        self.repos = repos
+        self.all_positions = frozenset(range(len(repos)))
+        self._columns: Dict[Path, List] = {}
+        self._hash: Dict[Path, Dict[Any, List[int]]] = {}
+        self._sorted: Dict[Path, Tuple[List, List[int]]] = {}
+        self._ordered: Dict[Tuple[Path, bool], List[int]] = {}
+        self._present: Dict[Path, FrozenSet[int]] = {}
+        self._truthy: Dict[Path, FrozenSet[int]] = {}
+
+    def column(self, path: Union[str, Sequence]) -> List:
+        """Value of path for every repo, _MISSING where absent"""
+        path = _path(path)
+        column = self._columns.get(path)
+        if column is None:
+            column, = extract_columns(self.repos, [path], default=_MISSING)
+            self._columns[path] = column
+        return column
+
+    def hash_index(self, path: Union[str, Sequence]) -> Dict[Any, List[int]]:
+        """value -> positions, for hashable present values, keyed by
+        _hash_key"""
+        path = _path(path)
+        lookup = self._hash.get(path)
+        if lookup is None:
+            lookup = {}
+            for position, value in enumerate(self.column(path)):
+                if value is not _MISSING and value is not None:
+                    try:
+                        lookup.setdefault(_hash_key(value),
+                                          []).append(position)
+                    except TypeError:
+                        continue
+            self._hash[path] = lookup
+        return lookup
+
+    def sorted_index(self, path: Union[str, Sequence]) -> Tuple[List, List]:
+        """(sorted values, their positions), skipping missing and None"""
+        path = _path(path)
+        entry = self._sorted.get(path)
+        if entry is None:
+            column = self.column(path)
+            positions = sorted(self.present_positions(path),
+                               key=column.__getitem__)
+            entry = ([column[p] for p in positions], positions)
+            self._sorted[path] = entry
+        return entry
+
+    def present_positions(self, path: Union[str, Sequence]) -> FrozenSet:
+        """Positions where path holds a value other than None"""
+        path = _path(path)
+        present = self._present.get(path)
+        if present is None:
+            present = frozenset(p for p, v in enumerate(self.column(path))
+                                if v is not _MISSING and v is not None)
+            self._present[path] = present
+        return present
+
+    def truthy_positions(self, path: Union[str, Sequence]) -> FrozenSet:
+        """Positions where path holds a true value"""
+        path = _path(path)
+        truthy = self._truthy.get(path)
+        if truthy is None:
+            truthy = frozenset(p for p, v in enumerate(self.column(path))
+                               if v is not _MISSING and v)
+            self._truthy[path] = truthy
+        return truthy
+
+    def ordered_positions(self, path: Union[str, Sequence],
+                          descending: bool = False) -> List[int]:
+        """Every position sorted by path, ties and missing values last in
+        position order"""
+        path = _path(path)
+        key = (path, descending)
+        ordered = self._ordered.get(key)
+        if ordered is None:
+            column = self.column(path)
+            _, ascending = self.sorted_index(path)
+            ordered = (sorted(sorted(ascending), key=column.__getitem__,
+                              reverse=True) if descending
+                       else list(ascending))
+            ordered += sorted(self.all_positions.difference(ascending))
+            self._ordered[key] = ordered
+        return ordered
+
+    def query(self, where: Union[Field, Predicate] = None) -> "Query":
+        """Start a query, optionally filtered by where"""
+        return Query(self, None if where is None else _predicate(where))
+
+
+class Query:
+    """An immutable, lazily evaluated query over a RepoIndex.
+    """
+
+    def __init__(self, index: RepoIndex, predicate: Predicate = None,
+                 order: Tuple[Path, bool] = None,
+                 limit: Optional[int] = None) -> None:
+        """Init method of Query"""
+        self._index = index
+        self._predicate = predicate
+        self._order = order
+        self._limit = limit
+
+    def where(self, predicate: Union[Field, Predicate]) -> "Query":
+        """Also require predicate"""
+        predicate = _predicate(predicate)
+        if self._predicate is not None:
+            predicate = self._predicate & predicate
+        return Query(self._index, predicate, self._order, self._limit)
+
+    def order_by(self, path: Union[str, Sequence],
+                 descending: bool = False) -> "Query":
+        """Sort by path; repos missing it come last"""
+        return Query(self._index, self._predicate,
+                     (_path(path), descending), self._limit)
+
+    def limit(self, n: int) -> "Query":
+        """Keep at most n repos"""
+        return Query(self._index, self._predicate, self._order, n)
+
+    def _matches(self) -> Optional[FrozenSet[int]]:
+        if self._predicate is None:
+            return None
+        return self._predicate.positions(self._index)
+
+    def positions(self) -> List[int]:
+        """Positions of the matching repos, in result order"""
+        matches = self._matches()
+        total = len(self._index.repos)
+        if self._order is None:
+            result: Iterable[int] = (range(total) if matches is None
+                                     else sorted(matches))
+            return list(islice(result, self._limit))
+        path, descending = self._order
+        if matches is not None and len(matches) * 8 < total:
+            return self._sort_candidates(matches, path, descending)
+        ordered = self._index.ordered_positions(path, descending)
+        if matches is None:
+            return ordered[:self._limit]
+        return list(islice((p for p in ordered if p in matches),
+                           self._limit))
+
+    def _sort_candidates(self, matches: FrozenSet[int], path: Path,
+                         descending: bool) -> List[int]:
+        """Order a small candidate set, with a heap when limited"""
+        column = self._index.column(path)
+        present = sorted(p for p in matches
+                         if column[p] is not _MISSING
+                         and column[p] is not None)
+        if self._limit is not None and self._limit < len(present):
+            pick = heapq.nlargest if descending else heapq.nsmallest
+            return pick(self._limit, present, key=column.__getitem__)
+        present.sort(key=column.__getitem__, reverse=descending)
+        missing = sorted(matches.difference(present))
+        return (present + missing)[:self._limit]
+
+    def top(self, n: int, path: Union[str, Sequence]) -> List[Mapping]:
+        """The n repos with the largest value at path"""
+        return self.order_by(path, descending=True).limit(n).all()
+
+    def count(self) -> int:
+        """Number of matching repos, ignoring limit"""
+        matches = self._matches()
+        return len(self._index.repos) if matches is None else len(matches)
+
+    def all(self) -> List[Mapping]:
+        """The matching repos"""
+        return [self._index.repos[p] for p in self.positions()]
+
+    def names(self) -> List[str]:
+        """Names of the matching repos"""
+        return [self._index.repos[p]["name"] for p in self.positions()]
+
+    def __iter__(self) -> Iterator[Mapping]:
+        return iter(self.all())
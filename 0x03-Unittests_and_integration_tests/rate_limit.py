@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+"""Rate-limit-aware scheduling for get_json.
+
+``RateLimitedTransport`` wraps another transport. It follows the server's
+quota through the ``X-RateLimit-Remaining`` and ``X-RateLimit-Reset``
+headers, holding requests back only once the quota is spent, until the
+window resets; an optional token bucket also caps the local request rate.
+Rate-limited answers (403 or 429 with ``Retry-After`` or an exhausted
+quota), other 429s, 5xx answers and connection errors are retried with
+jittered exponential backoff.
+Example
+-------
+>>> set_transport(RateLimitedTransport(PooledTransport(), rate=20))
+"""
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from typing import (
+    Any,
+    Callable,
+    Mapping,
+    Optional,
+)
+
+from transport import Response
+
+__all__ = [
+    "RateLimitedTransport",
+]
+
+
+class RateLimitedTransport:
+    """Transport wrapper pacing and retrying requests.
+    Parameters
+    ----------
+    transport: transport
+        the transport performing the actual requests
+    rate: float
+        local request rate limit per second, None for no local limit
+    burst: int
+        token bucket capacity, i.e. requests allowed back to back
+    max_retries: int
+        retries per request before the last answer is returned
+        (or the last connection error raised)
+    base_delay, max_delay: float
+        backoff before retry n is uniform in
+        [0, min(max_delay, base_delay * 2 ** n)]
+    clock, wall_clock, sleep, rng:
+        monotonic clock, epoch clock (for X-RateLimit-Reset and
+        Retry-After dates), sleep and uniform [0, 1) source
+    """
+    RETRY_STATUSES = frozenset((429, 500, 502, 503, 504))
+
+    def __init__(self, transport: Any, rate: Optional[float] = None,
+                 burst: int = 1, max_retries: int = 5,
+                 base_delay: float = 0.5, max_delay: float = 60.0,
+                 clock: Callable[[], float] = time.monotonic,
+                 wall_clock: Callable[[], float] = time.time,
+                 sleep: Callable[[float], Any] = time.sleep,
+                 rng: Callable[[], float] = random.random) -> None:
+        """Init method of RateLimitedTransport"""
+        self.transport = transport
+        self.rate = rate
+        self.burst = burst
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.requests = 0
+        self.retries = 0
+        self.waited = 0.0
+        self._clock = clock
+        self._wall_clock = wall_clock
+        self._sleep = sleep
+        self._rng = rng
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._tokens = float(burst)
+        self._refilled = clock()
+        self.remaining: Optional[int] = None
+        self.reset: Optional[float] = None
+
+    def get(self, url: str,
+            headers: Optional[Mapping[str, str]] = None) -> Response:
+        """GET url once the quota allows, retrying transient failures"""
+        attempt = 0
+        while True:
+            self._acquire()
+            try:
+                response = self.transport.get(url, headers=headers)
+            except OSError:
+                self._settle()
+                if attempt >= self.max_retries:
+                    raise
+                delay = self._backoff(attempt)
+            else:
+                self._settle(response)
+                delay = self._retry_delay(response, attempt)
+                if delay is None or attempt >= self.max_retries:
+                    return response
+            attempt += 1
+            with self._lock:
+                self.retries += 1
+            self._wait(delay)
+
+    def close(self) -> None:
+        """Close the wrapped transport"""
+        self.transport.close()
+
+    def _wait(self, delay: float) -> None:
+        if delay > 0:
+            with self._lock:
+                self.waited += delay
+            self._sleep(delay)
+
+    def _acquire(self) -> None:
+        """Block until the server quota and the token bucket allow a
+        request, then spend one"""
+        while True:
+            with self._lock:
+                delay = 0.0
+                if self.remaining is not None and self.remaining <= 0:
+                    delay = self.reset - self._wall_clock()
+                    if delay <= 0:
+                        # the window has reset; the next answer tells
+                        # the new quota
+                        self.remaining = None
+                if delay <= 0:
+                    if self.remaining is not None:
+                        self.remaining -= 1
+                    self.requests += 1
+                    self._in_flight += 1
+                    break
+            self._wait(delay)
+        if self.rate:
+            with self._lock:
+                # reserve a token, then wait out any debt, so concurrent
+                # callers queue up 1/rate apart
+                now = self._clock()
+                self._tokens = min(
+                    self.burst,
+                    self._tokens + (now - self._refilled) * self.rate) - 1
+                self._refilled = now
+                delay = -self._tokens / self.rate
+            self._wait(delay)
+
+    def _settle(self, response: Optional[Response] = None) -> None:
+        """Mark a request done and update the known quota from its
+        response headers"""
+        with self._lock:
+            self._in_flight -= 1
+            if response is None:
+                return
+            try:
+                remaining = int(response.headers["x-ratelimit-remaining"])
+                reset = float(response.headers["x-ratelimit-reset"])
+            except (KeyError, ValueError):
+                return
+            # requests still in flight may not be counted in remaining
+            # yet; assume they are not, so the quota is never overdrawn
+            remaining -= self._in_flight
+            if self.reset is None or reset > self.reset:
+                self.reset, self.remaining = reset, remaining
+            elif reset == self.reset:
+                self.remaining = (remaining if self.remaining is None
+                                  else min(self.remaining, remaining))
+
+    def _retry_delay(self, response: Response,
+                     attempt: int) -> Optional[float]:
+        """Seconds to wait before retrying response, None to return it"""
+        status = response.status_code
+        retry_after = self._retry_after(response)
+        if status in (403, 429):
+            if retry_after is not None:
+                return retry_after
+            if response.headers.get("x-ratelimit-remaining") == "0":
+                # _acquire waits for the window to reset
+                return 0.0
+        if status in self.RETRY_STATUSES:
+            if retry_after is not None:
+                return retry_after
+            return self._backoff(attempt)
+        return None
+
+    def _retry_after(self, response: Response) -> Optional[float]:
+        """Retry-After as seconds from now, given as seconds or a date"""
+        value = response.headers.get("retry-after")
+        if value is None:
+            return None
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            pass
+        try:
+            when = parsedate_to_datetime(value).timestamp()
+        except (TypeError, ValueError):
+            return None
+        return max(0.0, when - self._wall_clock())
+
+    def _backoff(self, attempt: int) -> float:
+        """Full-jitter exponential backoff before retry attempt + 1"""
+        ceiling = min(self.max_delay, self.base_delay * 2 ** attempt)
+        return self._rng() * ceiling
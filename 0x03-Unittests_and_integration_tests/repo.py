@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+"""Compact repo records.
+
+A decoded repo payload is a dict of about 70 keys with nested ``owner``,
+``license`` and ``permissions`` dicts. ``Repo`` keeps only the fields the
+client works with, in ``__slots__``, with repeated strings interned. It is
+a read-only Mapping, so ``access_nested_map``, ``has_license``,
+``extract_columns`` and the query engine accept it in place of the dict.
+With ``keep_raw`` the full payload is also kept as compact JSON bytes and
+every other key stays readable.
+"""
+import json
+import sys
+from collections.abc import ItemsView, KeysView, Mapping, ValuesView
+from typing import (
+    Any,
+    Dict,
+    Iterator,
+    Optional,
+    Tuple,
+)
+
+__all__ = [
+    "Repo",
+]
+
+_MISSING = object()
+_NO_SUB = object()
+# nested fields hold the inner value, or a 1-tuple wrapping a non-mapping
+_NULL = (None,)
+_INTERNED = frozenset(("language", "_license", "_owner"))
+
+
+class Repo(Mapping):
+    """A repo payload reduced to the fields the client uses.
+    """
+    SCALARS = ("id", "name", "full_name", "language", "fork", "archived",
+               "stargazers_count", "forks_count", "open_issues_count",
+               "updated_at", "pushed_at")
+    NESTED = {"license": "key", "owner": "login"}
+    ALIASES = {"forks": "forks_count"}
+    # key paths to decode when building Repos from a streamed payload
+    PATHS: Tuple[Tuple[str, ...], ...] = (
+        tuple((key,) for key in SCALARS)
+        + tuple((key, sub) for key, sub in NESTED.items()))
+    __slots__ = SCALARS + ("_license", "_owner", "_raw")
+
+    def __init__(self, payload: Mapping, keep_raw: bool = False) -> None:
+        """Init method of Repo"""
+        for key in self.SCALARS:
+            value = payload.get(key, _MISSING)
+            if key in _INTERNED and isinstance(value, str):
+                value = sys.intern(value)
+            object.__setattr__(self, key, value)
+        for key, sub in self.NESTED.items():
+            value = payload.get(key, _MISSING)
+            if isinstance(value, Mapping):
+                value = value.get(sub, _NO_SUB)
+                if isinstance(value, str):
+                    value = sys.intern(value)
+            elif value is None:
+                value = _NULL
+            elif value is not _MISSING:
+                value = (value,)
+            object.__setattr__(self, "_" + key, value)
+        raw = None
+        if keep_raw:
+            raw = json.dumps(payload, separators=(",", ":")).encode("utf-8")
+        object.__setattr__(self, "_raw", raw)
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        raise AttributeError("Repo is read-only")
+
+    def _inner(self, key: str) -> Any:
+        value = getattr(self, "_" + key)
+        if value is _MISSING or value is _NO_SUB or isinstance(value, tuple):
+            return None
+        return value
+
+    @property
+    def license_key(self) -> Optional[str]:
+        """license.key, None when absent"""
+        return self._inner("license")
+
+    @property
+    def owner_login(self) -> Optional[str]:
+        """owner.login, None when absent"""
+        return self._inner("owner")
+
+    def raw(self) -> Optional[Dict]:
+        """The full original payload, if kept"""
+        return None if self._raw is None else json.loads(self._raw)
+
+    def __getitem__(self, key: Any) -> Any:
+        key = self.ALIASES.get(key, key)
+        if key in self.SCALARS:
+            value = getattr(self, key)
+        elif key in self.NESTED:
+            value = getattr(self, "_" + key)
+            if isinstance(value, tuple):
+                value, = value
+            elif value is _MISSING:
+                pass
+            elif self._raw is not None:
+                value = _NestedView(self, key)
+            elif value is _NO_SUB:
+                value = {}
+            else:
+                value = {self.NESTED[key]: value}
+        elif self._raw is not None:
+            value = self.raw().get(key, _MISSING)
+        else:
+            value = _MISSING
+        if value is _MISSING:
+            raise KeyError(key)
+        return value
+
+    def _own_keys(self) -> Iterator[str]:
+        for key in self.SCALARS:
+            if getattr(self, key) is not _MISSING:
+                yield key
+        for key in self.NESTED:
+            if getattr(self, "_" + key) is not _MISSING:
+                yield key
+
+    def __iter__(self) -> Iterator[str]:
+        if self._raw is not None:
+            return iter(self.raw())
+        return self._own_keys()
+
+    def __len__(self) -> int:
+        if self._raw is not None:
+            return len(self.raw())
+        return sum(1 for _ in self)
+
+    # with keep_raw, whole-mapping reads decode the raw payload once
+    # rather than once per key outside the slots
+
+    def keys(self) -> KeysView:
+        if self._raw is not None:
+            return self.raw().keys()
+        return KeysView(self)
+
+    def items(self) -> ItemsView:
+        if self._raw is not None:
+            return self.raw().items()
+        return ItemsView(self)
+
+    def values(self) -> ValuesView:
+        if self._raw is not None:
+            return self.raw().values()
+        return ValuesView(self)
+
+    def __eq__(self, other: Any) -> bool:
+        if not isinstance(other, Mapping):
+            return NotImplemented
+        if isinstance(other, Repo) and self._raw is not None \
+                and other._raw is not None:
+            return self._raw == other._raw or self.raw() == other.raw()
+        return dict(self.items()) == dict(other.items())
+
+    def __sizeof__(self) -> int:
+        size = object.__sizeof__(self)
+        for key in self.__slots__:
+            value = getattr(self, key)
+            if isinstance(value, (str, bytes)) and key not in _INTERNED:
+                size += sys.getsizeof(value)
+        return size
+
+    def __reduce__(self) -> Any:
+        return (_rebuild, (self.raw() if self._raw is not None
+                           else dict(self.items()), self._raw is not None))
+
+    def __repr__(self) -> str:
+        return "<Repo {!r}>".format(self.name)
+
+
+class _NestedView(Mapping):
+    """license or owner of a keep_raw Repo: the kept sub-key is read from
+    the Repo, so only other sub-keys decode the raw payload"""
+    __slots__ = ("_repo", "_key")
+
+    def __init__(self, repo: Repo, key: str) -> None:
+        self._repo = repo
+        self._key = key
+
+    def _payload(self) -> Mapping:
+        return self._repo.raw()[self._key]
+
+    def __getitem__(self, sub: Any) -> Any:
+        if sub == Repo.NESTED[self._key]:
+            value = getattr(self._repo, "_" + self._key)
+            if value is _NO_SUB:
+                raise KeyError(sub)
+            return value
+        return self._payload()[sub]
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._payload())
+
+    def __len__(self) -> int:
+        return len(self._payload())
+
+    def __repr__(self) -> str:
+        return repr(dict(self))
+
+
+def _rebuild(payload: Mapping, keep_raw: bool) -> Repo:
+    return Repo(payload, keep_raw)
@@ -0,0 +1,293 @@
+#!/usr/bin/env python3
+"""Tail-latency control for get_json.
+
+``HedgedTransport`` wraps another transport. A request that has not been
+answered within the recent p95 latency of its endpoint is sent again,
+and whichever attempt answers first wins; a budget bounds the extra
+load. ``CircuitBreakerTransport`` counts consecutive failures (network
+errors and 5xx answers) per host and, past a threshold, fails requests
+at once with ``CircuitOpenError`` until a cool-down has passed and a
+trial request succeeds.
+Example
+-------
+>>> set_transport(CircuitBreakerTransport(HedgedTransport(
+...     PooledTransport(timeout=(3.05, 10.0)))))
+"""
+import threading
+import time
+from collections import deque
+from concurrent.futures import (
+    FIRST_COMPLETED,
+    Future,
+    ThreadPoolExecutor,
+    wait,
+)
+from typing import (
+    Any,
+    Callable,
+    Deque,
+    Dict,
+    List,
+    Mapping,
+    Optional,
+)
+from urllib.parse import urlsplit
+
+from metrics import endpoint
+from transport import Response
+
+__all__ = [
+    "CircuitBreakerTransport",
+    "CircuitOpenError",
+    "HedgedTransport",
+]
+
+
+class HedgedTransport:
+    """Transport wrapper sending a duplicate of slow requests.
+    Parameters
+    ----------
+    transport: transport
+        the transport performing the actual requests; it is called from
+        several threads at once
+    quantile: float
+        hedge a request once it has waited longer than this quantile of
+        the recent latencies of its endpoint
+    initial_delay: float
+        hedge delay used until min_samples latencies are known
+    min_delay, max_delay: float
+        bounds of the hedge delay
+    max_hedges: int
+        duplicates sent per request at most
+    budget: float
+        hedges allowed as a fraction of all requests
+    window: int
+        latencies remembered per endpoint
+    min_samples: int
+        latencies needed before the quantile is trusted
+    max_workers: int
+        threads running attempts
+    """
+
+    def __init__(self, transport: Any, quantile: float = 0.95,
+                 initial_delay: float = 0.1, min_delay: float = 0.005,
+                 max_delay: float = 5.0, max_hedges: int = 1,
+                 budget: float = 0.1, window: int = 200,
+                 min_samples: int = 20, max_workers: int = 16,
+                 clock: Callable[[], float] = time.perf_counter) -> None:
+        """Init method of HedgedTransport"""
+        self.transport = transport
+        self.quantile = quantile
+        self.initial_delay = initial_delay
+        self.min_delay = min_delay
+        self.max_delay = max_delay
+        self.max_hedges = max_hedges
+        self.budget = budget
+        self.window = window
+        self.min_samples = min_samples
+        self.requests = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._latencies: Dict[str, Deque[float]] = {}
+        self._pool = ThreadPoolExecutor(max_workers=max_workers,
+                                        thread_name_prefix="hedge")
+
+    def delay(self, url: str) -> float:
+        """Seconds a request for url waits before it is hedged"""
+        with self._lock:
+            samples = self._latencies.get(endpoint(url))
+            if samples is None or len(samples) < self.min_samples:
+                return self.initial_delay
+            ordered = sorted(samples)
+        value = ordered[min(len(ordered) - 1,
+                            int(self.quantile * len(ordered)))]
+        return min(self.max_delay, max(self.min_delay, value))
+
+    def get(self, url: str,
+            headers: Optional[Mapping[str, str]] = None) -> Response:
+        """GET url, hedging it if it is slow; the first answer wins and
+        an error is raised only once every attempt has failed"""
+        delay = self.delay(url)
+        with self._lock:
+            self.requests += 1
+        primary = self._attempt(url, headers)
+        pending = {primary}
+        errors: List[BaseException] = []
+        hedges = 0
+        try:
+            while pending:
+                done, pending = wait(
+                    pending, return_when=FIRST_COMPLETED,
+                    timeout=delay if hedges < self.max_hedges else None)
+                for future in done:
+                    error = future.exception()
+                    if error is None:
+                        if future is not primary:
+                            with self._lock:
+                                self.hedge_wins += 1
+                        return future.result()
+                    errors.append(error)
+                if not done:
+                    hedges += 1
+                    if self._spend_budget():
+                        pending.add(self._attempt(url, headers))
+                    else:
+                        hedges = self.max_hedges
+        finally:
+            for future in pending:
+                future.cancel()
+        raise errors[0]
+
+    def close(self) -> None:
+        """Stop the attempt threads and close the wrapped transport"""
+        self._pool.shutdown(wait=False)
+        self.transport.close()
+
+    def __enter__(self) -> "HedgedTransport":
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.close()
+
+    def _spend_budget(self) -> bool:
+        """Count a hedge if the budget allows one more"""
+        with self._lock:
+            if self.hedges >= self.budget * self.requests:
+                return False
+            self.hedges += 1
+            return True
+
+    def _attempt(self, url: str,
+                 headers: Optional[Mapping[str, str]]) -> Future:
+        """Run one attempt on the pool, recording its latency"""
+        def run() -> Response:
+            start = self._clock()
+            response = self.transport.get(url, headers=headers)
+            self._record(url, self._clock() - start)
+            return response
+        return self._pool.submit(run)
+
+    def _record(self, url: str, seconds: float) -> None:
+        with self._lock:
+            samples = self._latencies.get(endpoint(url))
+            if samples is None:
+                samples = self._latencies[endpoint(url)] = deque(
+                    maxlen=self.window)
+            samples.append(seconds)
+
+
+class CircuitOpenError(ConnectionError):
+    """A request refused without being sent because the circuit of its
+    host is open"""
+
+
+class _Circuit:
+    """Failure count and open state of one host"""
+    __slots__ = ("failures", "opened_at", "trial")
+
+    def __init__(self) -> None:
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self.trial = False
+
+
+class CircuitBreakerTransport:
+    """Transport wrapper failing fast while a host is unhealthy.
+    Parameters
+    ----------
+    transport: transport
+        the transport performing the actual requests
+    failure_threshold: int
+        consecutive failures (OSError or a FAILURE_STATUSES answer) that
+        open the circuit of a host
+    reset_timeout: float
+        seconds an open circuit refuses requests; the next request is
+        then sent as a trial (half-open), closing the circuit on success
+        and reopening it on failure
+    clock:
+        monotonic clock
+    """
+    FAILURE_STATUSES = frozenset((500, 502, 503, 504))
+
+    def __init__(self, transport: Any, failure_threshold: int = 5,
+                 reset_timeout: float = 30.0,
+                 clock: Callable[[], float] = time.monotonic) -> None:
+        """Init method of CircuitBreakerTransport"""
+        self.transport = transport
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.rejected = 0
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._circuits: Dict[str, _Circuit] = {}
+
+    def state(self, url: str) -> str:
+        """"closed", "open" or "half-open" for the host of url"""
+        with self._lock:
+            circuit = self._circuits.get(urlsplit(url).netloc)
+            if circuit is None or circuit.opened_at is None:
+                return "closed"
+            if (circuit.trial or self._clock() >=
+                    circuit.opened_at + self.reset_timeout):
+                return "half-open"
+            return "open"
+
+    def get(self, url: str,
+            headers: Optional[Mapping[str, str]] = None) -> Response:
+        """GET url unless the circuit of its host is open"""
+        host = urlsplit(url).netloc
+        self._admit(host)
+        try:
+            response = self.transport.get(url, headers=headers)
+        except OSError:
+            self._settle(host, False)
+            raise
+        except BaseException:
+            self._settle(host, None)
+            raise
+        self._settle(host,
+                     response.status_code not in self.FAILURE_STATUSES)
+        return response
+
+    def close(self) -> None:
+        """Close the wrapped transport"""
+        self.transport.close()
+
+    def __enter__(self) -> "CircuitBreakerTransport":
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.close()
+
+    def _admit(self, host: str) -> None:
+        """Let a request through, or raise CircuitOpenError"""
+        with self._lock:
+            circuit = self._circuits.get(host)
+            if circuit is None:
+                circuit = self._circuits[host] = _Circuit()
+            if circuit.opened_at is None:
+                return
+            if (circuit.trial or self._clock() <
+                    circuit.opened_at + self.reset_timeout):
+                self.rejected += 1
+                raise CircuitOpenError("circuit open for {}".format(host))
+            circuit.trial = True
+
+    def _settle(self, host: str, ok: Optional[bool]) -> None:
+        """Record the outcome of a request; None for one that failed for
+        reasons unrelated to the host"""
+        with self._lock:
+            circuit = self._circuits[host]
+            circuit.trial = False
+            if ok is None:
+                return
+            if ok:
+                circuit.failures = 0
+                circuit.opened_at = None
+                return
+            circuit.failures += 1
+            if (circuit.opened_at is not None or
+                    circuit.failures >= self.failure_threshold):
+                circuit.opened_at = self._clock()
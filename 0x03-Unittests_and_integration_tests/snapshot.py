@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+"""Record and replay get_json traffic through a snapshot file.
+
+``RecordingTransport`` wraps another transport and appends every response
+(URL, status, headers and body) to a snapshot file as it arrives;
+``ReplayTransport`` answers later requests from that file with no
+network. Each response is stored as its own zlib-compressed record, and
+closing the recorder appends an index of record offsets by URL, so replay
+reads only the index at startup and decompresses a record only when its
+URL is requested. A snapshot whose recorder never closed is still
+readable: replay then rebuilds the index by scanning the records.
+Example
+-------
+>>> set_transport(RecordingTransport(PooledTransport(), "google.snap"))
+>>> GithubOrgClient("google").public_repos()
+>>> close_transport()
+>>> set_transport(ReplayTransport("google.snap"))
+>>> GithubOrgClient("google").public_repos()
+"""
+import json
+import os
+import struct
+import threading
+import zlib
+from typing import (
+    Any,
+    Dict,
+    Iterator,
+    Mapping,
+    Optional,
+    Tuple,
+)
+
+from transport import Response
+
+__all__ = [
+    "RecordingTransport",
+    "ReplayTransport",
+]
+
+_MAGIC = b"GHSNAP1\n"
+_LENGTH = struct.Struct(">I")
+_TRAILER = struct.Struct(">Q8s")
+
+
+def _pack(meta: Mapping[str, Any], body: bytes) -> bytes:
+    return zlib.compress(json.dumps(meta, separators=(",", ":")).encode(
+        "utf-8") + b"\n" + body)
+
+
+def _unpack(blob: bytes) -> Tuple[Dict[str, Any], bytes]:
+    meta, _, body = zlib.decompress(blob).partition(b"\n")
+    return json.loads(meta), body
+
+
+class RecordingTransport:
+    """Transport wrapper recording every response into a snapshot file.
+    Parameters
+    ----------
+    transport: transport
+        the transport performing the actual requests
+    path: str
+        the snapshot file; overwritten
+    """
+
+    def __init__(self, transport: Any, path: str) -> None:
+        """Init method of RecordingTransport"""
+        self.transport = transport
+        self.path = path
+        self._lock = threading.Lock()
+        self._index: Dict[str, Tuple[int, int]] = {}
+        self._file = open(path, "wb")
+        self._file.write(_MAGIC)
+
+    def get(self, url: str,
+            headers: Optional[Mapping[str, str]] = None) -> Response:
+        """GET url through the wrapped transport and record the answer"""
+        response = self.transport.get(url, headers=headers)
+        meta = {"url": url, "status": response.status_code,
+                "headers": response.headers}
+        blob = _pack(meta, response.content)
+        with self._lock:
+            self._file.write(_LENGTH.pack(len(blob)))
+            # a later answer for the same URL replaces the earlier one
+            self._index[url] = (self._file.tell(), len(blob))
+            self._file.write(blob)
+            self._file.flush()
+        return response
+
+    def close(self) -> None:
+        """Write the index, close the snapshot and the wrapped transport"""
+        with self._lock:
+            if not self._file.closed:
+                offset = self._file.tell()
+                index = json.dumps(self._index).encode("utf-8")
+                self._file.write(zlib.compress(index))
+                self._file.write(_TRAILER.pack(offset, _MAGIC))
+                self._file.close()
+        self.transport.close()
+
+    def __enter__(self) -> "RecordingTransport":
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.close()
+
+
+class ReplayTransport:
+    """Transport answering from a snapshot file, without network.
+
+    Requests for URLs missing from the snapshot raise KeyError.
+    """
+
+    def __init__(self, path: str) -> None:
+        """Init method of ReplayTransport"""
+        self.path = path
+        self.loads = 0
+        self._lock = threading.Lock()
+        self._file = open(path, "rb")
+        if self._file.read(len(_MAGIC)) != _MAGIC:
+            self._file.close()
+            raise ValueError("{} is not a snapshot file".format(path))
+        self._index = self._read_index()
+
+    def get(self, url: str,
+            headers: Optional[Mapping[str, str]] = None) -> Response:
+        """The recorded response for url"""
+        location = self._index.get(url)
+        if location is None:
+            raise KeyError("{} is not in snapshot {}".format(url, self.path))
+        offset, length = location
+        with self._lock:
+            self._file.seek(offset)
+            blob = self._file.read(length)
+            self.loads += 1
+        meta, body = _unpack(blob)
+        return Response(url, meta["status"], meta["headers"], body)
+
+    def __contains__(self, url: str) -> bool:
+        return url in self._index
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._index)
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    def close(self) -> None:
+        """Close the snapshot file"""
+        self._file.close()
+
+    def __enter__(self) -> "ReplayTransport":
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.close()
+
+    def _read_index(self) -> Dict[str, Tuple[int, int]]:
+        """The trailing index, or one rebuilt by scanning the records"""
+        end = self._file.seek(0, os.SEEK_END)
+        if end >= len(_MAGIC) + _TRAILER.size:
+            self._file.seek(end - _TRAILER.size)
+            offset, magic = _TRAILER.unpack(self._file.read(_TRAILER.size))
+            if magic == _MAGIC and offset < end:
+                self._file.seek(offset)
+                index = self._file.read(end - _TRAILER.size - offset)
+                return {url: tuple(entry) for url, entry in
+                        json.loads(zlib.decompress(index)).items()}
+        index = {}
+        position = len(_MAGIC)
+        while position + _LENGTH.size <= end:
+            self._file.seek(position)
+            length, = _LENGTH.unpack(self._file.read(_LENGTH.size))
+            position += _LENGTH.size
+            if position + length > end:
+                break
+            # records hold their URL; only the scan needs to decode them
+            try:
+                meta, _ = _unpack(self._file.read(length))
+            except (zlib.error, ValueError):
+                break
+            index[meta["url"]] = (position, length)
+            position += length
+        return index
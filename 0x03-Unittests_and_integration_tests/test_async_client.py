@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+"""
+This module tests the AsyncGithubOrgClient and its asyncio transport
+against a local stand-in server.
+"""
+
+import asyncio
+import threading
+import time
+import unittest
+from urllib.parse import parse_qsl, urlsplit
+from parameterized import parameterized
+from async_client import AsyncGithubOrgClient, AsyncTransport, _read_body
+from fake_server import FakeGithubServer, json_body
+
+
+class TestAsyncGithubOrgClient(unittest.TestCase):
+    """
+    Tests for AsyncGithubOrgClient against a paginated listing.
+    """
+
+    PAGES = 5
+
+    def setUp(self) -> None:
+        """Serve an org whose repos span PAGES pages."""
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.lock = threading.Lock()
+        self.server = FakeGithubServer().start()
+        self.server.route("/orgs/big", {
+            "repos_url": self.server.url("/orgs/big/repos")})
+        self.server.route("/orgs/big/repos", self._repos_page)
+
+    def tearDown(self) -> None:
+        """Stop the stand-in server."""
+        self.server.stop()
+
+    def _repos_page(self, path, headers):
+        """Return one page of two repos, tracking concurrent requests."""
+        page = int(dict(parse_qsl(urlsplit(path).query)).get("page", 1))
+        with self.lock:
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        time.sleep(0.02)
+        with self.lock:
+            self.in_flight -= 1
+        repos = [{"name": "repo{}".format(2 * page + i),
+                  "license": {"key": "mit"} if i else None}
+                 for i in range(2)]
+        link = '<{0}?page={1}>; rel="next", <{0}?page={2}>; rel="last"'
+        extra = {}
+        if page < self.PAGES:
+            extra["Link"] = link.format(self.server.url("/orgs/big/repos"),
+                                        page + 1, self.PAGES)
+        return 200, extra, json_body(repos)
+
+    def _run(self, concurrency, license=None):
+        """Run public_repos on a fresh client and return its result."""
+        async def main():
+            async with AsyncGithubOrgClient(
+                    "big", concurrency=concurrency) as client:
+                client.ORG_URL = self.server.url("/orgs/{org}")
+                return await client.public_repos(license)
+        return asyncio.run(main())
+
+    @parameterized.expand([
+        (1,),
+        (2,),
+        (8,),
+    ])
+    def test_public_repos_bounded(self, concurrency):
+        """
+        Test that every page is fetched, in order, with no more than
+        `concurrency` requests outstanding at once.
+        """
+        repos = self._run(concurrency)
+        expected = ["repo{}".format(i) for i in range(2, 2 * self.PAGES + 2)]
+        self.assertEqual(repos, expected)
+        self.assertLessEqual(self.max_in_flight, concurrency)
+        self.assertEqual(self.max_in_flight > 1, concurrency > 1)
+        self.assertEqual(self.server.request_count, self.PAGES + 1)
+
+    def test_public_repos_with_license(self):
+        """
+        Test that license filtering matches GithubOrgClient.has_license.
+        """
+        repos = self._run(4, license="mit")
+        self.assertEqual(repos, ["repo{}".format(2 * p + 1)
+                                 for p in range(1, self.PAGES + 1)])
+
+    def test_org_shared_between_awaiters(self):
+        """
+        Test that concurrent org() and public_repos() calls share a single
+        org request.
+        """
+        async def main():
+            async with AsyncGithubOrgClient("big") as client:
+                client.ORG_URL = self.server.url("/orgs/{org}")
+                return await asyncio.gather(client.org(), client.org(),
+                                            client.public_repos())
+        org, again, repos = asyncio.run(main())
+        self.assertIs(org, again)
+        self.assertEqual(len(repos), 2 * self.PAGES)
+        self.assertEqual(self.server.request_count, self.PAGES + 1)
+
+    def test_transport_keeps_connections_alive(self):
+        """
+        Test that sequential requests reuse one connection.
+        """
+        async def main():
+            async with AsyncTransport() as transport:
+                for _ in range(3):
+                    response = await transport.get(
+                        self.server.url("/orgs/big"))
+                    self.assertEqual(response.status_code, 200)
+        asyncio.run(main())
+        self.assertEqual(self.server.connection_count, 1)
+
+    def test_transport_decompresses(self):
+        """
+        Test that gzipped bodies are inflated and their wire size kept.
+        """
+        self.server.compress = True
+        repos = [{"name": "repo", "license": None}] * 200
+
+        async def main():
+            async with AsyncTransport() as transport:
+                self.server.route("/repos", repos)
+                return await transport.get(self.server.url("/repos"))
+        response = asyncio.run(main())
+        self.assertEqual(response.json(), repos)
+        self.assertEqual(response.headers["content-encoding"], "gzip")
+        self.assertLess(response.wire_size * 10, len(response.content))
+
+    def test_transport_follows_redirects(self):
+        """
+        Test that moved orgs are followed to their new location, and that
+        redirect loops give up after max_redirects.
+        """
+        self.server.route("/orgs/old", lambda path, headers: (
+            301, {"Location": "/orgs/big"}, b""))
+        self.server.route("/loop", lambda path, headers: (
+            302, {"Location": self.server.url("/loop")}, b""))
+
+        async def main():
+            async with AsyncGithubOrgClient("old") as client:
+                client.ORG_URL = self.server.url("/orgs/{org}")
+                repos = await client.public_repos()
+            async with AsyncTransport(max_redirects=3) as transport:
+                with self.assertRaises(OSError):
+                    await transport.get(self.server.url("/loop"))
+            return repos
+        self.assertEqual(len(asyncio.run(main())), 2 * self.PAGES)
+        self.assertAlmostEqual(AsyncTransport().timeout, 33.05)
+
+
+class TestReadBody(unittest.TestCase):
+    """
+    Tests for decoding response bodies off an asyncio stream.
+    """
+
+    @parameterized.expand([
+        ({"content-length": "5"}, b"hello", (b"hello", True)),
+        ({"transfer-encoding": "chunked"},
+         b"3\r\nhel\r\n2\r\nlo\r\n0\r\n\r\n", (b"hello", True)),
+        ({}, b"hello", (b"hello", False)),
+    ])
+    def test_read_body(self, headers, raw, expected):
+        """
+        Test Content-Length, chunked and read-until-close bodies.
+        """
+        async def main():
+            reader = asyncio.StreamReader()
+            reader.feed_data(raw)
+            reader.feed_eof()
+            return await _read_body(reader, headers)
+        self.assertEqual(asyncio.run(main()), expected)
+
+
+if __name__ == '__main__':
+    unittest.main()
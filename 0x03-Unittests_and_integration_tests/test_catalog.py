@@ -0,0 +1,232 @@
+#!/usr/bin/env python3
+"""
+This module tests the SQLite repo catalog and its use by GithubOrgClient.
+"""
+
+import os
+import shutil
+import tempfile
+import unittest
+from unittest.mock import patch
+from parameterized import parameterized_class
+import fixtures
+from catalog import RepoCatalog
+from client import GithubOrgClient
+from repo import Repo
+from utils import LRUCache
+
+
+@parameterized_class(
+    ("fixture",),
+    [("google",)]
+)
+class TestRepoCatalog(unittest.TestCase):
+    """
+    Tests for storing and querying repos in a RepoCatalog.
+    """
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        """Load the fixture."""
+        (cls.org_payload, cls.repos_payload, cls.expected_repos,
+         cls.apache2_repos) = fixtures.load(cls.fixture)
+
+    def setUp(self) -> None:
+        """Open a catalog in a scratch directory."""
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, "catalog.db")
+        self.catalog = RepoCatalog(self.path, batch_size=3)
+
+    def tearDown(self) -> None:
+        """Close the catalog and remove the scratch directory."""
+        self.catalog.close()
+        shutil.rmtree(self.directory)
+
+    def test_round_trip(self) -> None:
+        """
+        Stored payloads come back whole and in listing order, and the
+        indexed columns answer public_repos queries.
+        """
+        self.assertIsNone(self.catalog.repos("google"))
+        self.catalog.upsert_org("google", self.org_payload)
+        self.catalog.replace_repos("google", self.repos_payload)
+
+        self.assertEqual(self.catalog.org("google"), self.org_payload)
+        self.assertEqual(self.catalog.repos("google"), self.repos_payload)
+        self.assertEqual(self.catalog.public_repos("google"),
+                         self.expected_repos)
+        self.assertEqual(self.catalog.public_repos("google", "apache-2.0"),
+                         self.apache2_repos)
+        self.assertEqual(self.catalog.orgs(), ["google"])
+
+    def test_upsert_keeps_order_and_other_repos(self) -> None:
+        """
+        Upserted repos keep their position; new ones go last; repos left
+        out are kept.
+        """
+        self.catalog.replace_repos("google", self.repos_payload)
+        first = dict(self.repos_payload[0], license={"key": "mit"})
+        new = dict(self.repos_payload[1], id=1, name="new-repo")
+        self.catalog.upsert_repos("google", [new, first])
+
+        self.assertEqual(self.catalog.public_repos("google"),
+                         self.expected_repos + ["new-repo"])
+        self.assertEqual(self.catalog.public_repos("google", "mit"),
+                         [first["name"]])
+
+    def test_replace_is_atomic(self) -> None:
+        """
+        A failing replace leaves the previous repos in place.
+        """
+        self.catalog.replace_repos("google", self.repos_payload)
+        with self.assertRaises(TypeError):
+            self.catalog.replace_repos(
+                "google", self.repos_payload[:4] + [object()])
+        self.assertEqual(self.catalog.public_repos("google"),
+                         self.expected_repos)
+
+    def test_analytics(self) -> None:
+        """
+        Star and license queries across orgs match the payloads.
+        """
+        self.catalog.replace_repos("google", self.repos_payload)
+        self.catalog.replace_repos("copy", self.repos_payload[:2])
+        stars = sorted(((r["stargazers_count"], r["name"])
+                        for r in self.repos_payload), reverse=True)
+        top = self.catalog.top_repos(3, org="google")
+        self.assertEqual([(s, n) for _, n, s in top], stars[:3])
+        self.assertEqual(len(self.catalog.top_repos(100)),
+                         len(self.repos_payload) + 2)
+        counts = self.catalog.license_counts("google")
+        self.assertEqual(counts["apache-2.0"], len(self.apache2_repos))
+        self.assertEqual(sum(counts.values()), len(self.repos_payload))
+
+
+@parameterized_class(
+    ("fixture",),
+    [("google",)]
+)
+class TestClientCatalog(unittest.TestCase):
+    """
+    Tests for GithubOrgClient with a catalog set.
+    """
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        """Load the fixture."""
+        (cls.org_payload, cls.repos_payload, cls.expected_repos,
+         cls.apache2_repos) = fixtures.load(cls.fixture)
+
+    def setUp(self) -> None:
+        """Set a file-backed catalog on GithubOrgClient."""
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, "catalog.db")
+        self.catalog = patch.object(GithubOrgClient, 'catalog',
+                                    RepoCatalog(self.path))
+        self.catalog.start()
+
+    def tearDown(self) -> None:
+        """Close the catalog and remove the scratch directory."""
+        GithubOrgClient.catalog.close()
+        self.catalog.stop()
+        shutil.rmtree(self.directory)
+
+    @patch('client.get_json')
+    def test_cold_start_without_network(self, mock_get_json) -> None:
+        """
+        Fetched payloads are written to the catalog, and a client in a new
+        process (a new catalog on the same file) needs no request.
+        """
+        mock_get_json.side_effect = [self.org_payload, self.repos_payload]
+        self.assertEqual(GithubOrgClient("google").public_repos(),
+                         self.expected_repos)
+        self.assertEqual(mock_get_json.call_count, 2)
+
+        GithubOrgClient.catalog.close()
+        GithubOrgClient.catalog = RepoCatalog(self.path)
+        for compact in (False, True):
+            github_org_client = GithubOrgClient("google", compact=compact)
+            self.assertEqual(github_org_client.public_repos(),
+                             self.expected_repos)
+            self.assertEqual(github_org_client.public_repos("apache-2.0"),
+                             self.apache2_repos)
+        self.assertIsInstance(github_org_client.repos_payload[0], Repo)
+        self.assertEqual(mock_get_json.call_count, 2)
+
+    @patch('client.get_json')
+    def test_shared_cache_before_catalog(self, mock_get_json) -> None:
+        """
+        With a shared cache, clients after the first are served decoded
+        payloads from it instead of reading the catalog again.
+        """
+        mock_get_json.side_effect = [self.org_payload, self.repos_payload]
+        GithubOrgClient("google").public_repos()
+        cache = LRUCache(max_entries=16)
+        with patch.object(GithubOrgClient, 'shared_cache', cache), \
+                patch.object(GithubOrgClient.catalog, 'repos',
+                             wraps=GithubOrgClient.catalog.repos) as repos:
+            for _ in range(3):
+                self.assertEqual(GithubOrgClient("google").public_repos(),
+                                 self.expected_repos)
+        self.assertEqual(repos.call_count, 1)
+        self.assertEqual((cache.hits, cache.misses), (4, 2))
+        self.assertEqual(mock_get_json.call_count, 2)
+
+    @patch('client.get_json')
+    def test_compact_repos_stored(self, mock_get_json) -> None:
+        """
+        Repos fetched by a compact client are stored with their columns,
+        marked as projections.
+        """
+        mock_get_json.side_effect = [self.org_payload, self.repos_payload,
+                                     self.repos_payload]
+        GithubOrgClient("google", compact=True).public_repos()
+        self.assertEqual(
+            GithubOrgClient.catalog.public_repos("google", "apache-2.0"),
+            self.apache2_repos)
+        self.assertIsNone(GithubOrgClient.catalog.repos("google"))
+
+        # projections serve compact clients but not full ones, which
+        # refetch and store the full payloads
+        self.assertEqual(
+            GithubOrgClient("google", compact=True).public_repos(),
+            self.expected_repos)
+        self.assertEqual(mock_get_json.call_count, 2)
+        self.assertEqual(GithubOrgClient("google").repos_payload,
+                         self.repos_payload)
+        self.assertEqual(mock_get_json.call_count, 3)
+        self.assertEqual(GithubOrgClient.catalog.repos("google"),
+                         self.repos_payload)
+
+    @patch('client.get_json')
+    def test_keep_raw_repos_stored_whole(self, mock_get_json) -> None:
+        """
+        Repos fetched by a keep_raw client are stored as full payloads.
+        """
+        mock_get_json.side_effect = [self.org_payload, self.repos_payload]
+        GithubOrgClient("google", compact=True, keep_raw=True).public_repos()
+        self.assertEqual(GithubOrgClient.catalog.repos("google"),
+                         self.repos_payload)
+
+    @patch('client.get_json_pages')
+    @patch('client.get_json')
+    def test_sync_upserts_changes(self, mock_get_json, mock_pages) -> None:
+        """
+        Repos changed since the last fetch are upserted by sync.
+        """
+        mock_get_json.side_effect = [self.org_payload, self.repos_payload]
+        github_org_client = GithubOrgClient("google")
+        github_org_client.repos_payload
+        changed = dict(self.repos_payload[0], license={"key": "mit"},
+                       updated_at="2999-01-01T00:00:00Z")
+        mock_pages.return_value = iter([[changed] + self.repos_payload])
+        self.assertEqual(github_org_client.sync(), [changed])
+        self.assertEqual(
+            GithubOrgClient.catalog.public_repos("google", "mit"),
+            [changed["name"]])
+        self.assertEqual(GithubOrgClient.catalog.public_repos("google"),
+                         self.expected_repos)
+
+
+if __name__ == '__main__':
+    unittest.main()
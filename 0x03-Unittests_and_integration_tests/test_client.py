@@ -3,11 +3,18 @@
 This module tests the GithubOrgClient class.
 """
 
+import threading
+import time
 import unittest
+from urllib.parse import parse_qs, urlsplit
 from unittest.mock import PropertyMock, patch
 from parameterized import parameterized, parameterized_class
 from client import GithubOrgClient
-from fixtures import TEST_PAYLOAD
+from fake_server import FakeGithubServer, json_body
+from repo import Repo
+from transport import Response
+from utils import LRUCache, extract_columns, invalidate_memoized
+import fixtures
 
 
 class TestGithubOrgClient(unittest.TestCase):
@@ -42,6 +49,103 @@ class TestGithubOrgClient(unittest.TestCase):
         # Assert the response from .org is as expected
         self.assertEqual(response, test_data)
 
+    @patch('utils.monotonic')
+    @patch('client.get_json')
+    def test_org_ttl(self, mock_get_json, mock_monotonic):
+        """
+        Test that with a ttl the org is refreshed in the background once
+        stale, and that invalidate_memoized forces a refetch.
+        """
+        mock_get_json.side_effect = [{'v': 1}, {'v': 2}, {'v': 3}]
+        mock_monotonic.return_value = 0
+        github_org_client = GithubOrgClient('google', ttl=60)
+        self.assertEqual(github_org_client.org, {'v': 1})
+        mock_monotonic.return_value = 59
+        self.assertEqual(github_org_client.org, {'v': 1})
+
+        mock_monotonic.return_value = 60
+        deadline = time.monotonic() + 5
+        while (github_org_client.org == {'v': 1}
+               and time.monotonic() < deadline):
+            time.sleep(0.001)
+        self.assertEqual(github_org_client.org, {'v': 2})
+        self.assertEqual(mock_get_json.call_count, 2)
+
+        invalidate_memoized(github_org_client, 'org')
+        self.assertEqual(github_org_client.org, {'v': 3})
+
+    @patch('client.get_json')
+    def test_org_single_flight(self, mock_get_json):
+        """
+        Test that 64 threads reading .org at once cause one get_json call.
+        """
+        def slow_get_json(url):
+            time.sleep(0.05)
+            return {'login': 'google'}
+        mock_get_json.side_effect = slow_get_json
+        github_org_client = GithubOrgClient('google')
+        barrier = threading.Barrier(64)
+
+        def read_org():
+            barrier.wait()
+            self.assertEqual(github_org_client.org, {'login': 'google'})
+        threads = [threading.Thread(target=read_org) for _ in range(64)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        mock_get_json.assert_called_once()
+
+    @patch('client.get_json')
+    def test_shared_cache(self, mock_get_json):
+        """
+        Test that instances share org and repos payloads through the
+        opt-in shared cache.
+        """
+        repos_url = 'https://api.github.com/orgs/google/repos'
+        payloads = {
+            'https://api.github.com/orgs/google': {'repos_url': repos_url},
+            repos_url: [{'name': 'repo1'}],
+        }
+        mock_get_json.side_effect = payloads.get
+        cache = LRUCache(max_entries=16)
+
+        with patch.object(GithubOrgClient, 'shared_cache', cache):
+            for _ in range(3):
+                self.assertEqual(GithubOrgClient('google').public_repos(),
+                                 ['repo1'])
+
+        self.assertEqual(mock_get_json.call_count, 2)
+        self.assertEqual((cache.hits, cache.misses), (4, 2))
+        self.assertIsNone(GithubOrgClient.shared_cache)
+
+    @patch('utils.monotonic')
+    @patch('client.get_json')
+    def test_shared_cache_refreshed_on_expiry(self, mock_get_json,
+                                              mock_monotonic):
+        """
+        Test that a ttl refresh refetches instead of being served the
+        stale copy from the shared cache, and updates that copy.
+        """
+        versions = iter(range(1, 10))
+        mock_get_json.side_effect = lambda url: {'v': next(versions)}
+        mock_monotonic.return_value = 0
+        cache = LRUCache(max_entries=16)
+        with patch.object(GithubOrgClient, 'shared_cache', cache):
+            github_org_client = GithubOrgClient('g', ttl=60)
+            self.assertEqual(github_org_client.org, {'v': 1})
+            for version in (2, 3):
+                mock_monotonic.return_value += 60
+                github_org_client.org
+                deadline = time.monotonic() + 5
+                while (github_org_client.org != {'v': version}
+                       and time.monotonic() < deadline):
+                    time.sleep(0.001)
+                self.assertEqual(github_org_client.org, {'v': version})
+            self.assertEqual(GithubOrgClient('g').org, {'v': 3})
+        self.assertEqual(mock_get_json.call_count, 3)
+
     def test_public_repos_url(self):
         """
         Test that the _public_repos_url property returns the correct URL
@@ -84,6 +188,104 @@ class TestGithubOrgClient(unittest.TestCase):
             # Verify that the _public_repos_url property was accessed once
             mock_repos_url.assert_called_once()
 
+    @patch('utils.get_transport')
+    def test_iter_repos(self, mock_get_transport):
+        """
+        Test that iter_repos follows Link rel="next" across pages and that
+        public_repos(stream=True) filters the streamed repos.
+        """
+        base = 'https://api.github.com/orgs/google/repos'
+        pages = {
+            base + '?per_page=2': Response(
+                base, 200, {'Link': '<{}?page=2>; rel="next"'.format(base)},
+                b'[{"name": "a", "license": {"key": "mit"}},'
+                b' {"name": "b", "license": null}]'),
+            base + '?page=2': Response(
+                base, 200, {}, b'[{"name": "c", "license": {"key": "mit"}}]'),
+        }
+        mock_get_transport.return_value.get.side_effect = pages.get
+        mock_get_transport.return_value.stream.side_effect = pages.get
+
+        with patch.object(GithubOrgClient, '_public_repos_url',
+                          new_callable=PropertyMock) as mock_repos_url:
+            mock_repos_url.return_value = base
+            github_org_client = GithubOrgClient('google')
+            names = [repo['name']
+                     for repo in github_org_client.iter_repos(per_page=2)]
+            self.assertEqual(names, ['a', 'b', 'c'])
+
+            mock_repos_url.return_value = base + '?per_page=2'
+            self.assertEqual(
+                github_org_client.public_repos(license='mit', stream=True),
+                ['a', 'c'])
+
+    @patch('client.get_json')
+    def test_bulk_public_repos(self, mock_get_json):
+        """
+        Test that bulk_public_repos returns every org's public repos,
+        filtered by license, and yields failures when asked to.
+        """
+        payloads = {}
+        for org in ("a", "b", "c"):
+            repos_url = "https://api.github.com/orgs/{}/repos".format(org)
+            payloads[GithubOrgClient.ORG_URL.format(org=org)] = {
+                "repos_url": repos_url}
+            payloads[repos_url] = [
+                {"name": org + "1", "license": {"key": "mit"}},
+                {"name": org + "2"},
+            ]
+
+        def fake_get_json(url):
+            if url not in payloads:
+                raise KeyError(url)
+            return payloads[url]
+        mock_get_json.side_effect = fake_get_json
+
+        results = dict(GithubOrgClient.bulk_public_repos(
+            ["a", "b", "c"], license="mit", max_workers=3))
+        self.assertEqual(results, {"a": ["a1"], "b": ["b1"], "c": ["c1"]})
+
+        results = dict(GithubOrgClient.bulk_public_repos(
+            ["a", "missing"], return_exceptions=True))
+        self.assertEqual(results["a"], ["a1", "a2"])
+        self.assertIsInstance(results["missing"], KeyError)
+
+        with self.assertRaises(KeyError):
+            list(GithubOrgClient.bulk_public_repos(["missing"]))
+
+    def test_repos_by_license(self):
+        """
+        Test that the license index groups repos like has_license does,
+        is built once per payload and is rebuilt when the payload changes.
+        """
+        payload = [
+            {"name": "a", "license": {"key": "mit"}},
+            {"name": "b", "license": {"key": "apache-2.0"}},
+            {"name": "c", "license": None},
+            {"name": "d"},
+            {"name": "e", "license": {"key": "mit"}},
+        ]
+        with patch.object(GithubOrgClient, 'repos_payload',
+                          new_callable=PropertyMock) as mock_payload, \
+                patch('client.extract_columns',
+                      wraps=extract_columns) as mock_extract:
+            mock_payload.return_value = payload
+            github_org_client = GithubOrgClient('google')
+
+            self.assertEqual(github_org_client.repos_by_license(), {
+                "mit": ["a", "e"], "apache-2.0": ["b"], None: ["c", "d"]})
+            for key in ("mit", "apache-2.0", "gpl"):
+                self.assertEqual(
+                    github_org_client.public_repos(license=key),
+                    [repo["name"] for repo in payload
+                     if GithubOrgClient.has_license(repo, key)])
+            mock_extract.assert_called_once()
+
+            mock_payload.return_value = payload[:1]
+            self.assertEqual(github_org_client.public_repos(license="mit"),
+                             ["a"])
+            self.assertEqual(mock_extract.call_count, 2)
+
     @parameterized.expand([
         ({"license": {"key": "my_license"}}, "my_license", True),
         ({"license": {"key": "other_license"}}, "my_license", False)
@@ -108,18 +310,158 @@ class TestGithubOrgClient(unittest.TestCase):
         self.assertEqual(result, expected)
 
 
+class TestIncrementalSync(unittest.TestCase):
+    """
+    Tests for GithubOrgClient.sync against a local server that sorts and
+    paginates repo listings like GitHub.
+    """
+
+    def setUp(self) -> None:
+        """Serve an org of 10 repos, updated a day apart."""
+        self.repos = [
+            {"id": i, "name": "repo{}".format(i), "license": None,
+             "updated_at": "2024-01-{:02d}T00:00:00Z".format(i + 1)}
+            for i in range(10)
+        ]
+        self.listings = []
+        self.server = FakeGithubServer({"/orgs/acme/repos": self._listing})
+        self.server.start()
+        self.server.route("/orgs/acme",
+                          {"repos_url": self.server.url("/orgs/acme/repos")})
+        self.org_url = patch.object(GithubOrgClient, 'ORG_URL',
+                                    self.server.url("/orgs/{org}"))
+        self.org_url.start()
+
+    def tearDown(self) -> None:
+        """Stop the server."""
+        self.org_url.stop()
+        self.server.stop()
+
+    def _listing(self, path, headers):
+        """Repos, sorted and paginated when asked to."""
+        query = {k: v[0] for k, v in parse_qs(urlsplit(path).query).items()}
+        self.listings.append(query)
+        repos = list(self.repos)
+        if "sort" in query:
+            field = query["sort"] + "_at"
+            repos.sort(key=lambda r: r[field],
+                       reverse=query.get("direction") == "desc")
+        per_page = int(query.get("per_page", 100))
+        page = int(query.get("page", 1))
+        extra = {}
+        if page * per_page < len(repos):
+            base = path.split("&page=")[0]
+            extra["Link"] = '<{}>; rel="next"'.format(
+                self.server.url("{}&page={}".format(base, page + 1)))
+        return 200, extra, json_body(
+            repos[(page - 1) * per_page:page * per_page])
+
+    def _change(self, i, **fields):
+        """Update repo i (appending it when new) at a later time."""
+        repo = dict(self.repos[i] if i < len(self.repos) else
+                    {"id": i, "name": "repo{}".format(i), "license": None})
+        repo.update(fields, updated_at="2024-02-{:02d}T00:00:00Z".format(i))
+        if i < len(self.repos):
+            self.repos[i] = repo
+        else:
+            self.repos.append(repo)
+
+    def test_sync_fetches_only_changes(self) -> None:
+        """
+        A sync pages through the changed repos only and merges them into
+        the held set, replacing changed repos and appending new ones.
+        """
+        client = GithubOrgClient("acme")
+        self.assertEqual(len(client.sync()), 10)
+        held = client.repos_payload
+        self.assertEqual(client.sync(), [])
+        self.assertIs(client.repos_payload, held)
+
+        self._change(3, license={"key": "mit"})
+        self._change(7)
+        self._change(10)
+        self.listings.clear()
+        changed = client.sync(per_page=2)
+
+        self.assertEqual([r["name"] for r in changed],
+                         ["repo10", "repo7", "repo3"])
+        # 3 changes and the repo at the watermark fill two pages; the
+        # third holds the first unchanged repo
+        self.assertEqual([q.get("page", "1") for q in self.listings],
+                         ["1", "2", "3"])
+        self.assertEqual(self.listings[0]["sort"], "updated")
+        self.assertEqual(sorted(client.repos_payload, key=lambda r: r["id"]),
+                         self.repos)
+        self.assertEqual(client.public_repos("mit"), ["repo3"])
+
+    def test_cold_sync_pages_whole_listing(self) -> None:
+        """
+        A sync without held repos pages through every repo, newest first,
+        so that a later sync picks up changes to the oldest ones.
+        """
+        self.repos.extend(
+            {"id": i, "name": "repo{}".format(i), "license": None,
+             "updated_at": "2024-01-{:02d}T00:00:00Z".format(i + 1)}
+            for i in range(10, 25))
+        client = GithubOrgClient("acme")
+        self.assertEqual(len(client.sync(per_page=10)), 25)
+        self.assertEqual([q.get("page", "1") for q in self.listings],
+                         ["1", "2", "3"])
+        self.assertEqual(len(client.repos_payload), 25)
+        self.assertEqual(client.repos_payload[0]["name"], "repo24")
+
+        self._change(0, license={"key": "mit"})
+        self.assertEqual([r["name"] for r in client.sync(per_page=10)],
+                         ["repo0"])
+        self.assertEqual(len(client.repos_payload), 25)
+        self.assertEqual(client.public_repos("mit"), ["repo0"])
+
+    def test_compact_sync(self) -> None:
+        """
+        Compact clients merge changes as Repo records.
+        """
+        client = GithubOrgClient("acme", compact=True)
+        client.sync()
+        self._change(2, license={"key": "mit"})
+        changed = client.sync()
+        self.assertEqual([type(r) for r in changed], [Repo])
+        self.assertEqual(client.public_repos("mit"), ["repo2"])
+        self.assertEqual(len(client.repos_payload), 10)
+
+    @patch('utils.monotonic')
+    def test_incremental_refresh(self, mock_monotonic) -> None:
+        """
+        With incremental, a stale repos_payload is refreshed by a sync.
+        """
+        mock_monotonic.return_value = 0
+        client = GithubOrgClient("acme", ttl=60, incremental=True)
+        self.assertEqual(len(client.repos_payload), 10)
+        self._change(10)
+        mock_monotonic.return_value = 60
+        deadline = time.monotonic() + 5
+        while (len(client.repos_payload) == 10
+               and time.monotonic() < deadline):
+            time.sleep(0.001)
+        self.assertEqual(len(client.repos_payload), 11)
+        self.assertNotIn("sort", self.listings[0])
+        self.assertEqual(self.listings[-1]["sort"], "updated")
+
+
 @parameterized_class(
-    ("org_payload", "repos_payload", "expected_repos", "apache2_repos"),
-    TEST_PAYLOAD
+    ("fixture",),
+    [("google",), ("synthetic-1000",), ("synthetic-100000",)]
 )
 class TestIntegrationGithubOrgClient(unittest.TestCase):
     """Integration test for the GithubOrgClient class."""
 
     @classmethod
     def setUpClass(cls) -> None:
-        """Set up the mock for requests.get."""
-        cls.get_patcher = patch('requests.get')
-        cls.mock_get = cls.get_patcher.start()
+        """Load the fixture and set up the mock for the shared
+        transport's get."""
+        (cls.org_payload, cls.repos_payload, cls.expected_repos,
+         cls.apache2_repos) = fixtures.load(cls.fixture)
+        cls.get_patcher = patch('utils.get_transport')
+        cls.mock_get = cls.get_patcher.start().return_value.get
         cls.mock_get.return_value.json.side_effect = [
             cls.org_payload,
             cls.repos_payload,
@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+This module tests the revalidating on-disk cache against a local server
+that answers conditional requests with 304 Not Modified.
+"""
+
+import shutil
+import tempfile
+import unittest
+from fake_server import FakeGithubServer, json_body
+from http_cache import CachingTransport
+from transport import PooledTransport
+
+
+class TestCachingTransport(unittest.TestCase):
+    """
+    Tests for CachingTransport revalidation, persistence and eviction.
+    """
+
+    def setUp(self) -> None:
+        """Start a server whose routes honour If-None-Match."""
+        self.directory = tempfile.mkdtemp()
+        self.seen = []
+        self.server = FakeGithubServer()
+        for org in ("google", "abc", "xyz"):
+            self.server.route("/orgs/" + org, self._conditional(org))
+        self.server.start()
+        self.transport = CachingTransport(PooledTransport(), self.directory)
+
+    def tearDown(self) -> None:
+        """Stop the server and remove the cache directory."""
+        self.transport.close()
+        self.server.stop()
+        shutil.rmtree(self.directory)
+
+    def _conditional(self, org: str):
+        """Route answering 304 when the client already holds org's ETag."""
+        etag = '"{}-v1"'.format(org)
+
+        def handler(path, headers):
+            self.seen.append(headers.get("if-none-match"))
+            if headers.get("if-none-match") == etag:
+                return 304, {"ETag": etag}, b""
+            return 200, {"ETag": etag}, json_body({"login": org})
+        return handler
+
+    def test_revalidates_with_etag(self) -> None:
+        """
+        The second fetch sends If-None-Match and is served from disk when
+        the server answers 304.
+        """
+        url = self.server.url("/orgs/google")
+        first = self.transport.get(url)
+        second = self.transport.get(url)
+
+        self.assertEqual(self.seen, [None, '"google-v1"'])
+        self.assertEqual(second.status_code, 200)
+        self.assertEqual(second.json(), first.json())
+        self.assertEqual((self.transport.hits, self.transport.misses), (1, 1))
+
+    def test_persists_across_instances(self) -> None:
+        """
+        A new CachingTransport over the same directory reuses entries.
+        """
+        url = self.server.url("/orgs/abc")
+        self.transport.get(url)
+        reopened = CachingTransport(PooledTransport(), self.directory)
+        try:
+            response = reopened.get(url)
+        finally:
+            reopened.close()
+
+        self.assertEqual(self.seen, [None, '"abc-v1"'])
+        self.assertEqual(response.json(), {"login": "abc"})
+        self.assertEqual(reopened.hits, 1)
+
+    def test_lru_eviction(self) -> None:
+        """
+        Storing past max_bytes evicts the least recently used entry.
+        """
+        urls = [self.server.url("/orgs/" + org)
+                for org in ("google", "abc", "xyz")]
+        self.transport.get(urls[0])
+        self.transport.max_bytes = self.transport.size * 2 + 10
+        self.transport.get(urls[1])
+        self.transport.get(urls[0])
+        self.transport.get(urls[2])
+
+        self.assertEqual(self.transport.evictions, 1)
+        self.seen.clear()
+        self.transport.get(urls[0])
+        self.transport.get(urls[1])
+        self.assertEqual(self.seen, ['"google-v1"', None])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,214 @@
+#!/usr/bin/env python3
+"""
+This module tests the metrics registry and the get_json and memoize
+instrumentation.
+"""
+
+import math
+import unittest
+from unittest.mock import MagicMock, patch
+from parameterized import parameterized, parameterized_class
+import fixtures
+import metrics
+from client import GithubOrgClient
+from fake_server import FakeGithubServer, json_body
+from metrics import FanoutSink, MetricsRegistry, endpoint, set_sink
+from repo import Repo
+from transport import set_transport
+
+
+class TestMetricsRegistry(unittest.TestCase):
+    """
+    Tests for MetricsRegistry and the Prometheus text it renders.
+    """
+
+    @parameterized.expand([
+        ("org", "https://api.github.com/orgs/google", "/orgs/{org}"),
+        ("listing", "https://api.github.com/orgs/google/repos?page=2",
+         "/orgs/{org}/repos"),
+        ("repo", "https://api.github.com/repos/google/truth/commits",
+         "/repos/{owner}/{repo}/commits"),
+        ("other", "http://127.0.0.1:8000/rate_limit", "/rate_limit"),
+    ])
+    def test_endpoint(self, _, url, expected) -> None:
+        """
+        Test that endpoint replaces names in url with placeholders.
+
+        Args:
+            url: the requested URL
+            expected: the endpoint label
+        """
+        self.assertEqual(endpoint(url), expected)
+
+    def test_counters_and_histograms(self) -> None:
+        """
+        Test that counters sum over matching series and histograms give
+        bucket-bound quantiles.
+        """
+        registry = MetricsRegistry({"latency": (0.1, 1.0)})
+        registry.inc("hits", (("name", "a"),))
+        registry.inc("hits", (("name", "b"),), 2)
+        for value in (0.05, 0.05, 0.5, 5.0):
+            registry.observe("latency", value, (("endpoint", "/x"),))
+
+        self.assertEqual(registry.counter("hits"), 3)
+        self.assertEqual(registry.counter("hits", name="b"), 2)
+        self.assertEqual(registry.counter("hits", name="c"), 0)
+        summary = registry.histogram("latency", endpoint="/x")
+        self.assertEqual(summary["count"], 4)
+        self.assertAlmostEqual(summary["sum"], 5.6)
+        self.assertEqual(summary["p50"], 0.1)
+        self.assertEqual(summary["p95"], math.inf)
+        self.assertTrue(math.isnan(registry.histogram("other")["mean"]))
+
+    def test_prometheus(self) -> None:
+        """
+        Test the Prometheus text exposition of counters and histograms.
+        """
+        registry = MetricsRegistry({"size_bytes": (10, 100)})
+        registry.inc("requests_total", (("path", 'a"b'),))
+        registry.observe("size_bytes", 50)
+        registry.observe("size_bytes", 500)
+        self.assertEqual(registry.prometheus(), "\n".join([
+            "# TYPE requests_total counter",
+            'requests_total{path="a\\"b"} 1',
+            "# TYPE size_bytes histogram",
+            'size_bytes_bucket{le="10"} 0',
+            'size_bytes_bucket{le="100"} 1',
+            'size_bytes_bucket{le="+Inf"} 2',
+            "size_bytes_sum 550.0",
+            "size_bytes_count 2",
+        ]) + "\n")
+
+    def test_fanout(self) -> None:
+        """
+        Test that FanoutSink forwards every value to each sink.
+        """
+        first, second = MetricsRegistry(), MagicMock()
+        sink = FanoutSink(first, second)
+        sink.inc("hits", (("name", "a"),))
+        sink.observe("latency", 0.2)
+        self.assertEqual(first.counter("hits"), 1)
+        second.inc.assert_called_once_with("hits", (("name", "a"),), 1)
+        second.observe.assert_called_once_with("latency", 0.2, ())
+
+
+@parameterized_class(
+    ("fixture",),
+    [("google",)]
+)
+class TestInstrumentation(unittest.TestCase):
+    """
+    Tests for the metrics recorded by get_json and memoize.
+    """
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        """Load the fixture."""
+        (cls.org_payload, cls.repos_payload, cls.expected_repos,
+         cls.apache2_repos) = fixtures.load(cls.fixture)
+
+    def setUp(self) -> None:
+        """Serve the fixtures locally and install a registry."""
+        self.server = FakeGithubServer().start()
+        self.server.route("/orgs/google",
+                          dict(self.org_payload,
+                               repos_url=self.server.url(
+                                   "/orgs/google/repos")))
+        self.server.route("/orgs/google/repos", self.repos_payload)
+        self.org_url = patch.object(GithubOrgClient, "ORG_URL",
+                                    self.server.url("/orgs/{org}"))
+        self.org_url.start()
+        self.registry = MetricsRegistry()
+        self.assertIsNone(set_sink(self.registry))
+
+    def tearDown(self) -> None:
+        """Remove the registry and stop the server."""
+        set_sink(None)
+        self.org_url.stop()
+        set_transport(None).close()
+        self.server.stop()
+
+    def test_get_json_metrics(self) -> None:
+        """
+        Test that each endpoint gets its request count, latency split and
+        body size.
+        """
+        self.assertEqual(GithubOrgClient("google").public_repos(),
+                         self.expected_repos)
+        self.assertEqual(
+            self.registry.counter("get_json_requests_total", status="200"), 2)
+        listing = {"endpoint": "/orgs/{org}/repos"}
+        total = self.registry.histogram("get_json_seconds", **listing)
+        network = self.registry.histogram("get_json_network_seconds",
+                                          **listing)
+        decode = self.registry.histogram("get_json_decode_seconds", **listing)
+        self.assertEqual(total["count"], 1)
+        self.assertAlmostEqual(total["sum"], network["sum"] + decode["sum"])
+        size = self.registry.histogram("get_json_response_bytes", **listing)
+        self.assertEqual(size["sum"], len(json_body(self.repos_payload)))
+        self.assertIn('get_json_seconds_count{endpoint="/orgs/{org}"} 1',
+                      self.registry.prometheus())
+
+    def test_streamed_get_json_metrics(self) -> None:
+        """
+        Test that projected (streamed) listings count every body byte.
+        """
+        github_org_client = GithubOrgClient("google", compact=True)
+        self.assertEqual(github_org_client.public_repos(),
+                         self.expected_repos)
+        self.assertIsInstance(github_org_client.repos_payload[0], Repo)
+        size = self.registry.histogram("get_json_response_bytes",
+                                       endpoint="/orgs/{org}/repos")
+        self.assertEqual(size["sum"], len(json_body(self.repos_payload)))
+
+    def test_wire_bytes(self) -> None:
+        """
+        Test that compressed listings record wire bytes below body bytes.
+        """
+        self.server.compress = True
+        GithubOrgClient("google").public_repos()
+        listing = {"endpoint": "/orgs/{org}/repos"}
+        wire = self.registry.histogram("get_json_wire_bytes", **listing)
+        body = self.registry.histogram("get_json_response_bytes", **listing)
+        self.assertEqual(wire["count"], 1)
+        self.assertLess(wire["sum"] * 4, body["sum"])
+
+    def test_errors_counted(self) -> None:
+        """
+        Test that failing requests are counted by error type.
+        """
+        with patch.object(GithubOrgClient, "ORG_URL",
+                          "http://127.0.0.1:1/orgs/{org}"):
+            with self.assertRaises(OSError):
+                GithubOrgClient("google").org
+        self.assertEqual(
+            self.registry.counter("get_json_errors_total",
+                                  endpoint="/orgs/{org}"), 1)
+
+    def test_memoize_hit_ratio(self) -> None:
+        """
+        Test that memoize counts one miss then hits per memoized name.
+        """
+        github_org_client = GithubOrgClient("google")
+        for _ in range(3):
+            github_org_client.org
+        name = "GithubOrgClient.org"
+        self.assertEqual(self.registry.counter("memoize_misses_total",
+                                               name=name), 1)
+        self.assertEqual(self.registry.counter("memoize_hits_total",
+                                               name=name), 2)
+        self.assertAlmostEqual(self.registry.hit_ratio(name), 2 / 3)
+
+    def test_disabled(self) -> None:
+        """
+        Test that nothing is recorded once the sink is removed.
+        """
+        set_sink(None)
+        GithubOrgClient("google").public_repos()
+        self.assertIsNone(metrics.get_sink())
+        self.assertEqual(self.registry.prometheus(), "\n")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,208 @@
+#!/usr/bin/env python3
+"""
+This module tests the indexed query engine against brute-force list
+comprehensions over the same repos.
+"""
+
+import random
+import unittest
+from unittest.mock import PropertyMock, patch
+from parameterized import parameterized
+import fixtures
+from client import GithubOrgClient
+from query import Field, RepoIndex
+from utils import access_nested_map, extract_columns
+
+MISSING = object()
+
+
+def make_repos(count, seed=0):
+    """Deterministic repos with a few missing or null fields."""
+    rng = random.Random(seed)
+    repos = []
+    for i in range(count):
+        repo = {
+            "name": "repo{}".format(i),
+            "language": rng.choice(["Python", "Go", "C", None]),
+            "fork": rng.random() < 0.3,
+            "archived": rng.random() < 0.1,
+            "stargazers_count": rng.randrange(50),
+            "forks": rng.randrange(20),
+            "license": rng.choice([{"key": "mit"}, {"key": "bsd"}, None]),
+        }
+        if i % 17 == 0:
+            del repo["stargazers_count"]
+        repos.append(repo)
+    return repos
+
+
+def value(repo, path):
+    """access_nested_map, with MISSING instead of KeyError."""
+    try:
+        return access_nested_map(repo, path)
+    except KeyError:
+        return MISSING
+
+
+def present(repo, path):
+    """Whether repo has a non-None value at path."""
+    return value(repo, path) not in (MISSING, None)
+
+
+def brute_order(repos, path, descending):
+    """Reference ordering: present values sorted stably, missing last."""
+    have = [r for r in repos if present(r, path)]
+    have.sort(key=lambda r: value(r, path), reverse=descending)
+    return have + [r for r in repos if not present(r, path)]
+
+
+class TestRepoIndex(unittest.TestCase):
+    """
+    Tests comparing RepoIndex queries with brute-force filtering.
+    """
+
+    STARS = ("stargazers_count",)
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        """Mix generated repos with the recorded ones."""
+        cls.REPOS = make_repos(400) + fixtures.load("google")[1]
+
+    @parameterized.expand([
+        ("eq", Field("language") == "Go",
+         lambda r: value(r, ("language",)) == "Go"),
+        ("ne", Field("language") != "Go",
+         lambda r: present(r, ("language",))
+         and value(r, ("language",)) != "Go"),
+        ("nested", Field("license", "key") == "mit",
+         lambda r: value(r, ("license", "key")) == "mit"),
+        ("isin", Field("language").isin(["C", "Go"]),
+         lambda r: value(r, ("language",)) in ("C", "Go")),
+        ("range", Field("stargazers_count").between(10, 20),
+         lambda r: present(r, ("stargazers_count",))
+         and 10 <= r["stargazers_count"] <= 20),
+        ("gt", Field("forks") > 15,
+         lambda r: present(r, ("forks",)) and r["forks"] > 15),
+        ("lt", Field("forks") < 3,
+         lambda r: present(r, ("forks",)) and r["forks"] < 3),
+        ("truthy", ~Field("fork") & ~Field("archived"),
+         lambda r: not r.get("fork") and not r.get("archived")),
+        ("or", (Field("language") == "C") | (Field("forks") >= 19),
+         lambda r: value(r, ("language",)) == "C"
+         or (present(r, ("forks",)) and r["forks"] >= 19)),
+    ])
+    def test_filters(self, _, predicate, reference):
+        """
+        Test that each predicate selects exactly the brute-force matches,
+        in payload order.
+
+        Args:
+            predicate (Predicate): The predicate under test.
+            reference (callable): Brute-force equivalent.
+        """
+        index = RepoIndex(self.REPOS)
+        expected = [r["name"] for r in self.REPOS if reference(r)]
+        self.assertEqual(index.query(predicate).names(), expected)
+        self.assertEqual(index.query(predicate).count(), len(expected))
+
+    @parameterized.expand([
+        (None, False, None),
+        (None, True, 7),
+        (Field("language") == "Go", True, None),
+        (Field("language") == "Go", False, 5),
+        (Field("name") == "repo3", True, 5),
+        (Field("forks") > 18, True, 3),
+    ])
+    def test_order_by(self, predicate, descending, limit):
+        """
+        Test ordering, with and without filters and limits, including the
+        heap path used for small candidate sets.
+        """
+        index = RepoIndex(self.REPOS)
+        query = index.query(predicate).order_by(self.STARS, descending)
+        if limit is not None:
+            query = query.limit(limit)
+        matching = [r for r in self.REPOS
+                    if predicate is None or r in index.query(predicate).all()]
+        expected = brute_order(matching, self.STARS, descending)[:limit]
+        self.assertEqual(query.all(), expected)
+
+    def test_top(self):
+        """
+        Test top-k by stars among non-forks.
+        """
+        index = RepoIndex(self.REPOS)
+        expected = brute_order([r for r in self.REPOS if not r["fork"]],
+                               self.STARS, True)[:10]
+        self.assertEqual(index.query(~Field("fork")).top(10, self.STARS),
+                         expected)
+
+    def test_indexes_built_lazily_once(self):
+        """
+        Test that a field's column is extracted once and only when used.
+        """
+        index = RepoIndex(self.REPOS)
+        with patch('query.extract_columns', wraps=extract_columns) as mock:
+            index.query(Field("forks") > 3).names()
+            index.query(Field("forks") < 3).order_by("forks").names()
+            index.query(Field("forks") == 3).names()
+            self.assertEqual(mock.call_count, 1)
+
+    def test_present_and_truthy_sets_cached(self):
+        """
+        Test that != and bare-field predicates reuse the position sets of
+        their field instead of rescanning its column.
+        """
+        index = RepoIndex(self.REPOS)
+        for where in (Field("language") != "Go", ~Field("archived")):
+            first = index.query(where).names()
+            with patch.object(RepoIndex, 'column',
+                              side_effect=AssertionError("rescanned")):
+                self.assertEqual(index.query(where).names(), first)
+
+    def test_booleans_apart_from_integers(self):
+        """
+        Test that True and False only match booleans, not 1 and 0.
+        """
+        repos = [{"name": "one", "v": 1}, {"name": "true", "v": True},
+                 {"name": "zero", "v": 0}, {"name": "false", "v": False}]
+        index = RepoIndex(repos)
+        self.assertEqual(index.query(Field("v") == True).names(),  # noqa
+                         ["true"])
+        self.assertEqual(index.query(Field("v") == 1).names(), ["one"])
+        self.assertEqual(index.query(Field("v").isin([0, False])).names(),
+                         ["zero", "false"])
+        self.assertEqual(index.query(Field("v") != False).names(),  # noqa
+                         ["one", "true", "zero"])
+
+
+class TestClientQuery(unittest.TestCase):
+    """
+    Tests for GithubOrgClient.query.
+    """
+
+    def test_query_reuses_index_per_payload(self):
+        """
+        Test that query answers from repos_payload and keeps its index
+        until the payload changes.
+        """
+        _, repos, _, apache2 = fixtures.load("google")
+        with patch.object(GithubOrgClient, 'repos_payload',
+                          new_callable=PropertyMock) as mock_payload:
+            mock_payload.return_value = repos
+            github_org_client = GithubOrgClient('google')
+            apache = Field("license", "key") == "apache-2.0"
+            self.assertEqual(github_org_client.query(apache).names(),
+                             apache2)
+            index = github_org_client._repo_index
+            github_org_client.query()
+            self.assertIs(github_org_client._repo_index, index)
+
+            mock_payload.return_value = repos[:1]
+            self.assertEqual(github_org_client.query().names(),
+                             [repos[0]["name"]])
+            self.assertIsNot(github_org_client._repo_index, index)
+
+
+if __name__ == '__main__':
+    unittest.main()
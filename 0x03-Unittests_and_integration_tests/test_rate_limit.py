@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+"""
+This module tests the rate-limit-aware transport against a local server
+enforcing a request quota, with a simulated clock.
+"""
+
+import threading
+import unittest
+from unittest.mock import MagicMock
+from parameterized import parameterized
+from fake_server import FakeGithubServer, json_body
+from rate_limit import RateLimitedTransport
+from transport import PooledTransport, Response
+
+
+class FakeClock:
+    """A clock that only moves when slept on."""
+
+    def __init__(self, now: float = 1000.0) -> None:
+        """Start at now."""
+        self.now = now
+        self.sleeps = []
+        self._lock = threading.Lock()
+
+    def __call__(self) -> float:
+        """Current simulated time."""
+        return self.now
+
+    def sleep(self, seconds: float) -> None:
+        """Advance the clock by seconds."""
+        with self._lock:
+            self.sleeps.append(seconds)
+            self.now += seconds
+
+
+def scripted(*responses):
+    """Transport returning (or raising) responses in order."""
+    transport = MagicMock()
+    transport.get.side_effect = [
+        r if isinstance(r, Exception) else Response("u", r[0], r[1], b"{}")
+        for r in responses
+    ]
+    return transport
+
+
+class TestRateLimitedTransport(unittest.TestCase):
+    """
+    Tests for quota tracking, pacing and retries.
+    """
+
+    def setUp(self) -> None:
+        """Start a server allowing 10 requests per 60 simulated seconds."""
+        self.clock = FakeClock()
+        self.server = FakeGithubServer({"/orgs/google": {"login": "google"}},
+                                       quota=10, window=60,
+                                       clock=self.clock)
+        self.server.start()
+        self.url = self.server.url("/orgs/google")
+        self.pooled = []
+
+    def tearDown(self) -> None:
+        """Close the pooled transports and stop the server."""
+        for transport in self.pooled:
+            transport.close()
+        self.server.stop()
+
+    def transport(self, inner=None, **kwargs):
+        """A RateLimitedTransport driven by the simulated clock."""
+        if inner is None:
+            inner = PooledTransport()
+            self.pooled.append(inner)
+        return RateLimitedTransport(
+            inner, clock=self.clock,
+            wall_clock=self.clock, sleep=self.clock.sleep,
+            rng=lambda: 0.5, **kwargs)
+
+    def test_waits_for_reset_instead_of_failing(self) -> None:
+        """
+        Crawling three quotas' worth of requests never gets a 403: the
+        transport waits for each window to reset, and only then.
+        """
+        transport = self.transport()
+        for _ in range(30):
+            self.assertEqual(transport.get(self.url).json(),
+                             {"login": "google"})
+
+        self.assertEqual(self.server.rejected_count, 0)
+        self.assertEqual(self.server.request_count, 30)
+        self.assertEqual(transport.retries, 0)
+        self.assertEqual(len(self.clock.sleeps), 2)
+        self.assertLessEqual(self.clock.now - 1000, 121)
+
+    def test_concurrent_requests_share_quota(self) -> None:
+        """
+        Threads sharing one transport never overdraw the quota once it is
+        known.
+        """
+        transport = self.transport()
+        transport.get(self.url)
+
+        def crawl():
+            for _ in range(6):
+                transport.get(self.url)
+        threads = [threading.Thread(target=crawl) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(self.server.rejected_count, 0)
+        self.assertEqual(self.server.request_count, 25)
+
+    def test_retries_rate_limited_answer(self) -> None:
+        """
+        A 403 for an exhausted quota is retried after the reset it
+        announces.
+        """
+        transport = self.transport(inner=scripted(
+            (403, {"X-RateLimit-Remaining": "0",
+                   "X-RateLimit-Reset": "1030"}),
+            (200, {"X-RateLimit-Remaining": "99",
+                   "X-RateLimit-Reset": "4600"}),
+        ))
+        self.assertEqual(transport.get("u").status_code, 200)
+        self.assertEqual(self.clock.sleeps, [30.0])
+        self.assertEqual((transport.remaining, transport.reset), (99, 4600))
+
+    @parameterized.expand([
+        ("seconds", "7", 7.0),
+        ("date", "Thu, 01 Jan 1970 00:17:00 GMT", 20.0),
+    ])
+    def test_honours_retry_after(self, _, value, expected) -> None:
+        """
+        Retry-After, in seconds or as a date, sets the wait before the
+        retry.
+
+        Args:
+            value (str): The Retry-After header.
+            expected (float): Seconds the transport should wait.
+        """
+        transport = self.transport(inner=scripted(
+            (429, {"Retry-After": value}), (200, {})))
+        self.assertEqual(transport.get("u").status_code, 200)
+        self.assertEqual(self.clock.sleeps, [expected])
+
+    def test_backoff_on_server_errors(self) -> None:
+        """
+        5xx answers and connection errors are retried with jittered
+        exponential backoff; the last answer is returned once retries run
+        out.
+        """
+        transport = self.transport(
+            inner=scripted((502, {}), ConnectionError(), (503, {}),
+                           (500, {})),
+            max_retries=3, base_delay=1.0, max_delay=3.0)
+        self.assertEqual(transport.get("u").status_code, 500)
+        self.assertEqual(self.clock.sleeps, [0.5, 1.0, 1.5])
+        self.assertEqual(transport.retries, 3)
+
+        transport = self.transport(inner=scripted(ConnectionError()),
+                                   max_retries=0)
+        with self.assertRaises(ConnectionError):
+            transport.get("u")
+
+    @parameterized.expand([
+        (403, {}),
+        (404, {}),
+        (200, {"Retry-After": "5"}),
+    ])
+    def test_final_answers_not_retried(self, status, headers) -> None:
+        """
+        Permission errors, missing resources and successes are returned
+        at once.
+
+        Args:
+            status (int): The answer's status.
+            headers (dict): The answer's headers.
+        """
+        inner = scripted((status, headers))
+        response = self.transport(inner=inner).get("u")
+        self.assertEqual(response.status_code, status)
+        self.assertEqual(inner.get.call_count, 1)
+        self.assertEqual(self.clock.sleeps, [])
+
+    def test_token_bucket_paces_requests(self) -> None:
+        """
+        With rate and burst, requests beyond the burst are spaced 1/rate
+        apart.
+        """
+        transport = self.transport(rate=10, burst=5)
+        for _ in range(10):
+            transport.get(self.url)
+        self.assertEqual(len(self.clock.sleeps), 5)
+        self.assertAlmostEqual(self.clock.now - 1000, 0.5)
+
+    def test_server_quota_headers(self) -> None:
+        """
+        The fake server reports its quota and rejects requests over it.
+        """
+        transport = PooledTransport()
+        self.pooled.append(transport)
+        for remaining in range(9, -1, -1):
+            response = transport.get(self.url)
+            self.assertEqual(response.headers["x-ratelimit-remaining"],
+                             str(remaining))
+        response = transport.get(self.url)
+        self.assertEqual(response.status_code, 403)
+        self.assertEqual(response.headers["x-ratelimit-reset"], "1020")
+        self.assertEqual(response.content,
+                         json_body({"message": "API rate limit exceeded"}))
+        self.assertEqual(self.server.rejected_count, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
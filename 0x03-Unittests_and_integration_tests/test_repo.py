@@ -0,0 +1,214 @@
+#!/usr/bin/env python3
+"""
+This module tests the compact Repo record and the client's compact mode.
+"""
+
+import copy
+import json
+import pickle
+import tracemalloc
+import unittest
+from unittest.mock import patch
+from parameterized import parameterized
+import fixtures
+from client import GithubOrgClient
+from query import Field, RepoIndex
+from repo import Repo
+from utils import access_nested_map, extract_columns
+
+
+class TestRepo(unittest.TestCase):
+    """
+    Tests for the Repo mapping.
+    """
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        """Load the recorded repo payloads."""
+        cls.repos = fixtures.load("google")[1]
+
+    def test_fields_match_payload(self):
+        """
+        Test that every kept field reads as in the payload, with license
+        and owner reduced to their key and login.
+        """
+        for payload in self.repos:
+            repo = Repo(payload)
+            for key in Repo.SCALARS:
+                self.assertEqual(repo[key], payload[key])
+            self.assertEqual(repo["forks"], payload["forks"])
+            license = payload["license"]
+            self.assertEqual(repo["license"],
+                             license and {"key": license["key"]})
+            self.assertEqual(repo.license_key, license and license["key"])
+            self.assertEqual(repo["owner"],
+                             {"login": payload["owner"]["login"]})
+            self.assertEqual(repo.owner_login, payload["owner"]["login"])
+
+    @parameterized.expand([
+        ({}, ("name",)),
+        ({"name": "a"}, ("license",)),
+        ({"license": {"name": "MIT"}}, ("license", "key")),
+        ({"license": None}, ("license", "key")),
+        ({"name": "a"}, ("description",)),
+    ])
+    def test_missing_keys_raise(self, payload, path):
+        """
+        Test that access_nested_map raises the same KeyError on a Repo as
+        on the payload it was built from.
+
+        Args:
+            payload (dict): A partial repo payload.
+            path (tuple): A path missing from payload.
+        """
+        with self.assertRaises(KeyError) as expected:
+            access_nested_map(payload, path)
+        with self.assertRaises(KeyError) as error:
+            access_nested_map(Repo(payload), path)
+        self.assertEqual(error.exception.args, expected.exception.args)
+
+    def test_keep_raw_is_lossless(self):
+        """
+        Test that with keep_raw every key reads as in the payload.
+        """
+        for payload in self.repos:
+            repo = Repo(payload, keep_raw=True)
+            self.assertEqual(dict(repo), payload)
+            self.assertEqual(repo.raw(), payload)
+            self.assertEqual(repo["permissions"], payload["permissions"])
+        self.assertIsNone(Repo(self.repos[0]).raw())
+
+    def test_keep_raw_nested_keys_from_slots(self):
+        """
+        Test that license keys and owner logins of keep_raw Repos are read
+        without decoding the raw payload, and other sub-keys still are.
+        """
+        repos = [Repo(payload, keep_raw=True) for payload in self.repos]
+        with patch.object(Repo, "raw", side_effect=AssertionError):
+            self.assertEqual(
+                [GithubOrgClient.has_license(r, "apache-2.0")
+                 for r in repos],
+                [GithubOrgClient.has_license(r, "apache-2.0")
+                 for r in self.repos])
+            for repo, payload in zip(repos, self.repos):
+                self.assertEqual(access_nested_map(repo, ("owner", "login")),
+                                 payload["owner"]["login"])
+        payload = self.repos[0]
+        self.assertEqual(repos[0]["owner"]["id"], payload["owner"]["id"])
+        self.assertEqual(repos[0]["owner"], payload["owner"])
+        with self.assertRaises(KeyError):
+            Repo({"license": {"name": "MIT"}}, keep_raw=True)["license"][
+                "key"]
+
+    def test_keep_raw_decodes_once_per_read(self):
+        """
+        Test that whole-mapping reads of a keep_raw Repo (items, len,
+        equality) decode its raw payload at most once each.
+        """
+        payload = self.repos[0]
+        repo = Repo(payload, keep_raw=True)
+        other = Repo(copy.deepcopy(payload), keep_raw=True)
+        with patch('repo.json.loads', wraps=json.loads) as loads:
+            self.assertEqual(dict(repo.items()), payload)
+            self.assertEqual(loads.call_count, 1)
+            self.assertEqual(len(repo), len(payload))
+            self.assertEqual(loads.call_count, 2)
+            self.assertTrue(repo == other)
+            self.assertEqual(loads.call_count, 2)
+            self.assertTrue(repo == payload)
+            self.assertEqual(loads.call_count, 3)
+        self.assertNotEqual(repo, Repo(dict(payload, name="x"),
+                                       keep_raw=True))
+        self.assertEqual(Repo(payload), dict(Repo(payload).items()))
+
+    def test_read_only_and_picklable(self):
+        """
+        Test that a Repo cannot be modified and survives pickle and copy.
+        """
+        repo = Repo(self.repos[0])
+        with self.assertRaises(AttributeError):
+            repo.name = "other"
+        with self.assertRaises(TypeError):
+            repo["name"] = "other"
+        for clone in (pickle.loads(pickle.dumps(repo)), copy.copy(repo)):
+            self.assertEqual(clone, repo)
+        raw = Repo(self.repos[0], keep_raw=True)
+        self.assertEqual(pickle.loads(pickle.dumps(raw)).raw(), self.repos[0])
+
+    def test_strings_interned(self):
+        """
+        Test that repeated license keys and owner logins are shared.
+        """
+        repos = [Repo(copy.deepcopy(payload)) for payload in self.repos * 2]
+        self.assertIs(repos[0].owner_login, repos[-1].owner_login)
+        self.assertIs(repos[0].license_key,
+                      repos[len(self.repos)].license_key)
+
+    def test_smaller_than_payload(self):
+        """
+        Test that Repos take several times less memory than the decoded
+        payloads they replace.
+        """
+        body = json.dumps(self.repos * 10)
+
+        def traced(build):
+            tracemalloc.start()
+            try:
+                kept = build()
+                return tracemalloc.get_traced_memory()[0], kept
+            finally:
+                tracemalloc.stop()
+        dicts, _ = traced(lambda: json.loads(body))
+        repos, _ = traced(lambda: [Repo(r) for r in json.loads(body)])
+        self.assertLess(repos * 4, dicts)
+
+    def test_drop_in_for_dicts(self):
+        """
+        Test that has_license, extract_columns and the query engine give
+        the same answers on Repos as on dicts.
+        """
+        repos = [Repo(payload) for payload in self.repos]
+        paths = [("name",), ("license", "key"), ("stargazers_count",)]
+        self.assertEqual(extract_columns(repos, paths),
+                         extract_columns(self.repos, paths))
+        self.assertEqual(
+            [GithubOrgClient.has_license(r, "apache-2.0") for r in repos],
+            [GithubOrgClient.has_license(r, "apache-2.0") for r in self.repos])
+        where = (Field("license", "key") == "apache-2.0") & ~Field("fork")
+        self.assertEqual(RepoIndex(repos).query(where).names(),
+                         RepoIndex(self.repos).query(where).names())
+
+
+class TestCompactClient(unittest.TestCase):
+    """
+    Tests for GithubOrgClient(compact=True).
+    """
+
+    @parameterized.expand([
+        (False, Repo.PATHS),
+        (True, None),
+    ])
+    @patch('client.get_json')
+    def test_compact_repos_payload(self, keep_raw, fields, mock_get_json):
+        """
+        Test that compact clients hold Repos decoded from a projection of
+        the payload, or from the full payload with keep_raw.
+
+        Args:
+            keep_raw (bool): Whether full payloads are kept.
+            fields (tuple): The fields get_json should be asked for.
+        """
+        org_payload, repos_payload, expected, apache2 = fixtures.load("google")
+        mock_get_json.side_effect = [org_payload, repos_payload]
+        github_org_client = GithubOrgClient('google', compact=True,
+                                            keep_raw=keep_raw)
+        self.assertEqual(github_org_client.public_repos(), expected)
+        self.assertEqual(github_org_client.public_repos("apache-2.0"),
+                         apache2)
+        self.assertTrue(all(isinstance(repo, Repo) for repo
+                            in github_org_client.repos_payload))
+        mock_get_json.assert_called_with(org_payload["repos_url"], fields)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,247 @@
+#!/usr/bin/env python3
+"""
+This module tests hedged requests, the circuit breaker and request
+deadlines.
+"""
+
+import threading
+import time
+import unittest
+from parameterized import parameterized
+from fake_server import FakeGithubServer
+from resilience import (
+    CircuitBreakerTransport,
+    CircuitOpenError,
+    HedgedTransport,
+)
+from transport import PooledTransport, Response
+
+
+class SlowTransport:
+    """Transport answering after scripted delays, in call order."""
+
+    def __init__(self, *delays):
+        """Answer the n-th call after delays[n] seconds; an exception
+        instance is raised instead, a (seconds, exception) pair raised
+        after sleeping."""
+        self.delays = list(delays)
+        self.calls = 0
+        self.closed = False
+        self._lock = threading.Lock()
+
+    def get(self, url, headers=None):
+        """Sleep, then answer with the number of the call."""
+        with self._lock:
+            n = self.calls
+            self.calls += 1
+        delay = self.delays[n]
+        if isinstance(delay, Exception):
+            raise delay
+        if isinstance(delay, tuple):
+            time.sleep(delay[0])
+            raise delay[1]
+        time.sleep(delay)
+        return Response(url, 200, {}, str(n).encode())
+
+    def close(self):
+        """Remember being closed."""
+        self.closed = True
+
+
+class ManualClock:
+    """A clock moved by hand."""
+
+    def __init__(self):
+        """Start at 0."""
+        self.now = 0.0
+
+    def __call__(self):
+        """Current simulated time."""
+        return self.now
+
+
+def status_transport(*outcomes):
+    """Transport answering with each HTTP status (or raising each error)
+    in turn."""
+    transport = SlowTransport(*[
+        o if isinstance(o, Exception) else 0 for o in outcomes])
+    statuses = list(outcomes)
+
+    def get(url, headers=None):
+        n = transport.calls
+        response = SlowTransport.get(transport, url, headers)
+        return Response(url, statuses[n], {}, response.content)
+    transport.get = get
+    return transport
+
+
+class TestHedgedTransport(unittest.TestCase):
+    """
+    Tests for hedging slow requests.
+    """
+
+    URL = "https://api.github.com/orgs/google"
+
+    def test_slow_primary_is_hedged(self) -> None:
+        """
+        Test that a request slower than the hedge delay is duplicated and
+        the faster duplicate answers.
+        """
+        upstream = SlowTransport(1.0, 0.0)
+        with HedgedTransport(upstream, initial_delay=0.02,
+                             budget=1.0) as hedged:
+            start = time.perf_counter()
+            response = hedged.get(self.URL)
+            elapsed = time.perf_counter() - start
+        self.assertEqual(response.content, b"1")
+        self.assertLess(elapsed, 0.5)
+        self.assertEqual((hedged.hedges, hedged.hedge_wins), (1, 1))
+        self.assertTrue(upstream.closed)
+
+    def test_fast_primary_not_hedged(self) -> None:
+        """
+        Test that an answer within the delay sends no duplicate.
+        """
+        upstream = SlowTransport(0.0)
+        with HedgedTransport(upstream, initial_delay=0.5) as hedged:
+            self.assertEqual(hedged.get(self.URL).content, b"0")
+        self.assertEqual((upstream.calls, hedged.hedges), (1, 0))
+
+    def test_budget_bounds_hedges(self) -> None:
+        """
+        Test that hedges stop once they exceed the budget.
+        """
+        upstream = SlowTransport(*[0.03] * 20)
+        with HedgedTransport(upstream, initial_delay=0.001, budget=0.25,
+                             min_samples=1000) as hedged:
+            for _ in range(8):
+                hedged.get(self.URL)
+        self.assertEqual(hedged.hedges, 2)
+        self.assertEqual(upstream.calls, 10)
+
+    def test_delay_follows_p95(self) -> None:
+        """
+        Test that the hedge delay is the p95 of recent latencies of the
+        endpoint, within bounds.
+        """
+        hedged = HedgedTransport(SlowTransport(), min_samples=20,
+                                 max_delay=1.0)
+        for i in range(100):
+            hedged._record(self.URL, i / 100)
+        hedged._record("https://api.github.com/orgs/other", 5.0)
+        self.assertEqual(hedged.delay(self.URL), 0.95)
+        self.assertEqual(hedged.delay(self.URL + "/repos"),
+                         hedged.initial_delay)
+        for _ in range(200):
+            hedged._record(self.URL, 3.0)
+        self.assertEqual(hedged.delay(self.URL), 1.0)
+        hedged.close()
+
+    def test_errors(self) -> None:
+        """
+        Test that an error is raised only when every attempt failed, and
+        that a failing primary still lets a hedge win.
+        """
+        with HedgedTransport(SlowTransport(ConnectionError("down")),
+                             initial_delay=0.5) as hedged:
+            with self.assertRaises(ConnectionError):
+                hedged.get(self.URL)
+        upstream = SlowTransport((0.1, TimeoutError("read")), 0.2)
+        with HedgedTransport(upstream, initial_delay=0.01,
+                             budget=1.0) as hedged:
+            self.assertEqual(hedged.get(self.URL).content, b"1")
+        self.assertEqual(hedged.hedge_wins, 1)
+
+
+class TestCircuitBreakerTransport(unittest.TestCase):
+    """
+    Tests for failing fast on unhealthy hosts.
+    """
+
+    URL = "https://api.github.com/orgs/google"
+
+    def test_opens_and_recovers(self) -> None:
+        """
+        Test that consecutive failures open the circuit, that requests
+        then fail without being sent, and that a successful trial after
+        the cool-down closes it.
+        """
+        clock = ManualClock()
+        upstream = status_transport(503, ConnectionError("reset"), 503,
+                                    200, 200)
+        breaker = CircuitBreakerTransport(upstream, failure_threshold=3,
+                                          reset_timeout=10, clock=clock)
+        self.assertEqual(breaker.get(self.URL).status_code, 503)
+        with self.assertRaises(ConnectionError):
+            breaker.get(self.URL)
+        breaker.get(self.URL)
+        self.assertEqual(breaker.state(self.URL), "open")
+        with self.assertRaises(CircuitOpenError):
+            breaker.get(self.URL)
+        self.assertEqual((upstream.calls, breaker.rejected), (3, 1))
+
+        clock.now = 10
+        self.assertEqual(breaker.state(self.URL), "half-open")
+        self.assertEqual(breaker.get(self.URL).status_code, 200)
+        self.assertEqual(breaker.state(self.URL), "closed")
+
+    def test_failed_trial_reopens(self) -> None:
+        """
+        Test that a failed trial reopens the circuit for a new cool-down.
+        """
+        clock = ManualClock()
+        breaker = CircuitBreakerTransport(status_transport(500, 500, 200),
+                                          failure_threshold=1,
+                                          reset_timeout=10, clock=clock)
+        breaker.get(self.URL)
+        clock.now = 10
+        breaker.get(self.URL)
+        clock.now = 19
+        with self.assertRaises(CircuitOpenError):
+            breaker.get(self.URL)
+        clock.now = 20
+        self.assertEqual(breaker.get(self.URL).status_code, 200)
+
+    def test_hosts_are_independent(self) -> None:
+        """
+        Test that an open circuit only affects its own host.
+        """
+        breaker = CircuitBreakerTransport(status_transport(502, 200),
+                                          failure_threshold=1)
+        breaker.get(self.URL)
+        self.assertEqual(breaker.state(self.URL), "open")
+        self.assertEqual(breaker.get("http://127.0.0.1:1/x").status_code,
+                         200)
+
+
+class TestDeadlines(unittest.TestCase):
+    """
+    Tests for the connect/read deadlines of the pooled transport.
+    """
+
+    @parameterized.expand([
+        ("read", 0.3, (1.0, 0.05), True),
+        ("fast", 0.0, (1.0, 0.5), False),
+    ])
+    def test_read_deadline(self, _, latency, timeout, times_out) -> None:
+        """
+        Test that a response slower than the read deadline raises.
+
+        Args:
+            latency: seconds the server waits before answering
+            timeout: the (connect, read) deadlines
+            times_out: whether the request should fail
+        """
+        with FakeGithubServer({"/orgs/google": {}},
+                              latency=latency) as server, \
+                PooledTransport(timeout=timeout) as transport:
+            if times_out:
+                with self.assertRaises(OSError):
+                    transport.get(server.url("/orgs/google"))
+            else:
+                self.assertEqual(
+                    transport.get(server.url("/orgs/google")).json(), {})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+"""
+This module tests recording get_json traffic to a snapshot file and
+replaying it without network.
+"""
+
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from parameterized import parameterized_class
+import fixtures
+from client import GithubOrgClient
+from snapshot import RecordingTransport, ReplayTransport
+from transport import Response, set_transport
+from utils import get_json_pages
+
+
+class PayloadTransport:
+    """Transport answering URLs from a dict of (payload, headers)."""
+
+    def __init__(self, pages):
+        """Serve pages."""
+        self.pages = pages
+        self.closed = False
+
+    def get(self, url, headers=None):
+        """The JSON response for url."""
+        payload, extra = self.pages[url]
+        return Response(url, 200, extra, json.dumps(payload).encode())
+
+    def close(self):
+        """Remember being closed."""
+        self.closed = True
+
+
+@parameterized_class(
+    ("fixture",),
+    [("google",)]
+)
+class TestSnapshotReplay(unittest.TestCase):
+    """
+    Tests replaying a recorded GithubOrgClient session.
+    """
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        """Load the fixture."""
+        (cls.org_payload, cls.repos_payload, cls.expected_repos,
+         cls.apache2_repos) = fixtures.load(cls.fixture)
+
+    def setUp(self) -> None:
+        """Record one client session into a snapshot file."""
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, "google.snap")
+        self.upstream = PayloadTransport({
+            GithubOrgClient.ORG_URL.format(org="google"):
+                (self.org_payload, {}),
+            self.org_payload["repos_url"]: (self.repos_payload, {}),
+        })
+        set_transport(RecordingTransport(self.upstream, self.path))
+        self.assertEqual(GithubOrgClient("google").public_repos(),
+                         self.expected_repos)
+        set_transport(None).close()
+
+    def tearDown(self) -> None:
+        """Remove the snapshot and restore the default transport."""
+        set_transport(None)
+        shutil.rmtree(self.directory)
+
+    def test_replays_client_session(self) -> None:
+        """
+        A replayed client gives the recorded answers without touching the
+        upstream transport.
+        """
+        self.assertTrue(self.upstream.closed)
+        self.upstream.pages.clear()
+        with ReplayTransport(self.path) as replay:
+            set_transport(replay)
+            github_org_client = GithubOrgClient("google")
+            self.assertEqual(github_org_client.public_repos(),
+                             self.expected_repos)
+            self.assertEqual(github_org_client.public_repos("apache-2.0"),
+                             self.apache2_repos)
+
+    def test_loads_records_lazily(self) -> None:
+        """
+        Opening a snapshot reads only its index; each get decompresses
+        one record.
+        """
+        with ReplayTransport(self.path) as replay:
+            self.assertEqual(len(replay), 2)
+            self.assertIn(self.org_payload["repos_url"], replay)
+            self.assertEqual(replay.loads, 0)
+            response = replay.get(self.org_payload["repos_url"])
+            self.assertEqual(response.json(), self.repos_payload)
+            self.assertEqual(replay.loads, 1)
+
+    def test_snapshot_is_compact(self) -> None:
+        """
+        The snapshot is several times smaller than the bodies it holds.
+        """
+        raw = len(json.dumps(self.repos_payload))
+        self.assertLess(os.path.getsize(self.path) * 4, raw)
+
+
+class TestSnapshotFile(unittest.TestCase):
+    """
+    Tests for the snapshot file format.
+    """
+
+    def setUp(self) -> None:
+        """Create a scratch directory."""
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, "pages.snap")
+        base = "https://api.github.com/orgs/google/repos"
+        self.upstream = PayloadTransport({
+            base: ([{"name": "a"}],
+                   {"Link": '<{}?page=2>; rel="next"'.format(base)}),
+            base + "?page=2": ([{"name": "b"}], {}),
+        })
+        self.url = base
+
+    def tearDown(self) -> None:
+        """Remove the scratch directory and restore the default
+        transport."""
+        set_transport(None)
+        shutil.rmtree(self.directory)
+
+    def test_replays_headers(self) -> None:
+        """
+        Headers are recorded, so paginated listings replay page by page.
+        """
+        with RecordingTransport(self.upstream, self.path) as recorder:
+            set_transport(recorder)
+            recorded = list(get_json_pages(self.url))
+        with ReplayTransport(self.path) as replay:
+            set_transport(replay)
+            self.assertEqual(list(get_json_pages(self.url)), recorded)
+            self.assertEqual(recorded, [[{"name": "a"}], [{"name": "b"}]])
+
+    def test_unclosed_or_truncated_snapshot(self) -> None:
+        """
+        Without the index trailer, replay scans the complete records and
+        skips a partially written one.
+        """
+        recorder = RecordingTransport(self.upstream, self.path)
+        recorder.get(self.url)
+        recorder.get(self.url + "?page=2")
+        size = os.path.getsize(self.path)
+        with open(self.path, "r+b") as f:
+            f.truncate(size - 3)
+        with ReplayTransport(self.path) as replay:
+            self.assertEqual(list(replay), [self.url])
+            self.assertEqual(replay.get(self.url).json(), [{"name": "a"}])
+        recorder._file.close()
+
+    def test_errors(self) -> None:
+        """
+        Unknown URLs raise KeyError and other files ValueError.
+        """
+        with RecordingTransport(self.upstream, self.path) as recorder:
+            recorder.get(self.url)
+        with ReplayTransport(self.path) as replay:
+            with self.assertRaises(KeyError):
+                replay.get(self.url + "?page=2")
+        other = os.path.join(self.directory, "other")
+        with open(other, "wb") as f:
+            f.write(b"[]")
+        with self.assertRaises(ValueError):
+            ReplayTransport(other)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+"""
+This module tests the HTTP transports behind get_json against a local
+stand-in server.
+"""
+
+import os
+import subprocess
+import sys
+import unittest
+from unittest.mock import MagicMock
+from parameterized import parameterized
+import fixtures
+from fake_server import FakeGithubServer, json_body
+from transport import (
+    PooledTransport,
+    Response,
+    UnpooledTransport,
+    close_transport,
+    get_json_decoder,
+    get_transport,
+    set_json_decoder,
+    set_transport,
+)
+from utils import get_json
+
+
+class TestTransports(unittest.TestCase):
+    """
+    Tests that the pooled transport keeps connections alive and the
+    unpooled one does not.
+    """
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        """Start the stand-in server."""
+        cls.server = FakeGithubServer({"/orgs/google": {"login": "google"}})
+        cls.server.start()
+
+    @classmethod
+    def tearDownClass(cls) -> None:
+        """Stop the stand-in server."""
+        cls.server.stop()
+
+    @parameterized.expand([
+        (PooledTransport, 1),
+        (UnpooledTransport, 5),
+    ])
+    def test_connections_opened(self, transport_class, expected) -> None:
+        """
+        Five sequential GETs open a single connection when pooled and one
+        connection per request otherwise.
+        """
+        before = self.server.connection_count
+        transport = transport_class()
+        try:
+            for _ in range(5):
+                response = transport.get(self.server.url("/orgs/google"))
+                self.assertEqual(response.json(), {"login": "google"})
+        finally:
+            transport.close()
+        self.assertEqual(self.server.connection_count - before, expected)
+
+    def test_keep_alive_disabled(self) -> None:
+        """
+        A pooled transport with keep_alive=False reconnects every time.
+        """
+        before = self.server.connection_count
+        with PooledTransport(keep_alive=False) as transport:
+            for _ in range(3):
+                transport.get(self.server.url("/orgs/google"))
+        self.assertEqual(self.server.connection_count - before, 3)
+
+    def test_response_headers_lowercased(self) -> None:
+        """
+        Response header names are normalized to lower case.
+        """
+        response = Response("http://x", 200, {"ETag": '"a"'}, b"{}")
+        self.assertEqual(response.headers, {"etag": '"a"'})
+
+
+class TestCompression(unittest.TestCase):
+    """
+    Tests for gzip negotiation and the JSON decoder behind Response.json.
+    """
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        """Serve the fixture repos gzipped to clients accepting it."""
+        cls.repos = fixtures.load("google")[1]
+        cls.server = FakeGithubServer({"/repos": cls.repos}, compress=True)
+        cls.server.start()
+
+    @classmethod
+    def tearDownClass(cls) -> None:
+        """Stop the stand-in server."""
+        cls.server.stop()
+
+    @parameterized.expand([
+        ("pooled", PooledTransport, "get"),
+        ("pooled_stream", PooledTransport, "stream"),
+        ("unpooled", UnpooledTransport, "get"),
+    ])
+    def test_gzip(self, _, transport_class, method) -> None:
+        """
+        Bodies arrive gzipped and are decoded; wire_size counts the
+        compressed bytes.
+        """
+        size = len(json_body(self.repos))
+        for compress, smaller in ((True, True), (False, False)):
+            transport = transport_class(compress=compress)
+            try:
+                response = getattr(transport, method)(
+                    self.server.url("/repos"))
+                self.assertEqual(response.json(), self.repos)
+            finally:
+                transport.close()
+            if smaller:
+                self.assertLess(response.wire_size * 4, size)
+            else:
+                self.assertEqual(response.wire_size, size)
+
+    def test_json_decoder(self) -> None:
+        """
+        Response.json decodes bytes with the installed decoder; None
+        restores orjson, or json when orjson is not installed.
+        """
+        seen = []
+
+        def decoder(body):
+            seen.append(body)
+            return "decoded"
+
+        default = get_json_decoder()
+        self.assertIn(default.__module__, ("orjson", "json"))
+        set_json_decoder(decoder)
+        try:
+            response = Response("u", 200, {}, b'{"a": 1}')
+            self.assertEqual(response.json(), "decoded")
+            self.assertEqual(seen, [b'{"a": 1}'])
+        finally:
+            set_json_decoder(None)
+        self.assertIs(get_json_decoder(), default)
+
+
+class TestSharedTransport(unittest.TestCase):
+    """
+    Tests for the lifecycle of the process-wide transport.
+    """
+
+    def tearDown(self) -> None:
+        """Drop whatever transport the test installed."""
+        set_transport(None)
+
+    def test_get_transport_is_shared(self) -> None:
+        """
+        get_transport lazily builds one PooledTransport and reuses it.
+        """
+        set_transport(None)
+        transport = get_transport()
+        self.assertIsInstance(transport, PooledTransport)
+        self.assertIs(get_transport(), transport)
+        close_transport()
+
+    def test_set_and_close_transport(self) -> None:
+        """
+        set_transport routes get_json through the new transport and
+        close_transport closes it.
+        """
+        fake = MagicMock()
+        fake.get.return_value = Response("u", 200, {}, b'{"a": 1}')
+        set_transport(fake)
+        self.assertEqual(get_json("u"), {"a": 1})
+        fake.get.assert_called_once_with("u")
+        close_transport()
+        fake.close.assert_called_once_with()
+
+    def test_network_stack_imported_lazily(self) -> None:
+        """
+        Importing client loads neither requests nor asyncio; the first
+        get_transport loads requests.
+        """
+        script = (
+            "import sys, client, transport\n"
+            "heavy = ('requests', 'urllib3', 'asyncio', 'sqlite3',\n"
+            "         'concurrent.futures')\n"
+            "print([m for m in heavy if m in sys.modules])\n"
+            "transport.get_transport()\n"
+            "print('requests' in sys.modules)\n"
+        )
+        output = subprocess.run(
+            [sys.executable, "-c", script], stdout=subprocess.PIPE,
+            check=True, universal_newlines=True,
+            cwd=os.path.dirname(os.path.abspath(__file__))).stdout
+        self.assertEqual(output.splitlines(), ["[]", "True"])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -6,11 +6,33 @@ designed to ensure that the function behaves as expected under various
 scenarios using the parameterized test approach.
 """
 
+import asyncio
+import json
+import sys
+import threading
+import time
 import unittest
+from collections import OrderedDict
+from types import MappingProxyType
 
 from unittest.mock import patch
 from parameterized import parameterized
-from utils import access_nested_map, get_json, memoize
+from transport import Response
+from utils import (
+    LRUCache,
+    access_nested_map,
+    async_memoize,
+    compile_path,
+    extract_columns,
+    get_json,
+    get_json_pages,
+    invalidate_memoized,
+    iter_json_array,
+    memoize,
+    parse_link_header,
+    project,
+    set_memoized,
+)
 from typing import Any, Dict, Mapping, Sequence, Tuple
 
 
@@ -66,6 +88,105 @@ class TestAccessNestedMap(unittest.TestCase):
             access_nested_map(nested_map, path)
 
 
+class TestCompilePath(unittest.TestCase):
+    """
+    TestCompilePath checks that compiled getters behave exactly like
+    access_nested_map, for plain dicts and for other Mappings.
+    """
+
+    NESTED = {"a": OrderedDict(b={"c": MappingProxyType({"d": 4})}), "x": 1}
+
+    @parameterized.expand([
+        ((),),
+        (("a",),),
+        (("a", "b"),),
+        (("a", "b", "c"),),
+        (("a", "b", "c", "d"),),
+        (["a", "b", "c", "d"],),
+    ])
+    def test_compile_path(self, path):
+        """
+        Test that the compiled getter returns what access_nested_map does.
+
+        Args:
+            path (Sequence): The key path to compile.
+        """
+        self.assertEqual(compile_path(path)(self.NESTED),
+                         access_nested_map(self.NESTED, path))
+
+    @parameterized.expand([
+        (("z",), "z"),
+        (("x", "y"), "y"),
+        (("a", "z"), "z"),
+        (("a", "b", "z"), "z"),
+        (("a", "b", "c", "d", "e"), "e"),
+    ])
+    def test_compile_path_exception(self, path, missing):
+        """
+        Test that the compiled getter raises KeyError for the same key as
+        access_nested_map.
+
+        Args:
+            path (Sequence): The key path to compile.
+            missing (str): The key expected in the KeyError.
+        """
+        with self.assertRaises(KeyError) as expected:
+            access_nested_map(self.NESTED, path)
+        with self.assertRaises(KeyError) as compiled:
+            compile_path(path)(self.NESTED)
+        self.assertEqual(compiled.exception.args, (missing,))
+        self.assertEqual(compiled.exception.args, expected.exception.args)
+
+    def test_compile_path_cached(self):
+        """
+        Test that equal paths share one compiled getter.
+        """
+        self.assertIs(compile_path(["a", "b"]), compile_path(("a", "b")))
+
+
+class TestExtractColumns(unittest.TestCase):
+    """
+    TestExtractColumns checks the single-pass columnar extraction against
+    per-record access_nested_map calls.
+    """
+
+    RECORDS = [
+        {"name": "a", "license": {"key": "mit", "name": "MIT"},
+         "owner": {"login": "google"}},
+        {"name": "b", "license": None, "owner": OrderedDict(login="abc")},
+        {"name": "c"},
+        OrderedDict(name="d", license=MappingProxyType({"key": "bsd"})),
+    ]
+
+    @parameterized.expand([
+        ([("name",)],),
+        ([("license", "key"), ("license", "name"), ("license",)],),
+        ([("owner", "login"), ("name",), ()],),
+        ([],),
+    ])
+    def test_extract_columns(self, paths):
+        """
+        Test that every column matches access_nested_map, with the default
+        wherever access_nested_map raises KeyError.
+
+        Args:
+            paths (list): The key paths to extract.
+        """
+        default = object()
+        expected = []
+        for path in paths:
+            column = []
+            for record in self.RECORDS:
+                try:
+                    column.append(access_nested_map(record, path))
+                except KeyError:
+                    column.append(default)
+            expected.append(column)
+        self.assertEqual(
+            extract_columns(iter(self.RECORDS), paths, default=default),
+            expected)
+
+
 class TestGetJson(unittest.TestCase):
     """
     Test case class for testing the get_json function.
@@ -75,8 +196,8 @@ class TestGetJson(unittest.TestCase):
         ("http://example.com", {"payload": True}),
         ("http://holberton.io", {"payload": False})
     ])
-    @patch('requests.get')
-    def test_get_json(self, test_url, test_payload, mock_get):
+    @patch('utils.get_transport')
+    def test_get_json(self, test_url, test_payload, mock_get_transport):
         """
         Test the get_json function to ensure it returns the correct payload
         for different URLs without making actual HTTP calls.
@@ -85,8 +206,9 @@ class TestGetJson(unittest.TestCase):
             test_url (str): The URL to be tested.
             test_payload (dict): The expected JSON payload returned from the
                                  URL.
-            mock_get: The mock object for the requests.get call.
+            mock_get_transport: The mock object for utils.get_transport.
         """
+        mock_get = mock_get_transport.return_value.get
         # Configure the mock to return a response object with a .json() method
         mock_get.return_value.json.return_value = test_payload
 
@@ -96,10 +218,226 @@ class TestGetJson(unittest.TestCase):
         # Ensure get_json returns the correct payload
         self.assertEqual(result, test_payload)
 
-        # Check that requests.get was called exactly once with the test URL
+        # Check that the transport was called exactly once with the test URL
         mock_get.assert_called_once_with(test_url)
 
 
+class TestProjection(unittest.TestCase):
+    """
+    Test case class for project and the incremental iter_json_array
+    decoder.
+    """
+
+    REPOS = [
+        {"name": "a", "id": 1, "license": {"key": "mit", "name": "MIT"},
+         "owner": {"login": "g\u00e9", "id": 9}},
+        {"name": "b", "id": 2, "license": None, "owner": {"login": "x"}},
+        {"name": "c", "id": 3},
+    ]
+    FIELDS = [("name",), ("license", "key"), ("owner", "login")]
+    PROJECTED = [
+        {"name": "a", "license": {"key": "mit"},
+         "owner": {"login": "g\u00e9"}},
+        {"name": "b", "license": None, "owner": {"login": "x"}},
+        {"name": "c"},
+    ]
+
+    @parameterized.expand([
+        ({"a": {"b": 1, "c": 2}, "d": 3}, [("a", "b")], {"a": {"b": 1}}),
+        ({"a": {"b": 1}}, [("a", "b"), ("a",)], {"a": {"b": 1}}),
+        ({"a": 1}, [("a", "b")], {"a": 1}),
+        ([1, 2], [("a",)], [1, 2]),
+        ({"a": 1, "b": 2}, [("a",), ()], {"a": 1, "b": 2}),
+    ])
+    def test_project(self, value, fields, expected):
+        """
+        Test that project keeps only the requested key paths.
+
+        Args:
+            value (Any): The decoded JSON value.
+            fields (list): The key paths to keep.
+            expected (Any): The projected value.
+        """
+        self.assertEqual(project(value, fields), expected)
+
+    @parameterized.expand([
+        (1,),
+        (7,),
+        (1 << 16,),
+    ])
+    def test_iter_json_array(self, chunk_size):
+        """
+        Test that arrays split at arbitrary byte boundaries, including
+        inside multi-byte characters, decode item by item.
+
+        Args:
+            chunk_size (int): Size of the chunks fed to the decoder.
+        """
+        raw = json.dumps(self.REPOS, ensure_ascii=False).encode("utf-8")
+        chunks = [raw[i:i + chunk_size]
+                  for i in range(0, len(raw), chunk_size)]
+        self.assertEqual(list(iter_json_array(chunks)), self.REPOS)
+        self.assertEqual(list(iter_json_array(chunks, self.FIELDS)),
+                         self.PROJECTED)
+
+    @parameterized.expand([
+        ([b" [1, 2", b"3, 4 ]"], [1, 23, 4]),
+        ([b'{"a": ', b'1}'], [{"a": 1}]),
+        ([b"[]"], []),
+        ([b"[1,", b" 2] \n"], [1, 2]),
+    ])
+    def test_iter_json_array_values(self, chunks, expected):
+        """
+        Test scalar items split across chunks and non-array documents.
+        """
+        self.assertEqual(list(iter_json_array(chunks)), expected)
+
+    def test_iter_json_array_split_numbers(self):
+        """
+        Test that numbers split at any byte, including after their "." or
+        "e", decode whole.
+        """
+        raw = b"[1.5e3, -2.25]"
+        for i in range(len(raw) + 1):
+            self.assertEqual(list(iter_json_array([raw[:i], raw[i:]])),
+                             [1500.0, -2.25])
+
+    @parameterized.expand([
+        ([b"[1, 2"],),
+        ([b""],),
+        ([b"[1,,2]"],),
+        ([b"[1 2]"],),
+        ([b"[,1]"],),
+        ([b"[1,]"],),
+        ([b"[1]", b"garbage"],),
+        ([b"[1] ", b"]"],),
+    ])
+    def test_iter_json_array_truncated(self, chunks):
+        """
+        Test that truncated or malformed documents raise ValueError.
+        """
+        with self.assertRaises(ValueError):
+            list(iter_json_array(chunks))
+
+    def test_get_json_fields(self):
+        """
+        Test that get_json(fields=...) streams from the transport and
+        returns projected records.
+        """
+        body = json.dumps(self.REPOS).encode("utf-8")
+        response = Response("u", 200, {}, None,
+                            (body[i:i + 5] for i in range(0, len(body), 5)))
+        with patch('utils.get_transport') as mock_get_transport:
+            mock_get_transport.return_value.stream.return_value = response
+            self.assertEqual(get_json("u", self.FIELDS), self.PROJECTED)
+            mock_get_transport.return_value.stream.assert_called_once_with(
+                "u")
+
+
+class TestParseLinkHeader(unittest.TestCase):
+    """
+    Test case class for the parse_link_header function.
+    """
+
+    @parameterized.expand([
+        (None, {}),
+        ('<https://a/?page=2>; rel="next"', {"next": "https://a/?page=2"}),
+        ('<https://a/?page=2>; rel="next", <https://a/?page=9>; rel="last"',
+         {"next": "https://a/?page=2", "last": "https://a/?page=9"}),
+        ('<https://a/?page=1>; rel="prev first"',
+         {"prev": "https://a/?page=1", "first": "https://a/?page=1"}),
+        ('garbage', {}),
+    ])
+    def test_parse_link_header(self, value, expected):
+        """
+        Test that Link header values are parsed into a rel -> URL mapping.
+
+        Args:
+            value (str): The raw Link header value.
+            expected (dict): The expected rel -> URL mapping.
+        """
+        self.assertEqual(parse_link_header(value), expected)
+
+
+class TestGetJsonPages(unittest.TestCase):
+    """
+    Test case class for the get_json_pages generator.
+    """
+
+    @patch('utils.get_transport')
+    def test_follows_next_links(self, mock_get_transport):
+        """
+        Test that get_json_pages requests each page lazily and stops when
+        there is no rel="next" link.
+        """
+        pages = {
+            "https://a/1": Response("https://a/1", 200,
+                                    {"Link": '<https://a/2>; rel="next"'},
+                                    b'[1, 2]'),
+            "https://a/2": Response("https://a/2", 200, {}, b'[3]'),
+        }
+        mock_get = mock_get_transport.return_value.get
+        mock_get.side_effect = pages.get
+
+        iterator = get_json_pages("https://a/1")
+        self.assertEqual(next(iterator), [1, 2])
+        mock_get.assert_called_once_with("https://a/1")
+        self.assertEqual(list(iterator), [[3]])
+        self.assertEqual(mock_get.call_count, 2)
+
+
+class TestLRUCache(unittest.TestCase):
+    """
+    TestLRUCache covers entry and byte bounds, expiry and the counters.
+    """
+
+    def test_max_entries(self):
+        """
+        Test that the least recently used entry is evicted first.
+        """
+        cache = LRUCache(max_entries=2)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        self.assertEqual(cache.get("a"), 1)
+        cache.set("c", 3)
+        self.assertEqual([cache.get(k) for k in "abc"], [1, None, 3])
+        self.assertEqual(cache.stats(), {"hits": 3, "misses": 1,
+                                         "evictions": 1, "entries": 2,
+                                         "bytes": 0})
+
+    def test_max_bytes(self):
+        """
+        Test that entries are evicted once their approximate size exceeds
+        max_bytes, and that an oversized value does not stay.
+        """
+        small = {"name": "x"}
+        size = sum(map(sys.getsizeof, (small, "name", "x")))
+        cache = LRUCache(max_bytes=size * 5 // 2)
+        for key in range(3):
+            cache.set(key, dict(small))
+        self.assertEqual((len(cache), cache.evictions), (2, 1))
+        self.assertEqual(cache.size_bytes, 2 * size)
+        self.assertEqual(cache.get(2), small)
+
+        cache.set("big", ["x" * 100] * 100)
+        self.assertIsNone(cache.get("big"))
+        self.assertEqual((len(cache), cache.size_bytes), (0, 0))
+
+    @patch('utils.monotonic')
+    def test_ttl(self, mock_monotonic):
+        """
+        Test that an entry stops being served once its ttl has elapsed.
+        """
+        mock_monotonic.return_value = 0
+        cache = LRUCache(ttl=5)
+        cache.set("a", 1)
+        mock_monotonic.return_value = 4.9
+        self.assertEqual(cache.get("a"), 1)
+        mock_monotonic.return_value = 5
+        self.assertIsNone(cache.get("a"))
+        self.assertEqual(len(cache), 0)
+
+
 class TestMemoize(unittest.TestCase):
     """
     TestMemoize class contains unit tests for the `memoize` decorator.
@@ -147,5 +485,295 @@ class TestMemoize(unittest.TestCase):
             mocked_method.assert_called_once()
 
 
+class Counter:
+    """
+    Helper class whose memoized properties count their computations.
+    """
+
+    def __init__(self):
+        """Start every counter at zero."""
+        self.calls = 0
+        self.gate = None
+
+    def _next(self):
+        """Return the next count, waiting on gate when one is set."""
+        if self.gate is not None:
+            self.gate.wait(5)
+        self.calls += 1
+        return self.calls
+
+    @memoize
+    def forever(self):
+        """Memoized without expiry."""
+        return self._next()
+
+    @memoize(ttl=10)
+    def timed(self):
+        """Memoized for ten seconds."""
+        return self._next()
+
+    @memoize(ttl=lambda self: 10, stale_while_revalidate=True)
+    def stale(self):
+        """Memoized for ten seconds, refreshed in the background."""
+        return self._next()
+
+
+class SlowUpstream:
+    """
+    Helper class whose single-flight memoized property counts upstream
+    calls and fails while `fail` is set.
+    """
+
+    def __init__(self):
+        """Start with no upstream calls."""
+        self.calls = 0
+        self.fail = False
+        self.lock = threading.Lock()
+
+    @memoize(single_flight=True)
+    def payload(self):
+        """Slow computation shared by concurrent callers."""
+        with self.lock:
+            self.calls += 1
+        time.sleep(0.05)
+        if self.fail:
+            raise RuntimeError("upstream failed")
+        return {"calls": self.calls}
+
+
+def hammer(fn, threads=64):
+    """Call fn from `threads` threads at once; return results or errors."""
+    barrier = threading.Barrier(threads)
+    results = [None] * threads
+
+    def work(index):
+        barrier.wait()
+        try:
+            results[index] = fn()
+        except Exception as error:
+            results[index] = error
+    workers = [threading.Thread(target=work, args=(i,))
+               for i in range(threads)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return results
+
+
+class TestMemoizeSingleFlight(unittest.TestCase):
+    """
+    Stress tests for memoize(single_flight=True) under 64 threads.
+    """
+
+    def test_one_upstream_call(self):
+        """
+        Test that 64 concurrent callers share a single computation.
+        """
+        upstream = SlowUpstream()
+        results = hammer(lambda: upstream.payload)
+        self.assertEqual(upstream.calls, 1)
+        self.assertTrue(all(result is results[0] for result in results))
+
+    def test_exception_shared_not_cached(self):
+        """
+        Test that a failure reaches every concurrent caller and that the
+        next access computes again.
+        """
+        upstream = SlowUpstream()
+        upstream.fail = True
+        results = hammer(lambda: upstream.payload)
+        self.assertEqual(upstream.calls, 1)
+        self.assertTrue(all(isinstance(result, RuntimeError)
+                            for result in results))
+
+        upstream.fail = False
+        self.assertEqual(upstream.payload, {"calls": 2})
+
+
+class TestMemoizeExpiry(unittest.TestCase):
+    """
+    Tests for memoize's ttl, stale_while_revalidate and
+    invalidate_memoized.
+    """
+
+    @patch('utils.monotonic')
+    def test_ttl(self, mock_monotonic):
+        """
+        Test that a value is recomputed once its ttl has elapsed.
+        """
+        counter = Counter()
+        mock_monotonic.return_value = 100
+        self.assertEqual(counter.timed, 1)
+        mock_monotonic.return_value = 109.9
+        self.assertEqual(counter.timed, 1)
+        mock_monotonic.return_value = 110
+        self.assertEqual(counter.timed, 2)
+        self.assertEqual(counter.timed, 2)
+
+    @patch('utils.monotonic')
+    def test_stale_while_revalidate(self, mock_monotonic):
+        """
+        Test that an expired value is served while a single background
+        refresh recomputes it.
+        """
+        counter = Counter()
+        mock_monotonic.return_value = 0
+        self.assertEqual(counter.stale, 1)
+
+        counter.gate = threading.Event()
+        mock_monotonic.return_value = 60
+        self.assertEqual(counter.stale, 1)
+        self.assertEqual(counter.stale, 1)
+        counter.gate.set()
+        deadline = time.monotonic() + 5
+        while counter.stale == 1 and time.monotonic() < deadline:
+            time.sleep(0.001)
+        self.assertEqual(counter.stale, 2)
+        self.assertEqual(counter.calls, 2)
+
+    @patch('utils.monotonic', side_effect=AssertionError("clock read"))
+    def test_hit_without_deadline_reads_no_clock(self, mock_monotonic):
+        """
+        Test that hits on values without an expiry deadline, whether no
+        ttl is configured or the ttl callable returns None, never read
+        the clock, keeping the hit path as cheap as an attribute read.
+        """
+        class Untimed:
+            """Memoized with a per-instance ttl that is unset."""
+
+            @memoize(ttl=lambda self: None)
+            def value(self):
+                """Memoized without a deadline."""
+                return 1
+
+        counter, untimed = Counter(), Untimed()
+        for _ in range(2):
+            self.assertEqual(counter.forever, 1)
+            self.assertEqual(untimed.value, 1)
+        mock_monotonic.assert_not_called()
+
+    def test_invalidate_memoized(self):
+        """
+        Test that named attributes, or all memoized attributes, are
+        recomputed after invalidation.
+        """
+        counter = Counter()
+        self.assertEqual((counter.forever, counter.timed), (1, 2))
+        invalidate_memoized(counter, "forever")
+        self.assertEqual((counter.forever, counter.timed), (3, 2))
+        invalidate_memoized(counter)
+        self.assertEqual((counter.timed, counter.forever), (4, 5))
+        with self.assertRaises(AttributeError):
+            invalidate_memoized(counter, "calls")
+
+    @patch('utils.monotonic')
+    def test_set_memoized(self, mock_monotonic):
+        """
+        Test that set_memoized replaces a value and restarts its ttl.
+        """
+        counter = Counter()
+        mock_monotonic.return_value = 100
+        self.assertEqual(counter.timed, 1)
+        mock_monotonic.return_value = 105
+        set_memoized(counter, "timed", 42)
+        mock_monotonic.return_value = 114.9
+        self.assertEqual(counter.timed, 42)
+        mock_monotonic.return_value = 115
+        self.assertEqual(counter.timed, 2)
+        with self.assertRaises(AttributeError):
+            set_memoized(counter, "calls", 0)
+
+
+class AsyncUpstream:
+    """
+    Helper class with an async_memoize'd coroutine counting its runs.
+    """
+
+    def __init__(self, fail=False):
+        """Start with no runs."""
+        self.calls = 0
+        self.fail = fail
+
+    @async_memoize(ttl=10)
+    async def payload(self):
+        """Slow coroutine shared by concurrent awaiters."""
+        self.calls += 1
+        await asyncio.sleep(0.01)
+        if self.fail:
+            raise RuntimeError("upstream failed")
+        return self.calls
+
+
+class TestAsyncMemoize(unittest.TestCase):
+    """
+    Tests for async_memoize's shared tasks, eviction and ttl.
+    """
+
+    def test_concurrent_awaiters_share_task(self):
+        """
+        Test that concurrent awaiters share one run of the coroutine.
+        """
+        upstream = AsyncUpstream()
+
+        async def main():
+            return await asyncio.gather(
+                *(upstream.payload() for _ in range(20)))
+        self.assertEqual(asyncio.run(main()), [1] * 20)
+        self.assertEqual(upstream.calls, 1)
+
+    def test_failure_evicted(self):
+        """
+        Test that a failed task is evicted so the next call runs again.
+        """
+        upstream = AsyncUpstream(fail=True)
+
+        async def main():
+            results = await asyncio.gather(
+                upstream.payload(), upstream.payload(),
+                return_exceptions=True)
+            self.assertTrue(all(isinstance(result, RuntimeError)
+                                for result in results))
+            upstream.fail = False
+            return await upstream.payload()
+        self.assertEqual(asyncio.run(main()), 2)
+
+    def test_cancelled_awaiter_does_not_cancel_task(self):
+        """
+        Test that cancelling one awaiter leaves the shared task running.
+        """
+        upstream = AsyncUpstream()
+
+        async def main():
+            first = asyncio.ensure_future(upstream.payload())
+            await asyncio.sleep(0)
+            first.cancel()
+            return await upstream.payload()
+        self.assertEqual(asyncio.run(main()), 1)
+        self.assertEqual(upstream.calls, 1)
+
+    @patch('utils.monotonic')
+    def test_ttl(self, mock_monotonic):
+        """
+        Test that a finished task is reused until its ttl runs out.
+        """
+        upstream = AsyncUpstream()
+        mock_monotonic.return_value = 0
+
+        async def main():
+            first = await upstream.payload()
+            mock_monotonic.return_value = 9
+            second = await upstream.payload()
+            mock_monotonic.return_value = 10
+            third = await upstream.payload()
+            return first, second, third
+        self.assertEqual(asyncio.run(main()), (1, 1, 2))
+        invalidate_memoized(upstream, "payload")
+
+        async def again():
+            return await upstream.payload()
+        self.assertEqual(asyncio.run(again()), 3)
+
+
 if __name__ == '__main__':
     unittest.main()
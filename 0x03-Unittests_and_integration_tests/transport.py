@@ -0,0 +1,259 @@
+#!/usr/bin/env python3
+"""HTTP transports used by get_json.
+
+A transport is any object with a ``get(url, headers=None)`` method that
+returns a ``Response``; transports may also offer ``stream(url,
+headers=None)`` returning a Response whose body has not been read yet.
+``get_json`` talks to the process-wide transport returned by
+``get_transport``, which can be swapped with ``set_transport`` and
+released with ``close_transport``. ``requests`` is imported when the
+first requests-backed transport is created, not when this module is.
+
+Transports ask for gzip/deflate bodies and hand back the decompressed
+bytes, with the compressed size in ``Response.wire_size``. Bodies are
+decoded straight from bytes by orjson when it is installed, else by the
+stdlib; ``set_json_decoder`` plugs in another decoder.
+"""
+import json
+import threading
+from typing import (
+    Any,
+    Callable,
+    Iterable,
+    Iterator,
+    Mapping,
+    Optional,
+    Tuple,
+    Union,
+)
+
+__all__ = [
+    "Response",
+    "PooledTransport",
+    "UnpooledTransport",
+    "get_transport",
+    "set_transport",
+    "close_transport",
+    "get_json_decoder",
+    "set_json_decoder",
+]
+
+Timeout = Union[None, float, Tuple[float, float]]
+JsonDecoder = Callable[[bytes], Any]
+
+ACCEPT_ENCODING = "gzip, deflate"
+# (connect, read) deadlines in seconds; read bounds each wait for data
+DEFAULT_TIMEOUT: Timeout = (3.05, 30.0)
+
+_json_decoder: Optional[JsonDecoder] = None
+
+
+def _default_json_decoder() -> JsonDecoder:
+    """orjson.loads when orjson is installed, else json.loads"""
+    try:
+        import orjson
+    except ImportError:
+        return json.loads
+    return orjson.loads
+
+
+def get_json_decoder() -> JsonDecoder:
+    """Return the decoder Response.json uses, choosing the default on
+    first use"""
+    global _json_decoder
+    if _json_decoder is None:
+        _json_decoder = _default_json_decoder()
+    return _json_decoder
+
+
+def set_json_decoder(decoder: Optional[JsonDecoder]) -> Optional[JsonDecoder]:
+    """Make Response.json decode with decoder, a callable taking the body
+    bytes; None restores the default. Returns the previous decoder.
+    """
+    global _json_decoder
+    previous, _json_decoder = _json_decoder, decoder
+    return previous
+
+
+class Response:
+    """An HTTP response.
+
+    Header names are stored lower-cased, so look them up as
+    ``response.headers.get("etag")``. Streamed responses have no
+    ``content``; their body is consumed once through ``iter_content``.
+    ``wire_size`` is the number of body bytes received before
+    decompression, None when the transport does not know it (or, for a
+    streamed response, until its body has been read).
+    """
+    __slots__ = ("url", "status_code", "headers", "content", "chunks",
+                 "wire_size")
+
+    def __init__(self, url: str, status_code: int,
+                 headers: Mapping[str, str], content: Optional[bytes],
+                 chunks: Optional[Iterable[bytes]] = None,
+                 wire_size: Optional[int] = None) -> None:
+        """Init method of Response"""
+        self.url = url
+        self.status_code = status_code
+        self.headers = {k.lower(): v for k, v in headers.items()}
+        self.content = content
+        self.chunks = chunks
+        self.wire_size = wire_size
+
+    def iter_content(self) -> Iterator[bytes]:
+        """Iterate over the body in chunks"""
+        if self.content is not None:
+            return iter((self.content,))
+        chunks, self.chunks = self.chunks, ()
+        return iter(chunks)
+
+    def json(self) -> Any:
+        """Decode the body as JSON"""
+        if self.content is None:
+            self.content = b"".join(self.iter_content())
+        return get_json_decoder()(self.content)
+
+    def __repr__(self) -> str:
+        return "<Response [{}] {}>".format(self.status_code, self.url)
+
+
+class PooledTransport:
+    """Keep-alive transport backed by a pooled ``requests.Session``.
+    Parameters
+    ----------
+    pool_connections: int
+        number of per-host connection pools to keep
+    pool_maxsize: int
+        maximum number of connections kept open per host
+    pool_block: bool
+        block when a host's pool is exhausted instead of opening
+        a throwaway connection
+    keep_alive: bool
+        reuse connections between requests
+    timeout: float or (connect, read) tuple
+        deadlines in seconds passed to every request; None waits forever
+    compress: bool
+        ask for gzip/deflate bodies
+    """
+
+    def __init__(self, pool_connections: int = 10, pool_maxsize: int = 10,
+                 pool_block: bool = False, keep_alive: bool = True,
+                 timeout: Timeout = DEFAULT_TIMEOUT,
+                 compress: bool = True) -> None:
+        """Init method of PooledTransport"""
+        import requests
+        from requests.adapters import HTTPAdapter
+
+        self.timeout = timeout
+        self._session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_connections,
+                              pool_maxsize=pool_maxsize,
+                              pool_block=pool_block)
+        self._session.mount("http://", adapter)
+        self._session.mount("https://", adapter)
+        if not keep_alive:
+            self._session.headers["Connection"] = "close"
+        self._session.headers["Accept-Encoding"] = (
+            ACCEPT_ENCODING if compress else "identity")
+
+    def get(self, url: str,
+            headers: Optional[Mapping[str, str]] = None) -> Response:
+        """GET url over a pooled connection"""
+        resp = self._session.get(url, headers=headers, timeout=self.timeout)
+        return _response(resp)
+
+    def stream(self, url: str, headers: Optional[Mapping[str, str]] = None,
+               chunk_size: int = 64 * 1024) -> Response:
+        """GET url without reading the body up front"""
+        resp = self._session.get(url, headers=headers, timeout=self.timeout,
+                                 stream=True)
+        response = Response(resp.url, resp.status_code, resp.headers, None)
+
+        def chunks() -> Iterator[bytes]:
+            with resp:
+                yield from resp.iter_content(chunk_size)
+            response.wire_size = _wire_size(resp)
+        response.chunks = chunks()
+        return response
+
+    def close(self) -> None:
+        """Close every pooled connection"""
+        self._session.close()
+
+    def __enter__(self) -> "PooledTransport":
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.close()
+
+
+class UnpooledTransport:
+    """Transport opening a fresh connection for every request.
+    """
+
+    def __init__(self, timeout: Timeout = DEFAULT_TIMEOUT,
+                 compress: bool = True) -> None:
+        """Init method of UnpooledTransport"""
+        self.timeout = timeout
+        self.compress = compress
+
+    def get(self, url: str,
+            headers: Optional[Mapping[str, str]] = None) -> Response:
+        """GET url over a new connection"""
+        import requests
+
+        headers = dict(headers or {})
+        headers.setdefault("Accept-Encoding",
+                           ACCEPT_ENCODING if self.compress else "identity")
+        resp = requests.get(url, headers=headers, timeout=self.timeout)
+        return _response(resp)
+
+    def close(self) -> None:
+        """Nothing to release"""
+
+
+def _wire_size(resp: Any) -> Optional[int]:
+    """Body bytes a requests response read off the wire"""
+    tell = getattr(resp.raw, "tell", None)
+    return tell() if tell is not None else None
+
+
+def _response(resp: Any) -> Response:
+    """Response holding the whole body of a requests response"""
+    content = resp.content
+    return Response(resp.url, resp.status_code, resp.headers, content,
+                    wire_size=_wire_size(resp))
+
+
+_transport = None
+_transport_lock = threading.Lock()
+
+
+def get_transport() -> Any:
+    """Return the shared transport, creating a PooledTransport on first use.
+    """
+    global _transport
+    if _transport is None:
+        with _transport_lock:
+            if _transport is None:
+                _transport = PooledTransport()
+    return _transport
+
+
+def set_transport(transport: Any) -> Any:
+    """Install transport as the shared transport.
+    Returns the previously installed transport (possibly None) without
+    closing it.
+    """
+    global _transport
+    with _transport_lock:
+        previous, _transport = _transport, transport
+    return previous
+
+
+def close_transport() -> None:
+    """Close the shared transport; the next get_json opens a new one.
+    """
+    previous = set_transport(None)
+    if previous is not None:
+        previous.close()
@@ -1,22 +1,49 @@
 #!/usr/bin/env python3
 """Generic utilities for github org client.
 """
-import requests
-from functools import wraps
+import codecs
+import json
+import re
+import sys
+import threading
+from collections import OrderedDict
+from functools import lru_cache, wraps
+from time import monotonic, perf_counter
 from typing import (
     Mapping,
     Sequence,
     Any,
     Dict,
     Callable,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+    Union,
 )
 
+import metrics
+from transport import get_transport
+
 __all__ = [
+    "LRUCache",
     "access_nested_map",
+    "async_memoize",
+    "compile_path",
+    "extract_columns",
     "get_json",
+    "get_json_pages",
+    "invalidate_memoized",
+    "iter_json_array",
     "memoize",
+    "parse_link_header",
+    "project",
+    "set_memoized",
 ]
 
+Paths = Iterable[Sequence]
+
 
 def access_nested_map(nested_map: Mapping, path: Sequence) -> Any:
     """Access nested map with key path.
@@ -40,15 +67,510 @@ def access_nested_map(nested_map: Mapping, path: Sequence) -> Any:
     return nested_map
 
 
-def get_json(url: str) -> Dict:
+def _field_tree(fields: Paths) -> Optional[Dict]:
+    """Merge key paths into a nested dict; None marks a kept leaf, and is
+    the whole tree when a path is empty"""
+    tree: Dict = {}
+    for path in fields:
+        if not path:
+            return None
+        node = tree
+        for key in path[:-1]:
+            child = node.get(key, {})
+            if child is None:
+                break
+            node = node.setdefault(key, child)
+        else:
+            node[path[-1]] = None
+    return tree
+
+
+def _project(value: Any, tree: Optional[Dict]) -> Any:
+    if tree is None or not isinstance(value, Mapping):
+        return value
+    return {key: value[key] if sub is None else _project(value[key], sub)
+            for key, sub in tree.items() if key in value}
+
+
+def project(value: Any, fields: Paths) -> Any:
+    """Keep only the key paths in fields.
+    Paths that stop at a non-mapping value keep that value, so
+    access_nested_map raises the same KeyError on the projection as on
+    the original.
+    Example
+    -------
+    >>> project({"a": {"b": 1, "c": 2}, "d": 3}, [("a", "b")])
+    {'a': {'b': 1}}
+    """
+    return _project(value, _field_tree(fields))
+
+
+_WHITESPACE = re.compile(r"[ \t\n\r]*")
+_DELIMITERS = frozenset(",] \t\n\r")
+
+
+def _iter_json(chunks: Iterable[bytes], tree: Optional[Dict]) -> Iterator:
+    """Yield whether the document is an array, then its items or value"""
+    decoder = json.JSONDecoder()
+    text = codecs.getincrementaldecoder("utf-8")()
+    buf, pos, in_array, whole = "", 0, None, []
+    # within an array: "first" after "[", "item" after ",", "separator"
+    # after an item, "closed" after "]"
+    expect = "first"
+    chunks = iter(chunks)
+    final = False
+    while not final:
+        chunk = next(chunks, None)
+        final = chunk is None
+        buf = buf[pos:] + text.decode(chunk or b"", final)
+        pos = 0
+        if in_array is None:
+            pos = _WHITESPACE.match(buf).end()
+            if pos == len(buf):
+                continue
+            in_array = buf[pos] == "["
+            pos += in_array
+            yield in_array
+        if not in_array:
+            whole.append(buf)
+            buf = ""
+            continue
+        while True:
+            pos = _WHITESPACE.match(buf, pos).end()
+            if pos == len(buf):
+                break
+            char = buf[pos]
+            if expect == "closed":
+                raise ValueError("extra data after JSON array")
+            if char == "]" and expect != "item":
+                expect = "closed"
+                pos += 1
+                continue
+            if expect == "separator":
+                if char != ",":
+                    raise ValueError("expected ',' or ']' in JSON array")
+                expect = "item"
+                pos += 1
+                continue
+            if char in ",]":
+                raise ValueError("expected a value in JSON array")
+            try:
+                item, end = decoder.raw_decode(buf, pos)
+            except ValueError:
+                if final:
+                    raise
+                break
+            # a number cut by a chunk boundary ("1." + "5") decodes as a
+            # shorter one: only trust an item followed by a delimiter
+            if not final and (end == len(buf)
+                              or buf[end] not in _DELIMITERS):
+                break
+            pos = end
+            expect = "separator"
+            yield item if tree is None else _project(item, tree)
+    if in_array is None or (in_array and expect != "closed"):
+        raise ValueError("truncated JSON document")
+    if in_array:
+        return
+    value = json.loads("".join(whole))
+    yield value if tree is None else _project(value, tree)
+
+
+def iter_json_array(chunks: Iterable[bytes],
+                    fields: Optional[Paths] = None) -> Iterator[Any]:
+    """Decode a JSON document arriving as byte chunks, item by item.
+    Each element of a top-level array is yielded (projected on fields
+    when given) as soon as it is complete, so only one raw element is
+    held in memory at a time. Any other top-level value is yielded whole.
+    """
+    items = _iter_json(chunks, None if fields is None else _field_tree(fields))
+    next(items)
+    yield from items
+
+
+def _open(url: str) -> Any:
+    """Start a GET on the shared transport, streaming when supported"""
+    transport = get_transport()
+    stream = getattr(transport, "stream", None)
+    return stream(url) if stream is not None else transport.get(url)
+
+
+def _decode(chunks: Iterable[bytes], fields: Paths) -> Any:
+    """Decode a response body keeping only fields"""
+    items = _iter_json(chunks, _field_tree(fields))
+    if next(items):
+        return list(items)
+    return next(items)
+
+
+def _timed_chunks(chunks: Iterable[bytes], read: List) -> Iterator[bytes]:
+    """Yield chunks, adding the seconds spent waiting for each and its
+    size to read[0] and read[1]"""
+    chunks = iter(chunks)
+    while True:
+        start = perf_counter()
+        chunk = next(chunks, None)
+        read[0] += perf_counter() - start
+        if chunk is None:
+            return
+        read[1] += len(chunk)
+        yield chunk
+
+
+def _measured_get(url: str, fields: Optional[Paths]) -> Tuple[Any, Any]:
+    """get_json recording its timings, size and status in metrics.sink;
+    return the response and its decoded body"""
+    sink = metrics.sink
+    labels = (("endpoint", metrics.endpoint(url)),)
+    start = perf_counter()
+    try:
+        if fields is None:
+            response = get_transport().get(url)
+            read = [perf_counter() - start, len(response.content or b"")]
+            value = response.json()
+        else:
+            response = _open(url)
+            read = [perf_counter() - start, 0]
+            value = _decode(_timed_chunks(response.iter_content(), read),
+                            fields)
+    except Exception as error:
+        sink.inc("get_json_errors_total",
+                 labels + (("error", type(error).__name__),))
+        raise
+    elapsed = perf_counter() - start
+    sink.inc("get_json_requests_total",
+             labels + (("status", str(response.status_code)),))
+    sink.observe("get_json_seconds", elapsed, labels)
+    sink.observe("get_json_network_seconds", read[0], labels)
+    sink.observe("get_json_decode_seconds", elapsed - read[0], labels)
+    sink.observe("get_json_response_bytes", read[1], labels)
+    if response.wire_size is not None:
+        sink.observe("get_json_wire_bytes", response.wire_size, labels)
+    return response, value
+
+
+def get_json(url: str, fields: Optional[Paths] = None) -> Any:
     """Get JSON from remote URL.
+    The request goes through the shared transport (see
+    ``transport.get_transport``), so connections are pooled and kept
+    alive across calls. With fields, the body is decoded incrementally
+    and only those key paths are kept (see ``project``). Timings and
+    sizes are recorded when a metrics sink is set (see ``metrics``).
+    """
+    if metrics.sink is not None:
+        return _measured_get(url, fields)[1]
+    if fields is None:
+        response = get_transport().get(url)
+        return response.json()
+    return _decode(_open(url).iter_content(), fields)
+
+
+def _step(nested_map: Any, key: Any) -> Any:
+    """One access_nested_map step for anything that is not a plain dict"""
+    if not isinstance(nested_map, Mapping):
+        raise KeyError(key)
+    return nested_map[key]
+
+
+@lru_cache(maxsize=1024)
+def _compile_path(path: Tuple) -> Callable[[Mapping], Any]:
+    if len(path) == 1:
+        k0, = path
+
+        def getter(nested_map):
+            if type(nested_map) is dict:
+                return nested_map[k0]
+            return _step(nested_map, k0)
+    elif len(path) == 2:
+        k0, k1 = path
+
+        def getter(nested_map):
+            if type(nested_map) is dict:
+                nested_map = nested_map[k0]
+                if type(nested_map) is dict:
+                    return nested_map[k1]
+                return _step(nested_map, k1)
+            return _step(_step(nested_map, k0), k1)
+    elif len(path) == 3:
+        k0, k1, k2 = path
+        head = _compile_path(path[:2])
+
+        def getter(nested_map):
+            nested_map = head(nested_map)
+            if type(nested_map) is dict:
+                return nested_map[k2]
+            return _step(nested_map, k2)
+    else:
+        def getter(nested_map):
+            for key in path:
+                if type(nested_map) is dict:
+                    nested_map = nested_map[key]
+                else:
+                    nested_map = _step(nested_map, key)
+            return nested_map
+    return getter
+
+
+def compile_path(path: Sequence) -> Callable[[Mapping], Any]:
+    """Return a cached getter equivalent to access_nested_map for path.
+    The getter raises the same KeyError as access_nested_map and skips
+    the Mapping ABC check while it walks plain dicts.
+    Example
+    -------
+    >>> get_license_key = compile_path(("license", "key"))
+    >>> get_license_key({"license": {"key": "mit"}})
+    'mit'
+    """
+    return _compile_path(tuple(path))
+
+
+_MISSING = object()
+
+
+def _column_plan(paths: Sequence[Sequence]) -> Dict:
+    """Merge paths into a prefix tree of key -> (columns, children)"""
+    plan: Dict = {}
+    for column, path in enumerate(paths):
+        if not path:
+            continue
+        node = plan
+        for key in path:
+            entry = node.setdefault(key, ([], {}))
+            node = entry[1]
+        entry[0].append(column)
+    return plan
+
+
+def _fill_row(value: Any, plan: Dict, row: List) -> None:
+    for key, (columns, children) in plan.items():
+        if type(value) is dict:
+            child = value.get(key, _MISSING)
+        elif isinstance(value, Mapping) and key in value:
+            child = value[key]
+        else:
+            continue
+        if child is _MISSING:
+            continue
+        for column in columns:
+            row[column] = child
+        if children:
+            _fill_row(child, children, row)
+
+
+def extract_columns(records: Iterable[Mapping], paths: Sequence[Sequence],
+                    default: Any = None) -> List[List]:
+    """Extract several key paths from many records in a single pass.
+    Parameters
+    ----------
+    records: Iterable[Mapping]
+        the records, consumed once
+    paths: Sequence[Sequence]
+        key paths as accepted by access_nested_map
+    default: Any
+        value stored where access_nested_map would raise KeyError
+    Returns one list per path, aligned with records. Paths sharing a
+    prefix walk it once per record.
+    Example
+    -------
+    >>> repos = [{"name": "a", "license": {"key": "mit"}}, {"name": "b"}]
+    >>> extract_columns(repos, [("name",), ("license", "key")])
+    [['a', 'b'], ['mit', None]]
+    """
+    paths = [tuple(path) for path in paths]
+    whole = [column for column, path in enumerate(paths) if not path]
+    plan = _column_plan(paths)
+    columns: List[List] = [[] for _ in paths]
+    appends = [column.append for column in columns]
+    width = len(paths)
+    for record in records:
+        row = [default] * width
+        for column in whole:
+            row[column] = record
+        _fill_row(record, plan, row)
+        for append, value in zip(appends, row):
+            append(value)
+    return columns
+
+
+def parse_link_header(value: Optional[str]) -> Dict[str, str]:
+    """Parse an RFC 8288 Link header into a rel -> URL mapping.
+    Example
+    -------
+    >>> parse_link_header('<https://x/?page=2>; rel="next"')
+    {'next': 'https://x/?page=2'}
+    """
+    links = {}
+    for part in (value or "").split(","):
+        segments = part.split(";")
+        target = segments[0].strip()
+        if not (target.startswith("<") and target.endswith(">")):
+            continue
+        for param in segments[1:]:
+            name, _, rel = param.strip().partition("=")
+            if name.strip().lower() == "rel":
+                for token in rel.strip().strip('"').split():
+                    links[token] = target[1:-1]
+    return links
+
+
+def get_json_pages(url: str,
+                   fields: Optional[Paths] = None) -> Iterator[Any]:
+    """Yield each JSON page of a paginated listing.
+    Pages are fetched one at a time, following ``Link: rel="next"``
+    until the server stops sending one. fields works as in get_json.
     """
-    response = requests.get(url)
-    return response.json()
+    while url:
+        if metrics.sink is not None:
+            response, page = _measured_get(url, fields)
+            yield page
+        elif fields is None:
+            response = get_transport().get(url)
+            yield response.json()
+        else:
+            response = _open(url)
+            yield _decode(response.iter_content(), fields)
+        url = parse_link_header(response.headers.get("link")).get("next")
+
+
+def _approx_size(value: Any) -> int:
+    """Rough deep size in bytes of a decoded JSON value"""
+    size = sys.getsizeof(value)
+    if isinstance(value, dict):
+        for key, item in value.items():
+            size += _approx_size(key) + _approx_size(item)
+    elif isinstance(value, (list, tuple)):
+        for item in value:
+            size += _approx_size(item)
+    return size
+
+
+class LRUCache:
+    """Thread-safe least recently used cache with hit/miss counters.
+    Parameters
+    ----------
+    max_entries: int
+        evict once more entries than this are held; None for no limit
+    max_bytes: int
+        evict once the approximate deep size of the values exceeds this;
+        None for no limit
+    ttl: float
+        seconds an entry stays valid; None never expires
+    Example
+    -------
+    >>> cache = LRUCache(max_entries=2)
+    >>> cache.set("a", 1)
+    >>> cache.get("a"), cache.get("b")
+    (1, None)
+    >>> cache.hits, cache.misses
+    (1, 1)
+    """
+
+    def __init__(self, max_entries: int = None, max_bytes: int = None,
+                 ttl: float = None) -> None:
+        """Init method of LRUCache"""
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.size_bytes = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Any, default: Any = None) -> Any:
+        """Return the value for key, or default on a miss"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and monotonic() >= entry[2]:
+                self._discard(key)
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return default
+            self.hits += 1
+            self._entries.move_to_end(key)
+            return entry[0]
+
+    def set(self, key: Any, value: Any) -> None:
+        """Store value under key, evicting the least recently used"""
+        size = _approx_size(value) if self.max_bytes is not None else 0
+        expires = float("inf") if self.ttl is None else monotonic() + self.ttl
+        with self._lock:
+            self._discard(key)
+            self._entries[key] = (value, size, expires)
+            self.size_bytes += size
+            while self._entries and (
+                    (self.max_entries is not None
+                     and len(self._entries) > self.max_entries)
+                    or (self.max_bytes is not None
+                        and self.size_bytes > self.max_bytes)):
+                self._discard(next(iter(self._entries)))
+                self.evictions += 1
+
+    def invalidate(self, key: Any) -> None:
+        """Drop key if present"""
+        with self._lock:
+            self._discard(key)
+
+    def clear(self) -> None:
+        """Drop every entry; counters are kept"""
+        with self._lock:
+            self._entries.clear()
+            self.size_bytes = 0
 
+    def stats(self) -> Dict[str, int]:
+        """Counters and current occupancy"""
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses,
+                    "evictions": self.evictions,
+                    "entries": len(self._entries),
+                    "bytes": self.size_bytes}
 
-def memoize(fn: Callable) -> Callable:
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _discard(self, key: Any) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.size_bytes -= entry[1]
+
+
+class _Memoized(property):
+    """property created by memoize; remembers where the value is kept"""
+
+
+class _Flight:
+    """An in-progress computation that other threads can wait on"""
+    __slots__ = ("done", "value", "error")
+
+    def __init__(self) -> None:
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+
+_memoize_lock = threading.Lock()
+
+
+def memoize(fn: Callable = None, *, ttl: Union[None, float, Callable] = None,
+            stale_while_revalidate: bool = False,
+            single_flight: bool = False) -> Callable:
     """Decorator to memoize a method.
+    Parameters
+    ----------
+    ttl: float or callable
+        seconds a value stays fresh, or a callable taking the instance
+        and returning them; None (the default) never expires
+    stale_while_revalidate: bool
+        once expired, return the stale value at once and recompute it in
+        a background thread; a failed refresh keeps the stale value
+    single_flight: bool
+        let one thread compute a missing value while concurrent callers
+        wait for it; an exception reaches every waiter and is not cached
+    Values can be dropped with ``invalidate_memoized`` and replaced with
+    ``set_memoized``. Hits and misses are counted when a metrics sink is
+    set (see ``metrics``).
     Example
     -------
     class MyClass:
@@ -63,13 +585,186 @@ def memoize(fn: Callable) -> Callable:
     >>> my_object.a_method
     42
     """
+    if fn is None:
+        return lambda fn: memoize(
+            fn, ttl=ttl, stale_while_revalidate=stale_while_revalidate,
+            single_flight=single_flight)
+
     attr_name = "_{}".format(fn.__name__)
+    expires_name = "_{}_expires".format(fn.__name__)
+    refreshing_name = "_{}_refreshing".format(fn.__name__)
+    flight_name = "_{}_flight".format(fn.__name__)
+    labels = (("name", fn.__qualname__),)
+
+    def store(self: Any, value: Any) -> Any:
+        seconds = ttl(self) if callable(ttl) else ttl
+        if seconds is not None:
+            setattr(self, expires_name, monotonic() + seconds)
+        setattr(self, attr_name, value)
+        return value
+
+    def expired(self: Any) -> bool:
+        # without a ttl nothing expires; with one, the clock is only read
+        # when a deadline was set (ttl(self) may return None)
+        if ttl is None:
+            return False
+        expires = self.__dict__.get(expires_name)
+        return expires is not None and monotonic() >= expires
+
+    def compute(self: Any) -> Any:
+        if not single_flight:
+            return store(self, fn(self))
+        with _memoize_lock:
+            if hasattr(self, attr_name) and not expired(self):
+                return getattr(self, attr_name)
+            flight = getattr(self, flight_name, None)
+            leader = flight is None
+            if leader:
+                flight = _Flight()
+                setattr(self, flight_name, flight)
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.value
+        try:
+            flight.value = store(self, fn(self))
+            return flight.value
+        except BaseException as error:
+            flight.error = error
+            raise
+        finally:
+            with _memoize_lock:
+                delattr(self, flight_name)
+            flight.done.set()
+
+    def refresh(self: Any) -> None:
+        try:
+            store(self, fn(self))
+        except Exception:
+            pass
+        finally:
+            setattr(self, refreshing_name, False)
 
     @wraps(fn)
     def memoized(self):
         """"memoized wraps"""
-        if not hasattr(self, attr_name):
-            setattr(self, attr_name, fn(self))
-        return getattr(self, attr_name)
+        sink = metrics.sink
+        state = self.__dict__
+        if attr_name not in state:
+            if sink is not None:
+                sink.inc("memoize_misses_total", labels)
+            return compute(self)
+        expires = None if ttl is None else state.get(expires_name)
+        if expires is not None and monotonic() >= expires:
+            if not stale_while_revalidate:
+                if sink is not None:
+                    sink.inc("memoize_misses_total", labels)
+                return compute(self)
+            with _memoize_lock:
+                start = not getattr(self, refreshing_name, False)
+                if start:
+                    setattr(self, refreshing_name, True)
+            if start:
+                threading.Thread(target=refresh, args=(self,),
+                                 daemon=True).start()
+        if sink is not None:
+            sink.inc("memoize_hits_total", labels)
+        return state[attr_name]
+
+    prop = _Memoized(memoized)
+    prop.attr_names = (attr_name, expires_name)
+    prop.store = store
+    return prop
+
+
+def async_memoize(fn: Callable = None, *,
+                  ttl: Union[None, float, Callable] = None) -> Callable:
+    """Decorator to memoize a coroutine method as a shared task.
+    The first call schedules fn as an ``asyncio.Task``; until it fails or
+    its ttl runs out, every call returns that same task (shielded, so a
+    cancelled awaiter does not cancel it for the others). A task that
+    fails or is cancelled is evicted, so the next call starts afresh.
+    Parameters
+    ----------
+    ttl: float or callable
+        seconds the result stays fresh once the task is done, or a
+        callable taking the instance and returning them
+    Example
+    -------
+    class MyClass:
+        @async_memoize
+        async def a_method(self):
+            return await fetch()
+    >>> await asyncio.gather(my_object.a_method(), my_object.a_method())
+    """
+    import asyncio
+
+    if fn is None:
+        return lambda fn: async_memoize(fn, ttl=ttl)
+
+    attr_name = "_{}".format(fn.__name__)
+    expires_name = "_{}_expires".format(fn.__name__)
+    labels = (("name", fn.__qualname__),)
 
-    return property(memoized)
+    def settle(self: Any, task: "asyncio.Future") -> None:
+        if getattr(self, attr_name, None) is not task:
+            return
+        if task.cancelled() or task.exception() is not None:
+            delattr(self, attr_name)
+            return
+        seconds = ttl(self) if callable(ttl) else ttl
+        if seconds is not None:
+            setattr(self, expires_name, monotonic() + seconds)
+
+    @wraps(fn)
+    def memoized(self):
+        task = getattr(self, attr_name, None)
+        hit = not (task is None or
+                   monotonic() >= getattr(self, expires_name, float("inf")))
+        if metrics.sink is not None:
+            metrics.sink.inc("memoize_hits_total" if hit
+                             else "memoize_misses_total", labels)
+        if not hit:
+            self.__dict__.pop(expires_name, None)
+            task = asyncio.ensure_future(fn(self))
+            setattr(self, attr_name, task)
+            task.add_done_callback(lambda task: settle(self, task))
+        return asyncio.shield(task)
+
+    memoized.attr_names = (attr_name, expires_name)
+    return memoized
+
+
+def invalidate_memoized(obj: Any, *names: str) -> None:
+    """Drop memoized values so the next access recomputes them.
+    Invalidates the named attributes, or every memoized attribute of obj
+    when no name is given.
+    Example
+    -------
+    >>> invalidate_memoized(client, "org")
+    """
+    klass = type(obj)
+    if not names:
+        names = [name for base in klass.__mro__
+                 for name, value in vars(base).items()
+                 if hasattr(value, "attr_names")]
+    for name in names:
+        attr_names = getattr(getattr(klass, name, None), "attr_names", None)
+        if attr_names is None:
+            raise AttributeError("{} is not memoized".format(name))
+        for attr_name in attr_names:
+            obj.__dict__.pop(attr_name, None)
+
+
+def set_memoized(obj: Any, name: str, value: Any) -> Any:
+    """Store value as the memoized value of obj's name, fresh for a new
+    ttl, as if name had just computed it.
+    Example
+    -------
+    >>> set_memoized(client, "repos_payload", merged)
+    """
+    store = getattr(getattr(type(obj), name, None), "store", None)
+    if store is None:
+        raise AttributeError("{} is not memoized".format(name))
+    return store(obj, value)